@@ -0,0 +1,170 @@
+import collections
+import concurrent.futures
+import os
+import time
+
+import numpy as np
+
+import EnumTypes
+import ExcelUtilities
+import QueryEngine
+import Run
+import Summaries
+
+
+# Customer tiers produced for each principal by default
+default_tiers = [EnumTypes.Customer.T10, EnumTypes.Customer.T25, EnumTypes.Customer.T50]
+
+# One report's query options, same meaning as the GUI drop-downs and date edits
+ReportSpec = collections.namedtuple("ReportSpec", ["customer", "principal", "date_column", "start_date", "end_date"])
+
+
+def allPrincipalSpecs(cms_df, date_column, start_date, end_date, tiers=None):
+    """Builds the "all principals x all ranking tiers" report matrix
+
+    :param cms_df: loaded DataFrame of the Commissions Master
+    :param date_column: EnumTypes.DateColumn for the time period
+    :param start_date: first date of time interval for query
+    :param end_date: last date of time interval for query
+    :param tiers: customer queries to run per principal (default Top 10/25/50)
+    :return: list of ReportSpec
+    """
+
+    tiers = tiers or default_tiers
+    dict_abbrev_to_pcp, _ = ExcelUtilities.loadPrincipalMaps()
+
+    principals = []
+    for abbrev in cms_df['Principal'].unique():
+        if abbrev in dict_abbrev_to_pcp:
+            principals.append(dict_abbrev_to_pcp[abbrev])
+        elif abbrev:
+            print("..Skipping principal " + str(abbrev) + ", not found in principalList.xlsx..")
+
+    return [ReportSpec(tier, principal, date_column, start_date, end_date)
+            for principal in sorted(principals) for tier in tiers]
+
+
+def main(cms_df, output_dir, specs, master_filename, indexes=None, max_workers=None, summaries=False):
+    """
+    Batch.main runs many reports over one loaded Commissions Master
+
+    Rows are grouped by principal once, and reports sharing a principal, manual
+    customer and time period also share one filter pass and one customer ranking
+    (e.g. Top 10/25/50 for the same principal). Excel files are written in
+    parallel by a process pool.
+
+    :param cms_df: loaded DataFrame of the Commissions Master
+    :param output_dir: directory for the output reports
+    :param specs: list of ReportSpec
+    :param master_filename: Commissions Master file name without extension (used in output names)
+    :param indexes: optional MasterFile.MasterIndexes built over cms_df (date indexes and revenue cube)
+    :param max_workers: number of writer processes (default: one per CPU)
+    :param summaries: add the customer x month, principal x quarter and run rate sheets to every report
+    :return: list of dicts with each report's path, rows, timings and whether it was saved
+    """
+
+    print("..Running batch of " + str(len(specs)) + " reports..")
+    batch_start = time.perf_counter()
+
+    # Report layout and principal names are shared by every report
+    actual_cols, preferred_cols, col_widths, cust_rank_col_widths = Run.reportColumns()
+    dict_abbrev_to_pcp, dict_principal_to_abbrev = ExcelUtilities.loadPrincipalMaps()
+
+    # Group rows by principal once; each principal's reports only search its own rows
+    principal_rows = cms_df.groupby('Principal', observed=True).indices
+
+    # Reports that differ only by ranking tier share filtering and ranking
+    shared_specs = {}
+    for spec in specs:
+        manual_customer = None if isinstance(spec.customer, EnumTypes.Customer) else spec.customer
+        key = (spec.principal, manual_customer, spec.date_column, spec.start_date, spec.end_date)
+        shared_specs.setdefault(key, []).append(spec)
+
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+
+        for (principal, manual_customer, date_column, start_date, end_date), tier_specs in shared_specs.items():
+            build_start = time.perf_counter()
+
+            abbreviation = Run.principalAbbreviations(principal, dict_principal_to_abbrev)
+            if abbreviation is None:
+                candidates = None
+            elif isinstance(abbreviation, list):
+                # A group of principals searches the union of their rows, in row order
+                candidates = np.sort(np.concatenate([principal_rows.get(abbrev, np.array([], dtype=np.intp))
+                                                     for abbrev in abbreviation] or [np.array([], dtype=np.intp)]))
+            else:
+                candidates = principal_rows.get(abbreviation, np.array([], dtype=np.intp))
+
+            # Principal is already applied through the candidate rows
+            query = QueryEngine.QuerySpec.fromOptions(manual_customer or EnumTypes.Customer.ALL, None,
+                                                      date_column, start_date, end_date)
+            positions = query.evaluate(cms_df, indexes.date_indexes if indexes else None, candidates)
+
+            # Rank once for the largest tier, from the revenue cube when we have one
+            sorted_df = None
+            if indexes:
+                tier_sizes = [Run.tierSize(spec.customer) for spec in tier_specs]
+                ranking_query = QueryEngine.QuerySpec.fromOptions(manual_customer or EnumTypes.Customer.ALL,
+                                                                  abbreviation, date_column, start_date, end_date)
+                sorted_df = indexes.revenue_cube.rankCustomers(ranking_query,
+                                                               None if None in tier_sizes else max(tier_sizes))
+            if sorted_df is None:
+                sorted_df = Run.rankCustomers(cms_df, positions)
+
+            build_seconds = (time.perf_counter() - build_start) / len(tier_specs)
+
+            # Each tier is a cut of the shared ranking (copied once, for its own rows); hand the writing off to the pool
+            for spec in tier_specs:
+                tier_positions, tier_sorted_df = Run.keepTopCustomers(cms_df, positions, sorted_df, spec.customer)
+                tier_rpt_df = Run.reportFrame(cms_df, tier_positions, actual_cols, preferred_cols)
+                summary_sheets = Summaries.buildSummaries(cms_df, tier_positions, tier_sorted_df, spec.date_column,
+                                                          dict_abbrev_to_pcp,
+                                                          cust_rank_col_widths[0]) if summaries else []
+                output_path = os.path.join(output_dir, Run.reportName(master_filename, spec.customer, spec.principal,
+                                                                      abbreviation, spec.date_column,
+                                                                      spec.start_date, spec.end_date))
+                future = pool.submit(exportJob, output_path, tier_rpt_df, tier_sorted_df,
+                                     col_widths, cust_rank_col_widths, summary_sheets)
+                futures[future] = {"path": output_path,
+                                   "rows": int(tier_rpt_df.shape[0]),
+                                   "build_seconds": build_seconds}
+
+        for future in concurrent.futures.as_completed(futures):
+            result = futures[future]
+            try:
+                result["saved"], result["write_seconds"] = future.result()
+            except Exception as error:
+                print("..Unexpected Python error writing " + os.path.basename(result["path"]) + ":\n" +
+                      "?" + str(error))
+                result["saved"], result["write_seconds"] = False, 0.0
+            results.append(result)
+
+    printSummary(results, time.perf_counter() - batch_start)
+
+    return results
+
+
+def exportJob(output_path, rpt_df, sorted_df, col_widths, cust_rank_col_widths, summary_sheets=()):
+    """Worker process entry: writes one report and times it
+
+    :return: (whether the file was saved, seconds spent writing)
+    """
+
+    write_start = time.perf_counter()
+    saved = Run.exportReport(output_path, rpt_df, sorted_df, col_widths, cust_rank_col_widths, summary_sheets)
+    return saved, time.perf_counter() - write_start
+
+
+def printSummary(results, total_seconds):
+    """Prints per-report runtimes and the batch total"""
+
+    print("> Batch complete: {} of {} reports saved in {:.1f}s".format(
+        sum(result["saved"] for result in results), len(results), total_seconds))
+    print("  {:>9}  {:>8}  {:>8}  {}".format("rows", "build s", "write s", "file"))
+    for result in sorted(results, key=lambda r: r["path"]):
+        print("  {:>9,}  {:>8.2f}  {:>8.2f}  {}{}".format(result["rows"], result["build_seconds"],
+                                                        result["write_seconds"], os.path.basename(result["path"]),
+                                                        "" if result["saved"] else "  (NOT saved)"))
+
@@ -0,0 +1,211 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import EnumTypes
+import ExcelUtilities
+import MasterFile
+import QueryEngine
+import Run
+import SheetReader
+import SyntheticMaster
+
+
+# Master sizes timed by default
+default_sizes = [10000, 100000, 1000000]
+
+# Report queries timed at every size: (customer, principal number or None for ALL, date column)
+default_queries = [(EnumTypes.Customer.ALL, None, EnumTypes.DateColumn.NA),
+                   (EnumTypes.Customer.T10, 0, EnumTypes.DateColumn.PAID),
+                   (EnumTypes.Customer.T50, None, EnumTypes.DateColumn.INVOICE)]
+
+# Time period of the dated queries (synthetic masters span 2019-2023)
+query_start_date = datetime.date(2022, 1, 1)
+query_end_date = datetime.date(2022, 12, 31)
+
+# Stages timed per master, and per query
+master_stages = ["load", "normalize", "index"]
+query_stages = ["filter", "rank", "export"]
+
+
+def timed(function, *args, **kwargs):
+    """Runs function(*args, **kwargs)
+
+    :return: (function's return value, seconds taken)
+    """
+
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def benchmarkMaster(master_path, output_dir, queries, repeat=1):
+    """Times each report stage separately over one Commissions Master
+
+    load      -- stream the workbook's report columns into a raw dataframe
+    normalize -- type the columns and convert the date columns
+    index     -- build the date indexes and revenue cube
+    filter    -- query the line items (per report query)
+    rank      -- rank customers, keep the top ones and copy out the report rows (per report query)
+    export    -- write the report workbook (per report query)
+
+    :param master_path: path to the Commissions Master workbook
+    :param output_dir: directory for the exported reports
+    :param queries: list of (customer, principal number or None, date column)
+    :param repeat: times to repeat each query stage (the fastest run is kept)
+    :return: dict of stage timings and row counts
+    """
+
+    rcl_df = ExcelUtilities.loadLookupFile("ReportColumns.xlsx", "Columns")
+    actual_cols, preferred_cols, col_widths, cust_rank_col_widths = Run.reportColumns()
+    _, dict_principal_to_abbrev = ExcelUtilities.loadPrincipalMaps()
+    principal_names = sorted(dict_principal_to_abbrev)
+
+    (raw_df, n_rows, _, _, _), load_seconds = timed(SheetReader.readWorkbook, master_path, columns=list(rcl_df.columns))
+    cms_df, normalize_seconds = timed(MasterFile.prepareFrame, raw_df)
+    indexes, index_seconds = timed(MasterFile.MasterIndexes, cms_df)
+    del raw_df
+
+    result = {"master": os.path.basename(master_path),
+              "rows": n_rows,
+              "load": load_seconds,
+              "normalize": normalize_seconds,
+              "index": index_seconds,
+              "queries": []}
+
+    for customer, principal_num, date_column in queries:
+        principal = EnumTypes.Principal.ALL if principal_num is None else principal_names[principal_num]
+        abbreviation = None if principal_num is None else dict_principal_to_abbrev.get(principal)
+        output_path = os.path.join(output_dir, Run.reportName("Benchmark {}".format(n_rows), customer, principal,
+                                                              abbreviation, date_column,
+                                                              query_start_date, query_end_date))
+
+        timings = {stage: [] for stage in query_stages}
+        for _ in range(repeat):
+            # Same steps as Run.main
+            filter_start = time.perf_counter()
+            query = QueryEngine.QuerySpec.fromOptions(customer, abbreviation, date_column,
+                                                      query_start_date, query_end_date)
+            positions = query.evaluate(cms_df, indexes.date_indexes)
+            timings["filter"].append(time.perf_counter() - filter_start)
+
+            rank_start = time.perf_counter()
+            sorted_df = indexes.revenue_cube.rankCustomers(query, Run.tierSize(customer))
+            top_positions, sorted_df = Run.keepTopCustomers(cms_df, positions, sorted_df, customer)
+            top_df = Run.reportFrame(cms_df, top_positions, actual_cols, preferred_cols)
+            timings["rank"].append(time.perf_counter() - rank_start)
+
+            _, export_seconds = timed(Run.exportReport, output_path, top_df, sorted_df,
+                                      col_widths, cust_rank_col_widths)
+            timings["export"].append(export_seconds)
+
+        query_result = {"query": os.path.basename(output_path), "report_rows": int(top_df.shape[0])}
+        query_result.update({stage: min(seconds) for stage, seconds in timings.items()})
+        result["queries"].append(query_result)
+
+    return result
+
+
+def runBenchmarks(work_dir, sizes=None, queries=None, repeat=1, seed=0):
+    """Generates (or reuses) a synthetic master per size and benchmarks each one
+
+    :param work_dir: directory for the synthetic masters, lookup files and exported reports
+    :param sizes: master sizes in rows (default 10k/100k/1M)
+    :param queries: report queries to time (see default_queries)
+    :param repeat: times to repeat each query stage
+    :param seed: random seed for the synthetic masters
+    :return: dict with the environment and one result per size, ready for JSON
+    """
+
+    sizes = sizes or default_sizes
+    queries = queries or default_queries
+
+    # Point the lookups at the synthetic principals and report columns
+    ExcelUtilities.look_dir = os.path.join(work_dir, "Lookup") + "/"
+    output_dir = os.path.join(work_dir, "Output")
+    os.makedirs(output_dir, exist_ok=True)
+    if not os.path.exists(ExcelUtilities.look_dir + "principalList.xlsx"):
+        SyntheticMaster.generateLookups(ExcelUtilities.look_dir)
+
+    results = {"created": datetime.datetime.now().isoformat(timespec="seconds"),
+               "environment": {"python": platform.python_version(),
+                               "pandas": pd.__version__,
+                               "numpy": np.__version__,
+                               "platform": platform.platform()},
+               "seed": seed,
+               "results": []}
+
+    for n_rows in sizes:
+        master_path = os.path.join(work_dir, "Synthetic Master {} rows seed {}.xlsx".format(n_rows, seed))
+        if not os.path.exists(master_path):
+            SyntheticMaster.generateMaster(master_path, n_rows, seed=seed)
+
+        print("..Benchmarking {:,} rows..".format(n_rows))
+        results["results"].append(benchmarkMaster(master_path, output_dir, queries, repeat))
+
+    return results
+
+
+def printResults(results, baseline=None):
+    """Prints a table of stage timings, with the speedup over a baseline run when given"""
+
+    def speedup(n_rows, stage, seconds, query=None):
+        if baseline is None:
+            return ""
+        for old in baseline["results"]:
+            if old["rows"] != n_rows:
+                continue
+            if query is None:
+                old_seconds = old.get(stage)
+            else:
+                old_seconds = next((q.get(stage) for q in old["queries"] if q["query"] == query), None)
+            if old_seconds:
+                return "  {:>6.2f}x".format(old_seconds / seconds if seconds else float("inf"))
+        return ""
+
+    print("  {:>9}  {:<10}  {:>9}  {}".format("rows", "stage", "seconds", "query"))
+    for result in results["results"]:
+        n_rows = result["rows"]
+        for stage in master_stages:
+            print("  {:>9,}  {:<10}  {:>9.3f}{}".format(n_rows, stage, result[stage],
+                                                       speedup(n_rows, stage, result[stage])))
+        for query_result in result["queries"]:
+            for stage in query_stages:
+                print("  {:>9,}  {:<10}  {:>9.3f}  {}{}".format(n_rows, stage, query_result[stage],
+                                                               query_result["query"],
+                                                               speedup(n_rows, stage, query_result[stage],
+                                                                       query_result["query"])))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Times load, normalize, filter, rank and export "
+                                                 "over synthetic Commissions Masters")
+    parser.add_argument("work_dir", help="directory for the synthetic masters and exported reports")
+    parser.add_argument("--sizes", type=int, nargs="+", default=default_sizes, help="master sizes in rows")
+    parser.add_argument("--repeat", type=int, default=1, help="repeat each query stage, keeping the fastest")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the synthetic masters")
+    parser.add_argument("--output", default=None, help="JSON results file (default: timestamped in work_dir)")
+    parser.add_argument("--compare", default=None, help="earlier JSON results to show speedups against")
+    args = parser.parse_args(sys.argv[1:])
+
+    results = runBenchmarks(args.work_dir, args.sizes, repeat=args.repeat, seed=args.seed)
+
+    output_path = args.output or os.path.join(
+        args.work_dir, "benchmark_" + datetime.datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    with open(output_path, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    printResults(results, baseline)
+    print("> Benchmark results saved at: " + output_path)
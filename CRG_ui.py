@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'CRG.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_AutomateExcel(object):
+    def setupUi(self, AutomateExcel):
+        AutomateExcel.setObjectName("AutomateExcel")
+        AutomateExcel.resize(900, 600)
+        self.btnSelectFile = QtWidgets.QPushButton(AutomateExcel)
+        self.btnSelectFile.setGeometry(QtCore.QRect(40, 50, 201, 51))
+        self.btnSelectFile.setObjectName("btnSelectFile")
+        self.txtConsole = QtWidgets.QTextEdit(AutomateExcel)
+        self.txtConsole.setGeometry(QtCore.QRect(420, 230, 441, 261))
+        font = QtGui.QFont()
+        font.setFamily("Dubai Medium")
+        font.setPointSize(10)
+        font.setBold(False)
+        font.setWeight(50)
+        self.txtConsole.setFont(font)
+        self.txtConsole.setReadOnly(True)
+        self.txtConsole.setObjectName("txtConsole")
+        self.lblTaarcomImage = QtWidgets.QLabel(AutomateExcel)
+        self.lblTaarcomImage.setGeometry(QtCore.QRect(550, 40, 181, 171))
+        self.lblTaarcomImage.setAcceptDrops(True)
+        self.lblTaarcomImage.setAutoFillBackground(True)
+        self.lblTaarcomImage.setText("")
+        self.lblTaarcomImage.setPixmap(QtGui.QPixmap("TAARCOM.png"))
+        self.lblTaarcomImage.setScaledContents(True)
+        self.lblTaarcomImage.setObjectName("lblTaarcomImage")
+        self.lbltxtCurrentFile = QtWidgets.QLabel(AutomateExcel)
+        self.lbltxtCurrentFile.setGeometry(QtCore.QRect(40, 130, 111, 31))
+        font = QtGui.QFont()
+        font.setPointSize(10)
+        self.lbltxtCurrentFile.setFont(font)
+        self.lbltxtCurrentFile.setObjectName("lbltxtCurrentFile")
+        self.lblSelectedFile = QtWidgets.QLabel(AutomateExcel)
+        self.lblSelectedFile.setGeometry(QtCore.QRect(40, 170, 351, 31))
+        font = QtGui.QFont()
+        font.setPointSize(9)
+        self.lblSelectedFile.setFont(font)
+        self.lblSelectedFile.setAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignLeft|QtCore.Qt.AlignTop)
+        self.lblSelectedFile.setWordWrap(False)
+        self.lblSelectedFile.setObjectName("lblSelectedFile")
+        self.btnClearConsole = QtWidgets.QPushButton(AutomateExcel)
+        self.btnClearConsole.setGeometry(QtCore.QRect(570, 510, 141, 28))
+        self.btnClearConsole.setObjectName("btnClearConsole")
+        self.btnDeselectFile = QtWidgets.QPushButton(AutomateExcel)
+        self.btnDeselectFile.setGeometry(QtCore.QRect(250, 50, 51, 51))
+        icon = QtGui.QIcon()
+        icon.addPixmap(QtGui.QPixmap("clear-file.png"), QtGui.QIcon.Normal, QtGui.QIcon.Off)
+        self.btnDeselectFile.setIcon(icon)
+        self.btnDeselectFile.setIconSize(QtCore.QSize(30, 30))
+        self.btnDeselectFile.setObjectName("btnDeselectFile")
+        self.btnCancel = QtWidgets.QPushButton(AutomateExcel)
+        self.btnCancel.setEnabled(False)
+        self.btnCancel.setGeometry(QtCore.QRect(310, 50, 81, 51))
+        self.btnCancel.setObjectName("btnCancel")
+        self.barLoadProgress = QtWidgets.QProgressBar(AutomateExcel)
+        self.barLoadProgress.setGeometry(QtCore.QRect(40, 108, 351, 16))
+        self.barLoadProgress.setProperty("value", 0)
+        self.barLoadProgress.setObjectName("barLoadProgress")
+        self.drpdwnCustomer = QtWidgets.QComboBox(AutomateExcel)
+        self.drpdwnCustomer.setGeometry(QtCore.QRect(150, 240, 241, 31))
+        self.drpdwnCustomer.setObjectName("drpdwnCustomer")
+        self.drpdwnCustomer.addItem("")
+        self.drpdwnCustomer.addItem("")
+        self.drpdwnCustomer.addItem("")
+        self.drpdwnCustomer.addItem("")
+        self.btnRun = QtWidgets.QPushButton(AutomateExcel)
+        self.btnRun.setGeometry(QtCore.QRect(140, 470, 161, 71))
+        font = QtGui.QFont()
+        font.setFamily("Bauhaus 93")
+        font.setPointSize(30)
+        self.btnRun.setFont(font)
+        self.btnRun.setObjectName("btnRun")
+        self.drpdwnPrincipal = QtWidgets.QComboBox(AutomateExcel)
+        self.drpdwnPrincipal.setGeometry(QtCore.QRect(150, 290, 241, 31))
+        self.drpdwnPrincipal.setObjectName("drpdwnPrincipal")
+        self.drpdwnPrincipal.addItem("")
+        self.lbltxtCustomer = QtWidgets.QLabel(AutomateExcel)
+        self.lbltxtCustomer.setGeometry(QtCore.QRect(30, 240, 101, 31))
+        self.lbltxtCustomer.setLayoutDirection(QtCore.Qt.LeftToRight)
+        self.lbltxtCustomer.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.lbltxtCustomer.setObjectName("lbltxtCustomer")
+        self.lbltxtPrincipal = QtWidgets.QLabel(AutomateExcel)
+        self.lbltxtPrincipal.setGeometry(QtCore.QRect(30, 290, 101, 31))
+        self.lbltxtPrincipal.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.lbltxtPrincipal.setObjectName("lbltxtPrincipal")
+        self.lbltxtDateColumn = QtWidgets.QLabel(AutomateExcel)
+        self.lbltxtDateColumn.setGeometry(QtCore.QRect(30, 340, 101, 31))
+        self.lbltxtDateColumn.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.lbltxtDateColumn.setObjectName("lbltxtDateColumn")
+        self.lbltxtTimePeriod = QtWidgets.QLabel(AutomateExcel)
+        self.lbltxtTimePeriod.setGeometry(QtCore.QRect(30, 390, 101, 31))
+        self.lbltxtTimePeriod.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.lbltxtTimePeriod.setObjectName("lbltxtTimePeriod")
+        self.drpdwnDateColumn = QtWidgets.QComboBox(AutomateExcel)
+        self.drpdwnDateColumn.setGeometry(QtCore.QRect(150, 340, 241, 31))
+        self.drpdwnDateColumn.setObjectName("drpdwnDateColumn")
+        self.drpdwnDateColumn.addItem("")
+        self.drpdwnDateColumn.addItem("")
+        self.drpdwnDateColumn.addItem("")
+        self.dateStartDate = QtWidgets.QDateEdit(AutomateExcel)
+        self.dateStartDate.setGeometry(QtCore.QRect(150, 390, 91, 31))
+        self.dateStartDate.setDateTime(QtCore.QDateTime(QtCore.QDate(2023, 1, 1), QtCore.QTime(0, 0, 0)))
+        self.dateStartDate.setObjectName("dateStartDate")
+        self.dateEndDate = QtWidgets.QDateEdit(AutomateExcel)
+        self.dateEndDate.setGeometry(QtCore.QRect(300, 390, 91, 31))
+        self.dateEndDate.setDateTime(QtCore.QDateTime(QtCore.QDate(2023, 7, 6), QtCore.QTime(0, 0, 0)))
+        self.dateEndDate.setObjectName("dateEndDate")
+        self.lbltxtThru = QtWidgets.QLabel(AutomateExcel)
+        self.lbltxtThru.setGeometry(QtCore.QRect(240, 390, 61, 31))
+        self.lbltxtThru.setAlignment(QtCore.Qt.AlignCenter)
+        self.lbltxtThru.setObjectName("lbltxtThru")
+        self.chkSummaries = QtWidgets.QCheckBox(AutomateExcel)
+        self.chkSummaries.setGeometry(QtCore.QRect(150, 430, 241, 31))
+        self.chkSummaries.setObjectName("chkSummaries")
+        self.lblPreview = QtWidgets.QLabel(AutomateExcel)
+        self.lblPreview.setGeometry(QtCore.QRect(40, 548, 351, 31))
+        font = QtGui.QFont()
+        font.setPointSize(9)
+        self.lblPreview.setFont(font)
+        self.lblPreview.setAlignment(QtCore.Qt.AlignCenter)
+        self.lblPreview.setObjectName("lblPreview")
+
+        self.retranslateUi(AutomateExcel)
+        QtCore.QMetaObject.connectSlotsByName(AutomateExcel)
+
+    def retranslateUi(self, AutomateExcel):
+        _translate = QtCore.QCoreApplication.translate
+        AutomateExcel.setWindowTitle(_translate("AutomateExcel", "Adjust File Screen"))
+        self.btnSelectFile.setText(_translate("AutomateExcel", "Select Commissions File"))
+        self.txtConsole.setHtml(_translate("AutomateExcel", "<!DOCTYPE HTML PUBLIC \"-//W3C//DTD HTML 4.0//EN\" \"http://www.w3.org/TR/REC-html40/strict.dtd\">\n"
+"<html><head><meta name=\"qrichtext\" content=\"1\" /><style type=\"text/css\">\n"
+"p, li { white-space: pre-wrap; }\n"
+"</style></head><body style=\" font-family:\'Dubai Medium\'; font-size:10pt; font-weight:400; font-style:normal;\">\n"
+"<p style=\"-qt-paragraph-type:empty; margin-top:0px; margin-bottom:0px; margin-left:0px; margin-right:0px; -qt-block-indent:0; text-indent:0px;\"><br /></p></body></html>"))
+        self.lbltxtCurrentFile.setText(_translate("AutomateExcel", "<html><head/><body><p><span style=\" text-decoration: underline;\">Current File:</span></p></body></html>"))
+        self.lblSelectedFile.setText(_translate("AutomateExcel", "<No File Selected>"))
+        self.btnClearConsole.setText(_translate("AutomateExcel", "Clear Console"))
+        self.btnCancel.setText(_translate("AutomateExcel", "Cancel"))
+        self.drpdwnCustomer.setCurrentText(_translate("AutomateExcel", "ALL"))
+        self.drpdwnCustomer.setItemText(0, _translate("AutomateExcel", "ALL"))
+        self.drpdwnCustomer.setItemText(1, _translate("AutomateExcel", "Top 10"))
+        self.drpdwnCustomer.setItemText(2, _translate("AutomateExcel", "Top 25"))
+        self.drpdwnCustomer.setItemText(3, _translate("AutomateExcel", "Top 50"))
+        self.btnRun.setText(_translate("AutomateExcel", "Run"))
+        self.drpdwnPrincipal.setCurrentText(_translate("AutomateExcel", "ALL"))
+        self.drpdwnPrincipal.setItemText(0, _translate("AutomateExcel", "ALL"))
+        self.lbltxtCustomer.setText(_translate("AutomateExcel", "Customer(s):"))
+        self.lbltxtPrincipal.setText(_translate("AutomateExcel", "Principal(s):"))
+        self.lbltxtDateColumn.setText(_translate("AutomateExcel", "Date Column:"))
+        self.lbltxtTimePeriod.setText(_translate("AutomateExcel", "Time Period:"))
+        self.drpdwnDateColumn.setItemText(0, _translate("AutomateExcel", "Paid Date"))
+        self.drpdwnDateColumn.setItemText(1, _translate("AutomateExcel", "Invoice Date"))
+        self.drpdwnDateColumn.setItemText(2, _translate("AutomateExcel", "N/A"))
+        self.lbltxtThru.setText(_translate("AutomateExcel", "THRU"))
+        self.chkSummaries.setText(_translate("AutomateExcel", "Add summary sheets (pivots, run rate)"))
+        self.lblPreview.setText(_translate("AutomateExcel", "Preview: select a file"))
+
+
+# Hash of the layout this module was compiled from (see CompileUi.isCurrent)
+ui_hash = "403d63cf5fea8d6779433b74ca3fbd072f87341c"
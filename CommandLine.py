@@ -0,0 +1,196 @@
+import time
+
+# Measure cold start from the moment this module starts loading
+cold_start = time.perf_counter()
+
+import argparse
+import datetime
+import os
+import sys
+
+# pandas, numpy and the report modules are imported inside the functions below,
+# so --help and argument errors come back instantly and PyQt is never imported
+
+
+class OptionNotFound(Exception):
+    """Raised when a typed customer or principal isn't in the master or principalList.xlsx"""
+
+
+def optionFromText(text, enum_type):
+    """Converts option text (enum value or name, e.g. "Top 10" or T10) to an enum type
+       If not enum type, then returns the actual text (a customer or principal name)"""
+
+    for x in enum_type:
+        if text == x.value or text == x.name:
+            return x
+    return text
+
+
+def generateReport(master_paths, output_path, customer="ALL", principal="ALL", date_column="PAID",
+                   start_date=None, end_date=None, open_report=False, summaries=False):
+    """Loads one or more Commissions Masters and runs one report across all of them, without the GUI
+
+    :param master_paths: list of Commissions Master workbooks (e.g. one per fiscal year)
+    :param output_path: output .xlsx path, or a directory to use the default tagged file name
+    :param customer: "ALL", "Top 10"/"T10", "Top 25", "Top 50", a customer name, several names separated by ";"
+                     or "Group: <name>" for a group saved in queryGroups.xlsx
+    :param principal: "ALL", a principal's full name, several separated by ";" or "Group: <name>"
+    :param date_column: "Paid Date"/"PAID", "Invoice Date"/"INVOICE" or "N/A"/"NA"
+    :param start_date: first date of time interval (default Jan 1st of current year)
+    :param end_date: last date of time interval (default today)
+    :param open_report: open the finished report in Excel
+    :param summaries: add the customer x month, principal x quarter and run rate sheets
+    :return: path of the output report, or None if the master couldn't be loaded or the report wasn't saved
+             (raises OptionNotFound for a customer or principal that doesn't resolve)
+    """
+
+    import EnumTypes
+    import ExcelUtilities
+    import MasterFile
+    import QueryEngine
+    import Run
+
+    print("..Modules loaded ({:.2f}s since start)..".format(time.perf_counter() - cold_start))
+
+    customer_text, principal_text = customer, principal
+    customer = optionFromText(customer, EnumTypes.Customer)
+    principal = optionFromText(principal, EnumTypes.Principal)
+    date_column = optionFromText(date_column, EnumTypes.DateColumn)
+    start_date = start_date or datetime.date(datetime.date.today().year, 1, 1)
+    end_date = end_date or datetime.date.today()
+
+    # Unknown names would otherwise run as no filter (principals) or an empty report (customers)
+    _, dict_principal_to_abbrev = ExcelUtilities.loadPrincipalMaps()
+    if not isinstance(principal, EnumTypes.Principal):
+        principal = MasterFile.selectionFromText(principal, "Principals", dict_principal_to_abbrev)
+    if not Run.principalFound(principal, dict_principal_to_abbrev):
+        raise OptionNotFound("principal \"" + principal_text + "\" not found in principalList.xlsx")
+
+    cms_df, indexes = MasterFile.loadMasters(master_paths)
+    if cms_df is None:
+        return
+
+    # Customer names come from the master, so they're only known once it's loaded
+    if not isinstance(customer, EnumTypes.Customer):
+        customer_names = set(cms_df[QueryEngine.customer_column].unique())
+        customer = MasterFile.selectionFromText(customer, "Customers", customer_names)
+    if not Run.customerFound(cms_df, customer):
+        raise OptionNotFound("customer \"" + customer_text + "\" not found in the master file(s)")
+
+    # A directory gets the same tagged file name the GUI would use
+    if os.path.isdir(output_path):
+        output_path = os.path.join(output_path, Run.reportName(MasterFile.masterName(master_paths), customer, principal,
+                                                               dict_principal_to_abbrev.get(principal),
+                                                               date_column, start_date, end_date))
+
+    saved = Run.main(cms_df, output_path, customer, principal, date_column, start_date, end_date,
+                     indexes=indexes, open_report=open_report, summaries=summaries)
+
+    return output_path if saved else None
+
+
+def generateBatch(master_paths, output_dir, date_column="PAID", start_date=None, end_date=None,
+                  tiers=("T10", "T25", "T50"), max_workers=None, summaries=False):
+    """Loads one or more Commissions Masters and runs every principal x customer tier report across them
+
+    :param master_paths: list of Commissions Master workbooks (e.g. one per fiscal year)
+    :param output_dir: directory for the output reports
+    :param date_column: "Paid Date"/"PAID", "Invoice Date"/"INVOICE" or "N/A"/"NA"
+    :param start_date: first date of time interval (default Jan 1st of current year)
+    :param end_date: last date of time interval (default today)
+    :param tiers: customer queries to run per principal
+    :param max_workers: number of writer processes (default: one per CPU)
+    :param summaries: add the customer x month, principal x quarter and run rate sheets to every report
+    :return: list of per-report results from Batch.main, or None if the master couldn't be loaded
+    """
+
+    import Batch
+    import EnumTypes
+    import MasterFile
+
+    print("..Modules loaded ({:.2f}s since start)..".format(time.perf_counter() - cold_start))
+
+    date_column = optionFromText(date_column, EnumTypes.DateColumn)
+    start_date = start_date or datetime.date(datetime.date.today().year, 1, 1)
+    end_date = end_date or datetime.date.today()
+
+    cms_df, indexes = MasterFile.loadMasters(master_paths)
+    if cms_df is None:
+        return
+
+    specs = Batch.allPrincipalSpecs(cms_df, date_column, start_date, end_date,
+                                    [optionFromText(tier, EnumTypes.Customer) for tier in tiers])
+    return Batch.main(cms_df, output_dir, specs, MasterFile.masterName(master_paths),
+                      indexes=indexes, max_workers=max_workers, summaries=summaries)
+
+
+def buildParser():
+    """Builds the argument parser for the report and batch commands"""
+
+    parser = argparse.ArgumentParser(description="TAARCOM Commissions Report Generator (command line)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def addQueryArgs(command):
+        command.add_argument("master", nargs="+", help="Commissions Master workbook(s), e.g. one per fiscal year")
+        command.add_argument("--date-column", default="PAID", help="PAID, INVOICE or NA")
+        command.add_argument("--start", type=datetime.date.fromisoformat, default=None,
+                             help="YYYY-MM-DD (default Jan 1st of current year)")
+        command.add_argument("--end", type=datetime.date.fromisoformat, default=None,
+                             help="YYYY-MM-DD (default today)")
+        command.add_argument("--run-log", default=None, help="JSON-lines file for stage timings "
+                                                             "(default I:/Output/crg_run_log.jsonl)")
+        command.add_argument("--profile", default=None, metavar="DIR", help="dump a cProfile .prof file per run")
+        command.add_argument("--summaries", action="store_true", help="add customer x month, principal x quarter "
+                                                                      "and run rate sheets")
+
+    report = commands.add_parser("report", help="run a single report")
+    addQueryArgs(report)
+    report.add_argument("output", help="output .xlsx path, or a directory for the default tagged name")
+    report.add_argument("--customer", default="ALL", help="ALL, T10, T25, T50, a customer name, "
+                                                          "\"Name A; Name B\" or \"Group: <name>\"")
+    report.add_argument("--principal", default="ALL", help="ALL, a principal's full name, "
+                                                           "\"Name A; Name B\" or \"Group: <name>\"")
+    report.add_argument("--open", action="store_true", help="open the report in Excel when done")
+    report.add_argument("--no-result-cache", action="store_true", help="always rerun the query, even if an "
+                                                                       "identical report was made before")
+
+    batch = commands.add_parser("batch", help="run every principal x customer tier report")
+    addQueryArgs(batch)
+    batch.add_argument("output_dir", help="directory for the output reports")
+    batch.add_argument("--tiers", nargs="+", default=["T10", "T25", "T50"], help="customer tiers per principal")
+    batch.add_argument("--workers", type=int, default=None, help="number of writer processes")
+
+    return parser
+
+
+def parseArgs(argv):
+    """Parses command line arguments for the report and batch commands"""
+
+    return buildParser().parse_args(argv)
+
+
+if __name__ == '__main__':
+    parser = buildParser()
+    args = parser.parse_args(sys.argv[1:])
+
+    import Instrumentation
+    Instrumentation.run_log_path = args.run_log or Instrumentation.run_log_path
+    Instrumentation.profile_dir = args.profile
+
+    if args.command == "report":
+        import ResultCache
+        ResultCache.enabled = not args.no_result_cache
+        try:
+            result = generateReport(args.master, args.output, args.customer, args.principal, args.date_column,
+                                    args.start, args.end, open_report=args.open, summaries=args.summaries)
+        except OptionNotFound as error:
+            parser.error(str(error))
+    elif args.command == "batch":
+        result = generateBatch(args.master, args.output_dir, args.date_column, args.start, args.end,
+                               args.tiers, args.workers, summaries=args.summaries)
+
+    # A master that couldn't be loaded, or any report that wasn't saved (e.g. open in Excel), fails the run
+    if result is None or (args.command == "batch" and not all(report["saved"] for report in result)):
+        sys.exit(1)
+
+    print("> Cold start to finished {}: {:.2f}s".format(args.command, time.perf_counter() - cold_start))
@@ -0,0 +1,51 @@
+import hashlib
+import os
+import sys
+
+
+# Qt Designer layout and the Python module compiled from it
+ui_path = "CRG.ui"
+compiled_path = "CRG_ui.py"
+
+
+def uiHash(filepath=ui_path):
+    """Hashes the Qt Designer layout, so a compiled module can tell whether it's up to date
+    Line endings are ignored, so checkouts with either style match"""
+
+    with open(filepath, "rb") as ui_file:
+        return hashlib.sha1(ui_file.read().replace(b"\r\n", b"\n")).hexdigest()
+
+
+def isCurrent(compiled_module, filepath=ui_path):
+    """Checks that a compiled UI module was built from the current layout
+
+    :param compiled_module: imported CRG_ui module, or None if it couldn't be imported
+    :param filepath: Qt Designer layout
+    :return: whether the module can stand in for the layout
+    """
+
+    if compiled_module is None or not os.path.exists(filepath):
+        return False
+    return getattr(compiled_module, "ui_hash", None) == uiHash(filepath)
+
+
+def compileUi(filepath=ui_path, output_path=compiled_path):
+    """Compiles the Qt Designer layout into a Python module (run after editing CRG.ui)
+
+    :param filepath: Qt Designer layout
+    :param output_path: destination of the compiled module
+    :return: void; module written
+    """
+
+    from PyQt5 import uic
+
+    with open(output_path, "w") as output_file:
+        uic.compileUi(filepath, output_file)
+        output_file.write("\n\n# Hash of the layout this module was compiled from (see CompileUi.isCurrent)\n"
+                          "ui_hash = \"" + uiHash(filepath) + "\"\n")
+
+    print("> Compiled " + filepath + " to " + output_path)
+
+
+if __name__ == '__main__':
+    compileUi(*sys.argv[1:3])
@@ -0,0 +1,130 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+
+# Q#YYYY quarters (e.g. Q32022), read as the first day of the quarter
+quarter_pattern = r'^Q([1-4])\s*(\d{4})$'
+quarter_layout = "Q#YYYY"
+
+# Text date layouts tried in order, each parsed with an explicit format (no per-value inference)
+# (pandas parses any ISO 8601 text, with or without a time, under the first one)
+text_formats = ['%Y-%m-%d',
+                '%Y-%m-%d %H:%M:%S',
+                '%m/%d/%Y',
+                '%m/%d/%y',
+                '%Y-%m',
+                '%b %Y',
+                '%B %Y']
+
+# Cell types Excel hands back for real date cells
+date_cell_types = [datetime.datetime, datetime.date, pd.Timestamp]
+date_cell_layout = "date cell"
+
+
+def normalizeColumn(values):
+    """Converts one date column to datetime64 without format inference
+
+    Real date cells convert directly, Q#YYYY text goes through one vectorized regex
+    extraction, and other text is tried against text_formats in order (only values
+    no earlier format matched are tried again). Anything left over becomes NaT.
+
+    :param values: series of date cells, Q#YYYY or date text, and blanks
+    :return: (datetime64 series, dict of layout -> values converted, dict of layout -> values coerced to NaT)
+    """
+
+    converted = {}
+    coerced = {}
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        addCounts(converted, {date_cell_layout: int(values.notna().sum())})
+        addCounts(coerced, {"blank": int(values.isna().sum())})
+        return values, converted, coerced
+
+    result = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[ns]')
+    kinds = values.map(type).values
+    is_blank = values.isna().values
+
+    # ---------------------
+    #  Real Date Cells
+    # ---------------------
+
+    is_date = np.isin(kinds, date_cell_types)
+    if is_date.any():
+        parsed = pd.to_datetime(values[is_date], errors='coerce').values
+        result[is_date] = parsed
+        addCounts(converted, {date_cell_layout: int((~np.isnat(parsed)).sum())})
+        addCounts(coerced, {date_cell_layout: int(np.isnat(parsed).sum())})
+
+    # ---------------------
+    #  Date Text
+    # ---------------------
+
+    text_positions = np.flatnonzero(kinds == str)
+    text = values.iloc[text_positions].str.strip()
+
+    is_empty = (text == "").values
+    is_blank[text_positions[is_empty]] = True
+    text_positions, text = text_positions[~is_empty], text[~is_empty]
+
+    # Q#YYYY -> first day of the quarter
+    quarters = text.str.extract(quarter_pattern)
+    is_quarter = quarters[0].notna().values
+    if is_quarter.any():
+        quarter = quarters[is_quarter].astype(int)
+        result[text_positions[is_quarter]] = pd.to_datetime(pd.DataFrame({'year': quarter[1],
+                                                                          'month': 3 * quarter[0] - 2,
+                                                                          'day': 1})).values
+        converted[quarter_layout] = int(is_quarter.sum())
+        text_positions, text = text_positions[~is_quarter], text[~is_quarter]
+
+    # Known text layouts; repeated values are parsed once (cache=True)
+    for text_format in text_formats:
+        if text.empty:
+            break
+        parsed = pd.to_datetime(text, format=text_format, errors='coerce', cache=True).values
+        matched = ~np.isnat(parsed)
+        if matched.any():
+            result[text_positions[matched]] = parsed[matched]
+            converted[text_format] = int(matched.sum())
+            text_positions, text = text_positions[~matched], text[~matched]
+
+    if not text.empty:
+        coerced["unrecognized text"] = int(text.shape[0])
+
+    # Numbers, booleans, etc. aren't dates
+    is_other = ~(is_date | (kinds == str) | is_blank)
+    if is_other.any():
+        coerced["other value"] = int(is_other.sum())
+    if is_blank.any():
+        coerced["blank"] = int(is_blank.sum())
+
+    return pd.Series(result, index=values.index, name=values.name), converted, coerced
+
+
+def addCounts(totals, counts):
+    """Adds one column's (or chunk's) layout counts into running totals, in place (zero counts are skipped)"""
+
+    for layout, count in counts.items():
+        if count:
+            totals[layout] = totals.get(layout, 0) + count
+
+
+def removeCounts(totals, counts):
+    """Takes counts added with addCounts back out of running totals, in place (layouts left at zero are removed)"""
+
+    for layout, count in counts.items():
+        if count:
+            totals[layout] -= count
+            if not totals[layout]:
+                del totals[layout]
+
+
+def printReport(col, converted, coerced):
+    """Prints how a date column's values were converted and how many became NaT, by layout"""
+
+    converted_text = ", ".join("{:,} {}".format(count, layout) for layout, count in converted.items())
+    coerced_text = ", ".join("{:,} {}".format(count, layout) for layout, count in coerced.items())
+    print("..Dates in " + str(col) + ": " + (converted_text or "none converted") +
+          ("; NaT: " + coerced_text if coerced_text else "") + "..")
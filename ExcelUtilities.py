@@ -1,186 +1,319 @@
-import os
-
-import numpy as np
-import pandas as pd
-from xlrd import XLRDError
-
-import EnumTypes
-
-
-default_sheet_name = "Data"
-default_more_sheet_name = "Customers Ranked"
-
-
-def saveError(*excel_files):
-    """Checks for obstacles with saving the output file
-
-    :param: excel_files: path to output directory
-    :return: whether there is an error with saving
-    """
-    for file in excel_files:
-        try:
-            open(file, 'r+')
-        except FileNotFoundError:
-            pass
-        except PermissionError:
-            return True
-    return False
-
-
-def createExcelFile(output_path, sheet_data, more_sheet_data=pd.DataFrame()):
-    """Creates an Excel file from a dataframe
-
-    :param output_path: path for our created file
-    :param sheet_data: dataframe which will be copied to this file
-    :param more_sheet_data: dataframe which will be copied as a second sheet
-    :return: xlsxwriter object for formatting this file
-    """
-
-    # Verify output path
-    if saveError(output_path):
-        print("..One or more files are currently open in Excel!\n"
-              "..Please close the files and try again.\n"
-              "*Program Terminated*")
-        return
-
-    # Write the output file
-    writer = pd.ExcelWriter(output_path, engine="xlsxwriter", date_format="yyyy-mm-dd", datetime_format="yyyy-mm-dd")
-    sheet_data.to_excel(writer, sheet_name=default_sheet_name, index=False)
-
-    more_sheet_data.to_excel(writer, sheet_name=default_more_sheet_name, index=False)
-
-    print("> New file saved at: " + output_path)
-
-    return writer
-
-
-def loadLookupFile(filename, sheet_name):
-    """Loads the specified sheet from the lookup file to a dataframe
-
-    :param: filename: name of the lookup file
-    :param: sheet_name: name of the main sheet we pull data from
-    :return: dataframe with sheet data
-    """
-
-    # Assume file is in the lookup directory
-    look_dir = "I:/Lookup/"
-    filepath = look_dir + filename
-
-    if os.path.exists(filepath):
-        try:
-            sheet_data = pd.read_excel(filepath, sheet_name).fillna("")
-        except XLRDError:
-            print("..Error reading sheet name for " + filename + "!\n"
-                  "..Please make sure the main tab is named \"" + sheet_name + "\".\n"
-                  "*Program Terminated*")
-            return
-    else:
-        print("..No " + filename + " file found!\n"
-              "..Please make sure " + filename + " is in the directory.\n"
-              "*Program Terminated*")
-        return
-
-    return sheet_data
-
-
-def formatSheet(sheet_data, sheet_name, writer, col_widths):
-    """Formats our output file to make it look nice :)
-
-    :param: sheet_data: working data frame for output
-    :param: sheet_name: name of the sheet we are working on
-    :param: writer: working xlsxwriter for Excel tools
-    :param: col_widths: pre-defined widths of columns
-    :return: void; output formatted Excel file
-    """
-
-    print("..Formatting sheet (" + sheet_name + ")..")
-
-    # Store the working sheet from the output Excel file
-    sheet = writer.sheets[sheet_name]
-
-    # --------------------
-    #  Define all formats
-    # --------------------
-
-    fmt_default = writer.book.add_format({'font': 'Calibri Light',
-                                          'font_size': 8})
-    fmt_left_aligned = writer.book.add_format({'font': 'Calibri Light',
-                                               'font_size': 8,
-                                               'align': 'left'})
-    fmt_center_aligned = writer.book.add_format({'font': 'Calibri Light',
-                                                 'font_size': 8,
-                                                 'align': 'center'})
-    fmt_right_aligned = writer.book.add_format({'font': 'Calibri Light',
-                                                'font_size': 8,
-                                                'align': 'right'})
-    fmt_accounting = writer.book.add_format({'font': 'Calibri Light',
-                                             'font_size': 8,
-                                             'num_format': '$#,##0'})  # num_format 44 + rounded to nearest $
-    fmt_number_with_commas = writer.book.add_format({'font': 'Calibri Light',
-                                                     'font_size': 8,
-                                                     'num_format': 3})
-
-    # -------------------
-    #  Format the header
-    # -------------------
-
-    header_left_cols = ['T-End Cust', 'Reported Customer']
-
-    # Write the DataFrame header to the worksheet with the defined format
-    header_row = 0
-    for col_num, value in enumerate(sheet_data.columns.values):
-        if value in header_left_cols:
-            sheet.write(header_row, col_num, value, fmt_left_aligned)
-        else:
-            sheet.write(header_row, col_num, value, fmt_center_aligned)
-
-    # Freeze header, so it remains stationary when scrolling up or down
-    sheet.freeze_panes(1, 0)
-
-    # Set auto filter
-    sheet.autofilter(0, 0, sheet_data.shape[0], sheet_data.shape[1] - 1)
-
-    # -----------------
-    #  Format the body
-    # -----------------
-
-    # Ignore number stored as text error
-    sheet.ignore_errors({'number_stored_as_text': 'A1:XFD1048576'})
-
-    # Determine which data columns need which format
-    accounting_cols = ['Revenue']
-    number_with_commas_cols = ['Qty']
-    definitely_text_cols = ['P/N']  # Make sure it's not interpreted as a number
-    center_aligned_cols = ['FSR', 'Principal', 'Comm Month', 'Invoice Date', 'Channel', 'EM/CM']
-    right_aligned_cols = []
-
-    # -------------------------
-    #  Format and size columns
-    # -------------------------
-
-    for col in sheet_data.columns:
-        # Setting each column's style
-        fmt = fmt_default
-        if col in accounting_cols:
-            fmt = fmt_accounting
-        elif col in number_with_commas_cols:
-            fmt = fmt_number_with_commas
-        elif col in definitely_text_cols:
-            fmt = fmt_default
-        elif col in center_aligned_cols:
-            fmt = fmt_center_aligned
-        elif col in right_aligned_cols:
-            fmt = fmt_right_aligned
-
-        # Set column width and formatting
-        col_idx = sheet_data.columns.get_loc(col)
-        col_width = col_widths[col_idx]
-        sheet.set_column(col_idx, col_idx, col_width, fmt)
-
-    # Set the row height for all rows
-    row_height = 10.8
-    for row_num in range(sheet_data.shape[0]):
-        sheet.set_row(row_num, row_height)
-
-
-
+import os
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+import EnumTypes
+import Instrumentation
+
+
+default_sheet_name = "Data"
+default_more_sheet_name = "Customers Ranked"
+
+# Rows converted and written per batch when streaming a sheet
+write_chunk_rows = 10000
+
+# Day zero for Excel serial dates
+excel_epoch = pd.Timestamp("1899-12-30")
+
+# Directory holding ReportColumns.xlsx, principalList.xlsx, etc.
+look_dir = "I:/Lookup/"
+
+# Optional lookup file of saved query groups: a "Customers" and a "Principals" sheet,
+# one column per group (header = group name, customer names or principal full names below)
+groups_filename = "queryGroups.xlsx"
+
+# Process-wide cache of parsed lookup files: filepath -> {mtime_ns, sheets, derived}
+lookup_registry = {}
+
+
+def saveError(*excel_files):
+    """Checks for obstacles with saving the output file
+
+    :param: excel_files: path to output directory
+    :return: whether there is an error with saving
+    """
+    for file in excel_files:
+        try:
+            open(file, 'r+')
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            return True
+    return False
+
+
+def createExcelFile(output_path):
+    """Creates an empty, streaming (constant memory) Excel file for the report
+
+    :param output_path: path for our created file
+    :return: xlsxwriter workbook for writing sheets into this file
+    """
+
+    # Verify output path
+    if saveError(output_path):
+        print("..One or more files are currently open in Excel!\n"
+              "..Please close the files and try again.\n"
+              "*Program Terminated*")
+        return
+
+    # Rows are flushed to disk as they're written, so memory stays flat regardless of row count
+    with Instrumentation.measure("create file"):
+        writer = xlsxwriter.Workbook(output_path, {'constant_memory': True,
+                                                   'default_date_format': 'yyyy-mm-dd'})
+
+    print("> New file saved at: " + output_path)
+
+    return writer
+
+
+def writeSheet(writer, sheet_data, sheet_name, col_widths, accounting_cols=None):
+    """Streams a dataframe into a new, formatted sheet
+
+    :param writer: workbook from createExcelFile
+    :param sheet_data: dataframe which will be copied to this sheet
+    :param sheet_name: name of the new sheet
+    :param col_widths: pre-defined widths of columns
+    :param accounting_cols: columns formatted as dollars (default: Revenue)
+    :return: void; rows written to the workbook
+    """
+
+    sheet = writer.add_worksheet(sheet_name)
+
+    # Constant memory mode writes row by row, so the header and column formats go first
+    with Instrumentation.measure("format " + sheet_name):
+        formatSheet(sheet_data, sheet_name, writer, col_widths, accounting_cols)
+
+    # Write the body in chunks; cells take their column's format
+    with Instrumentation.measure("write " + sheet_name, rows_in=sheet_data.shape[0]):
+        for chunk_start in range(0, sheet_data.shape[0], write_chunk_rows):
+            chunk = sheet_data.iloc[chunk_start:chunk_start + write_chunk_rows]
+            columns = [cellValues(chunk[col]) for col in chunk.columns]
+            for row_offset, row in enumerate(zip(*columns)):
+                sheet.write_row(chunk_start + row_offset + 1, 0, row)
+
+
+def cellValues(values):
+    """Converts a column to plain Python values xlsxwriter can write directly
+
+    Dates become Excel serial numbers (shown as dates by the column format) and
+    missing values become None, which leaves the cell blank.
+
+    :param values: one column (series) of the sheet data
+    :return: list of cell values
+    """
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        cells = ((values - excel_epoch) / pd.Timedelta(days=1)).astype(object)
+    else:
+        cells = values.astype(object)
+
+    return cells.where(cells.notna(), None).tolist()
+
+
+def loadLookupWorkbook(filename):
+    """Loads every sheet of a lookup file once and keeps it until the file changes
+
+    :param: filename: name of the lookup file
+    :return: registry entry with the file's sheets and derived lookups, or None
+    """
+
+    # Assume file is in the lookup directory
+    filepath = look_dir + filename
+
+    try:
+        mtime_ns = os.stat(filepath).st_mtime_ns
+    except FileNotFoundError:
+        print("..No " + filename + " file found!\n"
+              "..Please make sure " + filename + " is in the directory.\n"
+              "*Program Terminated*")
+        return
+
+    # Re-read only if the file was modified since we last parsed it
+    entry = lookup_registry.get(filepath)
+    if entry is None or entry["mtime_ns"] != mtime_ns:
+        sheets = pd.read_excel(filepath, sheet_name=None)
+        entry = {"mtime_ns": mtime_ns,
+                 "sheets": {name: sheet.fillna("") for name, sheet in sheets.items()},
+                 "derived": {}}
+        lookup_registry[filepath] = entry
+
+    return entry
+
+
+def loadLookupFile(filename, sheet_name):
+    """Loads the specified sheet from the lookup file to a dataframe
+    The dataframe is shared through the lookup registry, so don't modify it in place
+
+    :param: filename: name of the lookup file
+    :param: sheet_name: name of the main sheet we pull data from
+    :return: dataframe with sheet data
+    """
+
+    entry = loadLookupWorkbook(filename)
+    if entry is None:
+        return
+
+    if sheet_name not in entry["sheets"]:
+        print("..Error reading sheet name for " + filename + "!\n"
+              "..Please make sure the main tab is named \"" + sheet_name + "\".\n"
+              "*Program Terminated*")
+        return
+
+    return entry["sheets"][sheet_name]
+
+
+def loadPrincipalMaps():
+    """Builds the abbreviation <-> principal name maps from principalList.xlsx (active and inactive)
+
+    :return: (dict abbreviation to principal, dict principal to abbreviation), or None
+    """
+
+    entry = loadLookupWorkbook("principalList.xlsx")
+    if entry is None:
+        return
+
+    # Derived maps live alongside the sheets, so they're rebuilt only when the file changes
+    if "principal_maps" not in entry["derived"]:
+        pcp_active = loadLookupFile(filename="principalList.xlsx", sheet_name="Principals")
+        pcp_inactive = loadLookupFile(filename="principalList.xlsx", sheet_name="Inactive")
+        if pcp_active is None or pcp_inactive is None:
+            return
+        pcp_lookup = pd.concat([pcp_active, pcp_inactive])
+        dict_abbrev_to_pcp = dict(zip(pcp_lookup['Abbreviation'], pcp_lookup['Principal']))
+        dict_principal_to_abbrev = dict(zip(pcp_lookup['Principal'], pcp_lookup['Abbreviation']))
+        entry["derived"]["principal_maps"] = (dict_abbrev_to_pcp, dict_principal_to_abbrev)
+
+    return entry["derived"]["principal_maps"]
+
+
+def formatSheet(sheet_data, sheet_name, writer, col_widths, accounting_cols=None):
+    """Formats our output file to make it look nice :)
+    Must run before the sheet's rows are written (see writeSheet)
+
+    :param: sheet_data: working data frame for output
+    :param: sheet_name: name of the sheet we are working on
+    :param: writer: working xlsxwriter workbook for Excel tools
+    :param: col_widths: pre-defined widths of columns
+    :param: accounting_cols: columns formatted as dollars (default: Revenue)
+    :return: void; output formatted Excel file
+    """
+
+    print("..Formatting sheet (" + sheet_name + ")..")
+
+    # Store the working sheet from the output Excel file
+    sheet = writer.get_worksheet_by_name(sheet_name)
+
+    # --------------------
+    #  Define all formats
+    # --------------------
+
+    fmt_default = writer.add_format({'font': 'Calibri Light',
+                                     'font_size': 8})
+    fmt_left_aligned = writer.add_format({'font': 'Calibri Light',
+                                          'font_size': 8,
+                                          'align': 'left'})
+    fmt_center_aligned = writer.add_format({'font': 'Calibri Light',
+                                            'font_size': 8,
+                                            'align': 'center'})
+    fmt_right_aligned = writer.add_format({'font': 'Calibri Light',
+                                           'font_size': 8,
+                                           'align': 'right'})
+    fmt_accounting = writer.add_format({'font': 'Calibri Light',
+                                        'font_size': 8,
+                                        'num_format': '$#,##0'})  # num_format 44 + rounded to nearest $
+    fmt_number_with_commas = writer.add_format({'font': 'Calibri Light',
+                                                'font_size': 8,
+                                                'num_format': 3})
+    fmt_date = writer.add_format({'font': 'Calibri Light',
+                                  'font_size': 8,
+                                  'align': 'center',
+                                  'num_format': 'yyyy-mm-dd'})
+
+    # -------------------
+    #  Format the header
+    # -------------------
+
+    header_left_cols = ['T-End Cust', 'Reported Customer']
+
+    # Write the DataFrame header to the worksheet with the defined format
+    header_row = 0
+    for col_num, value in enumerate(sheet_data.columns.values):
+        if value in header_left_cols:
+            sheet.write(header_row, col_num, value, fmt_left_aligned)
+        else:
+            sheet.write(header_row, col_num, value, fmt_center_aligned)
+
+    # Freeze header, so it remains stationary when scrolling up or down
+    sheet.freeze_panes(1, 0)
+
+    # Set auto filter
+    sheet.autofilter(0, 0, sheet_data.shape[0], sheet_data.shape[1] - 1)
+
+    # -----------------
+    #  Format the body
+    # -----------------
+
+    # Ignore number stored as text error
+    sheet.ignore_errors({'number_stored_as_text': 'A1:XFD1048576'})
+
+    # Determine which data columns need which format
+    accounting_cols = accounting_cols or ['Revenue']
+    number_with_commas_cols = ['Qty']
+    definitely_text_cols = ['P/N']  # Make sure it's not interpreted as a number
+    center_aligned_cols = ['FSR', 'Principal', 'Comm Month', 'Invoice Date', 'Channel', 'EM/CM']
+    right_aligned_cols = []
+
+    # -------------------------
+    #  Format and size columns
+    # -------------------------
+
+    for col in sheet_data.columns:
+        # Setting each column's style
+        fmt = fmt_default
+        if pd.api.types.is_datetime64_any_dtype(sheet_data[col]):
+            fmt = fmt_date
+        elif col in accounting_cols:
+            fmt = fmt_accounting
+        elif col in number_with_commas_cols:
+            fmt = fmt_number_with_commas
+        elif col in definitely_text_cols:
+            fmt = fmt_default
+        elif col in center_aligned_cols:
+            fmt = fmt_center_aligned
+        elif col in right_aligned_cols:
+            fmt = fmt_right_aligned
+
+        # Set column width and formatting
+        col_idx = sheet_data.columns.get_loc(col)
+        col_width = col_widths[col_idx]
+        sheet.set_column(col_idx, col_idx, col_width, fmt)
+
+    # Set the row height for all rows in one go
+    row_height = 10.8
+    sheet.set_default_row(row_height)
+
+
+def loadQueryGroups(sheet_name):
+    """Loads the saved customer or principal groups from queryGroups.xlsx (the file is optional)
+
+    :param: sheet_name: "Customers" or "Principals"
+    :return: dict of group name -> list of members (empty if the file or sheet doesn't exist)
+    """
+
+    if not os.path.exists(look_dir + groups_filename):
+        return {}
+
+    entry = loadLookupWorkbook(groups_filename)
+    if entry is None or sheet_name not in entry["sheets"]:
+        return {}
+
+    # Derived groups live alongside the sheets, so they're rebuilt only when the file changes
+    key = "groups " + sheet_name
+    if key not in entry["derived"]:
+        groups_df = entry["sheets"][sheet_name]
+        entry["derived"][key] = {str(name): [str(member) for member in groups_df[name] if member != ""]
+                                 for name in groups_df.columns}
+
+    return entry["derived"][key]
@@ -0,0 +1,186 @@
+import contextlib
+import cProfile
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Each finished run is appended here as one JSON line; None turns the run log off
+run_log_path = "I:/Output/crg_run_log.jsonl"
+
+# Set to a directory to dump a cProfile .prof file per run (open with snakeviz, pstats, etc.)
+profile_dir = None
+
+# Print the stage table to the console when a run finishes
+print_timings = True
+
+# Run being measured on each thread (reports run on a worker thread while the GUI thread loads files)
+active = threading.local()
+
+
+class RunRecord:
+    """Stage timings of one instrumented run (a report, a file load)
+
+    param name -- what ran, e.g. "report"
+    param details -- extra JSON-friendly info for the run log (query options, file name)
+    """
+
+    def __init__(self, name, details=None):
+        self.name = name
+        self.details = details or {}
+        self.started = datetime.datetime.now()
+        self.start = time.perf_counter()
+        self.stages = []
+        self.depth = 0
+
+
+def memoryMB():
+    """Returns (current RSS, peak RSS) of this process in MB, None where the platform can't tell"""
+
+    current = peak = None
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        current = info.rss / 1024 ** 2
+        if getattr(info, "peak_wset", None):
+            # Windows keeps the process peak
+            peak = info.peak_wset / 1024 ** 2
+    if peak is None and resource is not None:
+        # ru_maxrss is KB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+    if current is not None and peak is not None:
+        peak = max(peak, current)
+    return current, peak
+
+
+@contextlib.contextmanager
+def measure(stage_name, rows_in=None):
+    """Times one stage of the run active on this thread (does nothing outside a run)
+
+    Usage:
+        with Instrumentation.measure("query", rows_in=cms_df.shape[0]) as stage:
+            ...
+            stage["rows_out"] = rpt_df.shape[0]
+
+    :param stage_name: stage shown in the table and run log
+    :param rows_in: rows going into the stage
+    :return: dict to add rows_out (or other numbers) to
+    """
+
+    run = getattr(active, "run", None)
+    stage = {"stage": stage_name, "rows_in": rows_in, "rows_out": None}
+    if run is None:
+        yield stage
+        return
+
+    # Stages are listed in the order they start, so nested ones follow their parent
+    stage["depth"] = run.depth
+    run.stages.append(stage)
+    run.depth += 1
+    start = time.perf_counter()
+    try:
+        yield stage
+    finally:
+        stage["seconds"] = time.perf_counter() - start
+        stage["rss_mb"], stage["peak_rss_mb"] = memoryMB()
+        run.depth -= 1
+
+
+@contextlib.contextmanager
+def measureRun(name, details=None):
+    """Measures a run: stages inside it are recorded, then printed, logged and (optionally) profiled
+    Inside another run on the same thread, it's measured as a stage of that run instead
+
+    :param name: what ran, e.g. "report"
+    :param details: extra JSON-friendly info for the run log
+    """
+
+    if getattr(active, "run", None) is not None:
+        with measure(name):
+            yield
+        return
+
+    run = RunRecord(name, details)
+    active.run = run
+
+    profiler = cProfile.Profile() if profile_dir else None
+    if profiler:
+        profiler.enable()
+
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        if profiler:
+            profiler.disable()
+        active.run = None
+        finishRun(run, failed, profiler)
+
+
+def finishRun(run, failed, profiler=None):
+    """Prints, logs and dumps the profile of a finished run"""
+
+    total_seconds = time.perf_counter() - run.start
+    rss_mb, peak_rss_mb = memoryMB()
+
+    if print_timings:
+        printTable(run, total_seconds, peak_rss_mb)
+
+    if run_log_path:
+        entry = {"run": run.name,
+                 "started": run.started.isoformat(timespec="seconds"),
+                 "seconds": round(total_seconds, 4),
+                 "failed": failed,
+                 "rss_mb": rss_mb,
+                 "peak_rss_mb": peak_rss_mb,
+                 "details": run.details,
+                 "stages": run.stages}
+        try:
+            with open(run_log_path, "a") as log_file:
+                log_file.write(json.dumps(entry, default=str) + "\n")
+        except OSError as error:
+            print("..Run log not written!\n"
+                  "?" + str(error))
+
+    if profiler:
+        profile_path = os.path.join(profile_dir, run.name.replace(" ", "_") + "_" +
+                                    run.started.strftime("%Y%m%d_%H%M%S") + ".prof")
+        try:
+            os.makedirs(profile_dir, exist_ok=True)
+            profiler.dump_stats(profile_path)
+            print("> Profile saved at: " + profile_path)
+        except OSError as error:
+            print("..Profile not saved!\n"
+                  "?" + str(error))
+
+
+def printTable(run, total_seconds, peak_rss_mb):
+    """Prints the run's stages as a compact table"""
+
+    def rows(count):
+        return "{:,}".format(count) if count is not None else ""
+
+    def megabytes(size):
+        return "{:,.0f}".format(size) if size is not None else ""
+
+    print("> Timings (" + run.name + "):")
+    print("  {:<26}{:>9}{:>12}{:>12}{:>9}".format("stage", "seconds", "rows in", "rows out", "peak MB"))
+    for stage in run.stages:
+        name = "  " * stage["depth"] + stage["stage"]
+        print("  {:<26}{:>9.3f}{:>12}{:>12}{:>9}".format(name[:26], stage.get("seconds", 0.0),
+                                                         rows(stage["rows_in"]), rows(stage["rows_out"]),
+                                                         megabytes(stage.get("peak_rss_mb"))))
+    print("  {:<26}{:>9.3f}{:>12}{:>12}{:>9}".format("total", total_seconds, "", "", megabytes(peak_rss_mb)))
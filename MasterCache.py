@@ -0,0 +1,407 @@
+import datetime
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+import Schema
+import SheetReader
+
+
+# Where cached snapshots are stored; None keeps them in a folder next to the source file
+cache_dir = None
+default_cache_subdir = ".crg_cache"
+
+# Evict least recently used snapshots once the cache directory grows past this size
+max_cache_bytes = 2 * 1024 ** 3
+
+# Marker codes for values in mixed-type object columns (Arrow needs one type per column)
+KIND_NULL, KIND_STR, KIND_INT, KIND_FLOAT, KIND_DATETIME, KIND_BOOL = range(6)
+kind_suffix = " (kind)"
+
+
+def fileFingerprint(filepath):
+    """Builds a cache key from the file's path, size and modified time
+
+    :param filepath: path to the source workbook
+    :return: hex digest identifying this exact version of the file
+    """
+
+    stat = os.stat(filepath)
+    key = os.path.abspath(filepath) + "|" + str(stat.st_size) + "|" + str(stat.st_mtime_ns)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def cacheDirFor(filepath):
+    """Resolves the cache directory for a source file"""
+
+    if cache_dir:
+        return cache_dir
+    return os.path.join(os.path.dirname(os.path.abspath(filepath)), default_cache_subdir)
+
+
+def readMaster(filepath, prepare, prepare_version, columns=None, progress=None, cancel=None, discard=None):
+    """Reads a Commissions Master as a prepared (typed and normalized) dataframe, reusing cached snapshots
+
+    Unchanged files load straight from their snapshot. Otherwise the workbook is streamed
+    once against the row hash checkpoints of its last snapshot: leading rows that are
+    unchanged come from the snapshot, and only the rows from the first changed chunk on
+    (just the appended rows, if the file only grew at the bottom) are parsed and prepared.
+
+    :param filepath: path to the Commissions Master workbook
+    :param prepare: function turning a raw sheet dataframe (or a chunk of one) into the prepared dataframe
+    :param prepare_version: bumped whenever prepare changes, so older snapshots are rebuilt
+    :param columns: column names to keep (None keeps all); a missing one raises SheetReader.MissingColumns
+    :param progress: progress callback for streamed reads (see SheetReader.readWorkbook)
+    :param cancel: threading.Event that stops the read with SheetReader.LoadCancelled once set
+    :param discard: called with each prepared chunk dropped because its rows come from the snapshot
+    :return: (prepared dataframe, number of leading rows carried over from an earlier snapshot)
+    """
+
+    filename = os.path.basename(filepath)
+    columns = sorted(columns) if columns is not None else None
+
+    if feather is None:
+        print("..pyarrow not installed, reading without cache..")
+        return readSheet(filepath, columns, prepare, progress, cancel)[0], 0
+
+    key = fileFingerprint(filepath)
+    directory = cacheDirFor(filepath)
+    snapshot_path = os.path.join(directory, key + ".feather")
+    meta_path = os.path.join(directory, key + ".json")
+
+    # ----------------------
+    #  Cache Hit: Snapshot
+    # ----------------------
+
+    meta = readMeta(meta_path)
+    if snapshotMatches(meta, prepare_version, columns) and os.path.exists(snapshot_path):
+        try:
+            sheet_data = readSnapshot(snapshot_path, meta)
+
+            # Touch the snapshot so eviction treats it as recently used
+            os.utime(snapshot_path)
+            print("> Cache hit: loaded snapshot of " + filename)
+            return sheet_data, 0
+        except Exception as error:
+            print("..Cache snapshot unreadable, rebuilding..\n"
+                  "?" + str(error))
+
+    # ------------------------------------------
+    #  Cache Miss: Unchanged Leading Rows Reused
+    # ------------------------------------------
+
+    base_meta_path = latestSnapshotOf(filepath, directory, prepare_version, columns)
+    if base_meta_path is not None and SheetReader.isStreamable(filepath):
+        base_meta = readMeta(base_meta_path)
+        known_rows = base_meta["rows"]
+
+        # Snapshots from before checkpoints were kept can only confirm all of their rows at once
+        known_hashes = {int(rows): row_hash for rows, row_hash in base_meta.get("checkpoints", {}).items()}
+        known_hashes[known_rows] = base_meta["rows_hash"]
+
+        print("..Cache miss: checking " + filename + " for appended rows..")
+        tail_data, n_rows, verified_rows, rows_hash, checkpoints = SheetReader.readWorkbook(
+            filepath, known_hashes, columns, prepare, progress, cancel, discard)
+
+        base_snapshot_path = base_meta_path[:-len(".json")] + ".feather"
+        if verified_rows == known_rows:
+            print("> Incremental load: " + str(n_rows - known_rows) + " new rows appended to cached snapshot")
+        elif verified_rows == 0:
+            print("..Earlier rows changed since the last snapshot, rebuilt from this read..")
+        else:
+            print("..Rows changed after row {:,} since the last snapshot, reusing the rows before it..".format(
+                verified_rows))
+
+        if verified_rows:
+            sheet_data = readSnapshot(base_snapshot_path, base_meta)
+            if verified_rows < known_rows:
+                sheet_data = sheet_data.iloc[:verified_rows]
+            if n_rows > verified_rows:
+                sheet_data = Schema.concatFrames([sheet_data, tail_data])
+        else:
+            sheet_data = tail_data
+
+        writeSnapshot(sheet_data, filepath, directory, snapshot_path, meta_path, prepare_version, columns,
+                      rows_hash, checkpoints)
+        removeSnapshot(base_snapshot_path)
+        evictSnapshots(directory)
+        return sheet_data, verified_rows
+
+    # -----------------------
+    #  Cache Miss: Workbook
+    # -----------------------
+
+    print("..Cache miss: reading " + filename + "..")
+    sheet_data, rows_hash, checkpoints = readSheet(filepath, columns, prepare, progress, cancel)
+
+    writeSnapshot(sheet_data, filepath, directory, snapshot_path, meta_path, prepare_version, columns, rows_hash,
+                  checkpoints)
+    if base_meta_path is not None:
+        removeSnapshot(base_meta_path[:-len(".json")] + ".feather")
+    evictSnapshots(directory)
+
+    return sheet_data, 0
+
+
+def readSheet(filepath, columns, prepare, progress=None, cancel=None):
+    """Reads and prepares the whole first sheet of a workbook
+
+    :param filepath: path to the workbook
+    :param columns: column names to keep (None keeps all); a missing one raises SheetReader.MissingColumns
+    :param prepare: function turning the raw dataframe into the prepared dataframe
+    :param progress: progress callback for streamed reads
+    :param cancel: threading.Event that stops the read once set (.xls files only check it after reading)
+    :return: (prepared dataframe, hash of its rows and dict of row hash checkpoints,
+              both None if the file type can't be streamed)
+    """
+
+    if SheetReader.isStreamable(filepath):
+        sheet_data, _, _, rows_hash, checkpoints = SheetReader.readWorkbook(filepath, columns=columns,
+                                                                            prepare=prepare, progress=progress,
+                                                                            cancel=cancel)
+        return sheet_data, rows_hash, checkpoints
+
+    # Check the header alone before parsing the sheet
+    header = pd.read_excel(filepath, sheet_name=0, nrows=0).columns
+    missing = [col for col in columns if col not in header] if columns is not None else []
+    if missing:
+        raise SheetReader.MissingColumns(missing)
+
+    kept_names = [col for col in header if columns is None or col in columns]
+    raw_data = pd.read_excel(filepath, sheet_name=0, usecols=kept_names, dtype=Schema.parseTypes(kept_names))
+    if cancel is not None and cancel.is_set():
+        raise SheetReader.LoadCancelled()
+
+    sheet_data = prepare(raw_data)
+    Schema.printMemoryChange(Schema.memoryMB(raw_data), Schema.memoryMB(sheet_data))
+    return sheet_data, None, None
+
+
+def snapshotMatches(meta, prepare_version, columns):
+    """Checks that a snapshot was prepared by the current code from the same columns"""
+
+    return meta is not None and meta.get("version") == prepare_version and meta.get("columns") == columns
+
+
+def readMeta(meta_path):
+    """Reads a snapshot's JSON sidecar, or None if it's missing or unreadable"""
+
+    try:
+        with open(meta_path, "r") as meta_file:
+            return json.load(meta_file)
+    except (OSError, ValueError):
+        return None
+
+
+def readSnapshot(snapshot_path, meta):
+    """Loads a Feather snapshot back into the dataframe it was written from"""
+
+    sheet_data = decodeFrame(feather.read_feather(snapshot_path), meta["encoded_cols"])
+    for col in meta.get("categorical_cols", []):
+        sheet_data[col] = sheet_data[col].astype('category')
+    return sheet_data
+
+
+def latestSnapshotOf(filepath, directory, prepare_version, columns):
+    """Finds the newest snapshot of an earlier version of this file that can be appended to
+
+    :return: path to the snapshot's JSON sidecar, or None
+    """
+
+    if not os.path.isdir(directory):
+        return
+
+    source = os.path.abspath(filepath)
+    latest = None
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        meta_path = os.path.join(directory, name)
+        meta = readMeta(meta_path)
+        if not snapshotMatches(meta, prepare_version, columns) or meta.get("source") != source:
+            continue
+        if not meta.get("rows_hash") or not os.path.exists(meta_path[:-len(".json")] + ".feather"):
+            continue
+        if latest is None or meta["mtime_ns"] > latest[0]:
+            latest = (meta["mtime_ns"], meta_path)
+
+    return latest[1] if latest else None
+
+
+def writeSnapshot(sheet_data, filepath, directory, snapshot_path, meta_path, prepare_version, columns, rows_hash,
+                  checkpoints=None):
+    """Stores the prepared sheet data as a Feather file plus a small JSON sidecar
+
+    :param sheet_data: prepared dataframe
+    :param filepath: path to the source workbook
+    :param directory: cache directory
+    :param snapshot_path: destination of the Feather snapshot
+    :param meta_path: destination of the JSON sidecar
+    :param prepare_version: version of the prepare step that produced sheet_data
+    :param columns: sorted column names the snapshot was limited to (None for all)
+    :param rows_hash: hash of the source rows (None if unknown), used to detect appended rows later
+    :param checkpoints: optional dict of row count -> running row hash, to find the first changed rows later
+    :return: void; failures only skip caching
+    """
+
+    # Feather needs string column names; leave odd workbooks uncached
+    if not all(isinstance(col, str) for col in sheet_data.columns):
+        print("..Cache skipped: non-text column headers..")
+        return
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        encoded_df, encoded_cols, categorical_cols = encodeFrame(sheet_data)
+        feather.write_feather(encoded_df, snapshot_path)
+
+        stat = os.stat(filepath)
+        meta = {"source": os.path.abspath(filepath),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "rows": int(sheet_data.shape[0]),
+                "rows_hash": rows_hash,
+                "checkpoints": {str(rows): row_hash for rows, row_hash in (checkpoints or {}).items()},
+                "version": prepare_version,
+                "columns": columns,
+                "encoded_cols": encoded_cols,
+                "categorical_cols": categorical_cols}
+        with open(meta_path, "w") as meta_file:
+            json.dump(meta, meta_file)
+    except (OSError, ValueError, TypeError, ImportError) as error:
+        print("..Cache snapshot not written!\n"
+              "?" + str(error))
+        removeSnapshot(snapshot_path)
+
+
+def removeSnapshot(snapshot_path):
+    """Deletes a snapshot and its JSON sidecar"""
+
+    meta_path = snapshot_path[:-len(".feather")] + ".json"
+    for path in [snapshot_path, meta_path]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def evictSnapshots(directory):
+    """Deletes least recently used snapshots until the cache fits in max_cache_bytes"""
+
+    if not os.path.isdir(directory):
+        return
+
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith(".feather"):
+            path = os.path.join(directory, name)
+            entries.append((os.path.getmtime(path), path))
+
+    total = sum(os.path.getsize(path) for _, path in entries)
+    for _, path in sorted(entries):
+        if total <= max_cache_bytes:
+            break
+        total -= os.path.getsize(path)
+        removeSnapshot(path)
+        print("..Evicted cached snapshot: " + os.path.basename(path) + "..")
+
+
+# -------------------------------
+#  Mixed-Type Column Round Trip
+# -------------------------------
+
+def valueKind(value):
+    """Classifies a single cell value for mixed-column encoding"""
+
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NaT:
+        return KIND_NULL
+    if isinstance(value, str):
+        return KIND_STR
+    if isinstance(value, (bool, np.bool_)):
+        return KIND_BOOL
+    if isinstance(value, (int, np.integer)):
+        return KIND_INT
+    if isinstance(value, (float, np.floating)):
+        return KIND_FLOAT
+    if isinstance(value, datetime.datetime):
+        return KIND_DATETIME
+    return KIND_STR
+
+
+def encodeFrame(sheet_data):
+    """Splits mixed-type object columns into a text column and a kind column
+
+    Categoricals with text categories are stored as Arrow dictionaries as-is; ones with
+    mixed-type categories are encoded like object columns and re-categorized on load.
+
+    :param sheet_data: dataframe to store
+    :return: (Arrow-friendly dataframe, list of encoded column names, list of re-categorized column names)
+    """
+
+    encoded_df = sheet_data.reset_index(drop=True)
+    encoded_cols = []
+    categorical_cols = []
+
+    for col in sheet_data.columns:
+        values = sheet_data[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            if pd.api.types.infer_dtype(values.cat.categories, skipna=True) in ("string", "empty"):
+                continue
+            values = values.astype(object)
+            categorical_cols.append(col)
+        elif values.dtype != object:
+            continue
+        elif pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty"):
+            continue
+
+        values = values.values
+        kinds = np.fromiter((valueKind(value) for value in values), dtype=np.int8, count=len(values))
+        text = np.array([None if kind == KIND_NULL else
+                         value.isoformat() if kind == KIND_DATETIME else str(value)
+                         for value, kind in zip(values, kinds)], dtype=object)
+
+        encoded_df[col] = text
+        encoded_df[col + kind_suffix] = kinds
+        encoded_cols.append(col)
+
+    return encoded_df, encoded_cols, categorical_cols
+
+
+def decodeFrame(encoded_df, encoded_cols):
+    """Restores mixed-type object columns written by encodeFrame
+
+    :param encoded_df: dataframe read back from the snapshot
+    :param encoded_cols: names of the columns that were encoded
+    :return: dataframe matching the original read
+    """
+
+    for col in encoded_cols:
+        text = encoded_df[col].values
+        kinds = encoded_df[col + kind_suffix].values
+
+        values = np.full(len(text), np.nan, dtype=object)
+
+        is_str = kinds == KIND_STR
+        values[is_str] = text[is_str]
+
+        is_int = kinds == KIND_INT
+        values[is_int] = text[is_int].astype(np.int64).astype(object)
+
+        is_float = kinds == KIND_FLOAT
+        values[is_float] = text[is_float].astype(np.float64).astype(object)
+
+        is_bool = kinds == KIND_BOOL
+        values[is_bool] = (text[is_bool] == "True").astype(object)
+
+        is_datetime = kinds == KIND_DATETIME
+        values[is_datetime] = list(pd.to_datetime(text[is_datetime]).to_pydatetime())
+
+        encoded_df[col] = values
+        encoded_df = encoded_df.drop(columns=col + kind_suffix)
+
+    return encoded_df
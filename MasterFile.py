@@ -0,0 +1,370 @@
+import concurrent.futures
+import contextlib
+import hashlib
+import io
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import DateNormalizer
+import ExcelUtilities
+import Instrumentation
+import MasterCache
+import QueryEngine
+import RevenueCube
+import Schema
+import SheetReader
+
+
+# Date columns normalized to datetime after load
+date_cols = ['Invoice Date', 'Comm Month']
+
+# Bump whenever prepareFrame changes, so cached snapshots made by older code are rebuilt
+prepare_version = 4
+
+# Date layouts converted/coerced while preparing the file being loaded: col -> (converted, coerced)
+date_report = {}
+
+# Indexes from the most recent load, (source path, MasterIndexes), so appended rows can extend them
+last_loaded = (None, None)
+
+# Set in reader processes of a multi-file load: the load's shared cancel event (see initReader)
+reader_cancel = None
+
+# Column added when several masters are loaded together, naming each row's file
+source_column = "Source File"
+
+# Drop-down label of a saved group from queryGroups.xlsx, and the separator for typing several values
+group_prefix = "Group: "
+multi_separator = ";"
+
+
+class MasterIndexes:
+    """Indexes and aggregates built once over a loaded master and shared by every report
+
+    param cms_df -- typed Commissions Master with normalized date columns
+    param base -- optional indexes over the leading rows of cms_df; only rows after them are added
+    param fingerprint -- optional masterFingerprint of the loaded files, keys cached report results
+    """
+
+    def __init__(self, cms_df, base=None, fingerprint=None):
+        self.n_rows = cms_df.shape[0]
+        self.fingerprint = fingerprint
+
+        # Sort each date column once so time period queries can use binary search
+        if base is None:
+            self.date_indexes = QueryEngine.buildDateIndexes(cms_df)
+        else:
+            self.date_indexes = {col: index.extend(cms_df[col].values[index.size:])
+                                 for col, index in base.date_indexes.items()}
+
+        # Sum revenue by customer x principal x month so rankings skip the line items
+        self.revenue_cube = RevenueCube.RevenueCube(cms_df, Schema.actualColumnName('Revenue'), self.date_indexes,
+                                                    base.revenue_cube if base is not None else None)
+
+
+def normalizeDates(cms_df):
+    """Converts the date columns of a loaded master to datetime, in place
+    Q#YYYY quarters become the first day of the quarter (see DateNormalizer for the other layouts)
+
+    :param cms_df: loaded dataframe of the Commissions Master
+    :return: dict of date column -> (dict of layout -> values converted, dict of layout -> values coerced to NaT)
+    """
+
+    report = {}
+    for col in date_cols:
+        cms_df[col], converted, coerced = DateNormalizer.normalizeColumn(cms_df[col])
+        report[col] = (converted, coerced)
+    return report
+
+
+def prepareFrame(raw_df):
+    """Types, normalizes and validates a raw sheet, or one chunk of it
+
+    :param raw_df: dataframe as read from the workbook
+    :return: typed dataframe with datetime date columns and a validity bitmap column
+    """
+
+    cms_df = Schema.applySchema(raw_df, verbose=False)
+
+    if all(col in cms_df.columns for col in date_cols):
+        # Chunks of one file add up into a single report; the chunk keeps its own counts for discardFrame
+        chunk_report = normalizeDates(cms_df)
+        for col, (converted, coerced) in chunk_report.items():
+            converted_totals, coerced_totals = date_report.setdefault(col, ({}, {}))
+            DateNormalizer.addCounts(converted_totals, converted)
+            DateNormalizer.addCounts(coerced_totals, coerced)
+        cms_df.attrs["date_report"] = chunk_report
+
+    cms_df[Schema.validity_column] = Schema.validityBitmap(raw_df, cms_df)
+
+    return cms_df
+
+
+def discardFrame(cms_df):
+    """Takes a prepared chunk the reader dropped (its rows came from the snapshot) back out of date_report
+
+    :param cms_df: chunk returned by prepareFrame
+    :return: void; date_report updated
+    """
+
+    for col, (converted, coerced) in cms_df.attrs.get("date_report", {}).items():
+        converted_totals, coerced_totals = date_report[col]
+        DateNormalizer.removeCounts(converted_totals, converted)
+        DateNormalizer.removeCounts(coerced_totals, coerced)
+
+
+def loadMaster(filepath, progress=SheetReader.printProgress, cancel=None):
+    """Loads, types and normalizes a Commissions Master and builds its indexes (used by GUI and command line)
+
+    :param filepath: path to the Commissions Master workbook
+    :param progress: called with (rows read, total rows, rows per second) while the workbook streams in
+    :param cancel: threading.Event; once set, loading stops with SheetReader.LoadCancelled
+    :return: (typed and normalized dataframe, MasterIndexes), or (None, None) if columns are missing
+    """
+
+    global last_loaded
+
+    with Instrumentation.measureRun("load master", {"file": os.path.basename(filepath)}):
+        # Only the ReportColumns.xlsx columns are read, and all of them are required
+        rcl_df = ExcelUtilities.loadLookupFile("ReportColumns.xlsx", "Columns")
+        columns = list(rcl_df.columns) if rcl_df is not None else None
+
+        # Taken before reading, so a file saved mid-load can't pass for the version read
+        fingerprint = masterFingerprint([filepath])
+
+        # Reuses the cached snapshot if the file hasn't changed, or only reads rows appended since
+        with Instrumentation.measure("read master") as stage:
+            date_report.clear()
+            try:
+                cms_df, carried_rows = MasterCache.readMaster(filepath, prepareFrame, prepare_version, columns,
+                                                              progress, cancel, discardFrame)
+            except SheetReader.MissingColumns as error:
+                printMissingColumns(filepath, error.missing)
+                print("..Make sure to select a commissions file with all the required columns for the report.")
+                return None, None
+            stage["rows_out"] = cms_df.shape[0]
+        for col, (converted, coerced) in date_report.items():
+            DateNormalizer.printReport(col, converted, coerced)
+        Schema.printQualityReport(cms_df)
+        print("..Memory: {:,.1f} MB for {:,} rows x {} columns..".format(Schema.memoryMB(cms_df), *cms_df.shape))
+
+        if cancel is not None and cancel.is_set():
+            raise SheetReader.LoadCancelled()
+
+        # Extend the previous indexes with the appended rows when this file was loaded before
+        with Instrumentation.measure("build indexes", rows_in=cms_df.shape[0]):
+            source = os.path.abspath(filepath)
+            base_source, base = last_loaded
+            if carried_rows and base_source == source and base.n_rows == carried_rows:
+                indexes = MasterIndexes(cms_df, base, fingerprint)
+            else:
+                indexes = MasterIndexes(cms_df, fingerprint=fingerprint)
+            last_loaded = (source, indexes)
+
+    return cms_df, indexes
+
+
+def loadMasters(filepaths, progress=SheetReader.printProgress, cancel=None, max_workers=None):
+    """Loads one or more Commissions Masters (e.g. one per fiscal year) as a single dataframe
+
+    Several files are read in parallel worker processes, each through its own snapshot
+    cache, checked against ReportColumns.xlsx and stacked with a Source File column,
+    so queries and rankings run across all of them at once.
+
+    :param filepaths: list of Commissions Master workbooks
+    :param progress: called with (rows loaded, total rows or None, rows per second) as files finish
+    :param cancel: threading.Event; once set, loading stops with SheetReader.LoadCancelled
+    :param max_workers: number of reader processes (default: one per file, up to one per CPU)
+    :return: (typed and normalized dataframe, MasterIndexes), or (None, None) if columns are missing
+    """
+
+    if len(filepaths) == 1:
+        return loadMaster(filepaths[0], progress, cancel)
+
+    with Instrumentation.measureRun("load masters", {"files": [os.path.basename(path) for path in filepaths]}):
+        rcl_df = ExcelUtilities.loadLookupFile("ReportColumns.xlsx", "Columns")
+        columns = list(rcl_df.columns) if rcl_df is not None else None
+        fingerprint = masterFingerprint(filepaths)
+
+        # -------------------------------
+        #  Read Files in Worker Processes
+        # -------------------------------
+
+        frames = {}
+        missing = {}
+        with Instrumentation.measure("read files") as stage:
+            read_start = time.perf_counter()
+            n_workers = min(len(filepaths), max_workers or os.cpu_count() or 1)
+
+            # Workers check this event as they stream rows, so a cancelled load stops them mid-read
+            stop_reading = multiprocessing.Event()
+            pool = concurrent.futures.ProcessPoolExecutor(max_workers=n_workers, initializer=initReader,
+                                                          initargs=(stop_reading,))
+            try:
+                futures = {pool.submit(readSource, filepath, columns, ExcelUtilities.look_dir): filepath
+                           for filepath in filepaths}
+                pending = set(futures)
+                rows_loaded = 0
+                while pending and not missing:
+                    if cancel is not None and cancel.is_set():
+                        raise SheetReader.LoadCancelled()
+
+                    done, pending = concurrent.futures.wait(pending, timeout=0.2,
+                                                            return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        filepath = futures[future]
+                        try:
+                            sheet_data, console_text, file_date_report = future.result()
+                        except SheetReader.MissingColumns as error:
+                            # Checked from the header row; no point reading the other files
+                            missing[filepath] = error.missing
+                            continue
+
+                        # Workers can't print to the GUI console; replay what they printed
+                        print(console_text, end="")
+                        for col, (converted, coerced) in file_date_report.items():
+                            DateNormalizer.printReport(col, converted, coerced)
+
+                        frames[filepath] = sheet_data
+                        rows_loaded += sheet_data.shape[0]
+                        print("> Loaded {} ({:,} rows, {} of {} files)".format(
+                            os.path.basename(filepath), sheet_data.shape[0], len(frames), len(filepaths)))
+                        if progress:
+                            progress(rows_loaded, None, rows_loaded / (time.perf_counter() - read_start))
+            finally:
+                # Files still reading stop at their next check (no snapshot is written); queued ones never start
+                if pending:
+                    stop_reading.set()
+                pool.shutdown(wait=True, cancel_futures=True)
+            stage["rows_out"] = rows_loaded
+
+        # Every file must have every ReportColumns.xlsx column
+        if missing:
+            for filepath, missing_cols in missing.items():
+                printMissingColumns(filepath, missing_cols)
+            print("..Make sure to select commissions files with all the required columns for the report.")
+            return None, None
+
+        # ---------------------------------
+        #  Combine Into One Typed Dataframe
+        # ---------------------------------
+
+        with Instrumentation.measure("combine files", rows_in=rows_loaded):
+            for filepath in filepaths:
+                frames[filepath][source_column] = pd.Categorical.from_codes(
+                    np.zeros(frames[filepath].shape[0], dtype=np.int8), [os.path.basename(filepath)])
+            cms_df = Schema.concatFrames([frames.pop(filepath) for filepath in filepaths])
+        Schema.printQualityReport(cms_df)
+        print("..Memory: {:,.1f} MB for {:,} rows x {} columns..".format(Schema.memoryMB(cms_df), *cms_df.shape))
+
+        if cancel is not None and cancel.is_set():
+            raise SheetReader.LoadCancelled()
+
+        with Instrumentation.measure("build indexes", rows_in=cms_df.shape[0]):
+            indexes = MasterIndexes(cms_df, fingerprint=fingerprint)
+
+    return cms_df, indexes
+
+
+def initReader(cancel):
+    """Worker process initializer: keeps the load's cancel event for readSource"""
+
+    global reader_cancel
+    reader_cancel = cancel
+
+
+def readSource(filepath, columns, look_dir):
+    """Worker process entry: reads and prepares one file of a multi-file load
+
+    :param filepath: Commissions Master workbook
+    :param columns: column names to keep
+    :param look_dir: lookup directory of the parent process
+    :return: (prepared dataframe, console output, date report)
+    """
+
+    ExcelUtilities.look_dir = look_dir
+
+    console = io.StringIO()
+    with contextlib.redirect_stdout(console):
+        date_report.clear()
+        sheet_data, _ = MasterCache.readMaster(filepath, prepareFrame, prepare_version, columns, progress=None,
+                                               cancel=reader_cancel, discard=discardFrame)
+
+    return sheet_data, console.getvalue(), dict(date_report)
+
+
+def printMissingColumns(filepath, missing_cols):
+    """Prints which required columns a Commissions Master's header lacks"""
+
+    print("..Required columns not found in " + os.path.basename(filepath) + ": " +
+          ", ".join(str(col) for col in missing_cols))
+
+
+def masterName(filepaths):
+    """Names a load for report file names: the first file's name, plus how many files were loaded with it"""
+
+    name = os.path.basename(filepaths[0]).split(".xls")[0]
+    return name if len(filepaths) == 1 else name + "+" + str(len(filepaths) - 1)
+
+
+def masterFingerprint(filepaths):
+    """Identifies exactly which versions of the master files were loaded, in order, and how they were prepared"""
+
+    key = "|".join(MasterCache.fileFingerprint(filepath) for filepath in filepaths) + "|" + str(prepare_version)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def queryOptions(cms_df):
+    """Builds the principal and customer drop-down options for a loaded master (safe off the GUI thread)
+    Saved groups from queryGroups.xlsx come first
+
+    :param cms_df: loaded dataframe of the Commissions Master
+    :return: (principal groups + sorted principal full names, customer groups + sorted customer names),
+             or None if principalList.xlsx can't be read
+    """
+
+    principal_maps = ExcelUtilities.loadPrincipalMaps()
+    if principal_maps is None:
+        return
+    dict_abbrev_to_pcp, _ = principal_maps
+
+    # Principal column holds 3-letter abbreviations; the drop-down shows full company names
+    principal_options = sorted(dict_abbrev_to_pcp[abbrev] for abbrev in cms_df['Principal'].unique()
+                               if abbrev in dict_abbrev_to_pcp)
+    customer_options = sorted(cms_df['T-End Cust'].unique())
+
+    principal_groups = [group_prefix + name for name in ExcelUtilities.loadQueryGroups("Principals")]
+    customer_groups = [group_prefix + name for name in ExcelUtilities.loadQueryGroups("Customers")]
+
+    return principal_groups + principal_options, customer_groups + customer_options
+
+
+def selectionFromText(text, sheet_name, known_names=(), report_unknown=True):
+    """Reads customer or principal option text: a saved group, several values separated by ";", or one value
+
+    :param text: drop-down (or command line) text, e.g. "Group: Key Accounts" or "Customer A; Customer B"
+    :param sheet_name: queryGroups.xlsx sheet the groups come from ("Customers" or "Principals")
+    :param known_names: customer or principal names taken whole, even with ";" in them
+    :param report_unknown: print a group name missing from queryGroups.xlsx (off for previews)
+    :return: QueryEngine.Selection for a group or several values, otherwise the text itself
+    """
+
+    if text.startswith(group_prefix):
+        name = text[len(group_prefix):]
+        members = ExcelUtilities.loadQueryGroups(sheet_name).get(name)
+        if members:
+            return QueryEngine.Selection(name, tuple(members))
+        if report_unknown:
+            print("..No {} group named {} in {}..".format(sheet_name.lower(), name, ExcelUtilities.groups_filename))
+
+    if text in known_names:
+        return text
+
+    values = [value.strip() for value in text.split(multi_separator) if value.strip()]
+    if len(values) > 1:
+        return QueryEngine.selectionOf(values)
+    return text
@@ -0,0 +1,227 @@
+import collections
+
+import numpy as np
+import pandas as pd
+
+import EnumTypes
+
+
+# Commissions columns used by the query options
+customer_column = 'T-End Cust'
+principal_column = 'Principal'
+date_columns = {EnumTypes.DateColumn.PAID: 'Comm Month',
+                EnumTypes.DateColumn.INVOICE: 'Invoice Date'}
+
+# Rows sampled to estimate how selective each filter is
+selectivity_sample_size = 10000
+
+# Several customers or principals queried together (a saved group, or values picked together)
+#   name -- label for report names and the console
+#   members -- tuple of customer names, or of principal full names
+Selection = collections.namedtuple("Selection", ["name", "members"])
+
+
+class QuerySpec:
+    """Filters for a single report, compiled to vectorized masks instead of query strings
+
+    param date_column -- name of the date column for the time period filter (None for no filter)
+    param start_date -- first date of the time period (inclusive)
+    param end_date -- last date of the time period (inclusive)
+    param principals -- principal abbreviations to keep (None for all)
+    param customers -- customer names to keep (None for all)
+    """
+
+    def __init__(self, date_column=None, start_date=None, end_date=None, principals=None, customers=None):
+        self.date_column = date_column
+        self.start_date = start_date
+        self.end_date = end_date
+        self.principals = set(principals) if principals is not None else None
+        self.customers = set(customers) if customers is not None else None
+
+    @classmethod
+    def fromOptions(cls, customer, abbreviation, date_column, start_date, end_date):
+        """Builds a spec from the GUI query options
+
+        :param customer: drop-down selection for customer query (enum type, customer name or Selection)
+        :param abbreviation: principal abbreviation, list of abbreviations, or None for all principals
+        :param date_column: EnumTypes.DateColumn selection
+        :param start_date: first date of time interval for query
+        :param end_date: last date of time interval for query
+        :return: QuerySpec
+        """
+
+        if isinstance(customer, Selection):
+            customers = customer.members
+        else:
+            customers = [customer] if not isinstance(customer, EnumTypes.Customer) else None
+
+        return cls(date_column=date_columns.get(date_column),
+                   start_date=start_date,
+                   end_date=end_date,
+                   principals=[abbreviation] if isinstance(abbreviation, str) else abbreviation,
+                   customers=customers)
+
+    def predicates(self):
+        """Lists the active filters as (column, mask function) pairs"""
+
+        predicates = []
+
+        if self.date_column:
+            start, end = self.dateBounds()
+
+            def inDateRange(values):
+                if not np.issubdtype(values.dtype, np.datetime64):
+                    values = pd.to_datetime(values, errors='coerce').values
+                return (values >= start) & (values <= end)
+
+            predicates.append((self.date_column, inDateRange))
+
+        if self.principals is not None:
+            predicates.append((principal_column, memberMask(self.principals)))
+
+        if self.customers is not None:
+            predicates.append((customer_column, memberMask(self.customers)))
+
+        return predicates
+
+    def dateBounds(self):
+        """Returns the time period as datetime64 values for comparing against date columns"""
+
+        return np.datetime64(pd.Timestamp(self.start_date)), np.datetime64(pd.Timestamp(self.end_date))
+
+    def evaluate(self, df, date_indexes=None, candidates=None):
+        """Finds the rows of df matching every filter
+
+        If a sorted index exists for the date column, the time period is sliced from it first.
+        Remaining filters are estimated on a sample and run from most to least selective;
+        each later filter only looks at the rows that survived the earlier ones.
+
+        :param df: commissions dataframe (any index)
+        :param date_indexes: optional dict of date column name -> DateIndex built over df
+        :param candidates: optional sorted row positions to search within (e.g. one principal's rows)
+        :return: sorted numpy array of matching row positions
+        """
+
+        n_rows = df.shape[0]
+        predicates = self.predicates()
+
+        if not predicates or n_rows == 0:
+            return np.arange(n_rows) if candidates is None else candidates
+
+        positions = candidates
+
+        # Time period via binary search on the sorted date index
+        date_index = (date_indexes or {}).get(self.date_column)
+        if candidates is None and date_index is not None and date_index.size == n_rows:
+            positions = date_index.positions(*self.dateBounds())
+            predicates = [pair for pair in predicates if pair[0] != self.date_column]
+
+        for col, predicate in orderBySelectivity(df, predicates):
+            values = df[col].values
+            if positions is None:
+                positions = np.flatnonzero(predicate(values))
+            else:
+                positions = positions[predicate(values[positions])]
+            if positions.size == 0:
+                break
+
+        return positions
+
+
+def memberMask(members):
+    """Creates a mask function for set membership, one vectorized pass however many members there are
+
+    Categorical columns are matched on their integer codes through a lookup table,
+    other columns through a hash-based isin.
+    """
+
+    members = list(members)
+
+    def isMember(values):
+        if isinstance(values, pd.Categorical):
+            # Code -1 (missing) reads the table's last slot, which is never a member
+            is_member_code = np.zeros(len(values.categories) + 1, dtype=bool)
+            member_codes = values.categories.get_indexer(members)
+            is_member_code[member_codes[member_codes >= 0]] = True
+            return is_member_code[values.codes]
+        return pd.Series(values, copy=False).isin(members).values
+
+    return isMember
+
+
+def selectionOf(values):
+    """Bundles several picked customers or principals into a Selection named after them
+
+    :param values: list of customer names or principal full names
+    :return: Selection, or the value itself if only one was picked
+    """
+
+    values = list(dict.fromkeys(values))
+    if len(values) == 1:
+        return values[0]
+    return Selection(str(values[0]) + "+" + str(len(values) - 1), tuple(values))
+
+
+def orderBySelectivity(df, predicates):
+    """Sorts predicates so the one keeping the fewest rows runs first
+
+    :param df: commissions dataframe
+    :param predicates: list of (column, mask function) pairs
+    :return: predicates ordered from most to least selective
+    """
+
+    if len(predicates) < 2:
+        return predicates
+
+    # Evenly spaced sample, so sorted or appended data doesn't bias the estimate
+    step = max(1, df.shape[0] // selectivity_sample_size)
+
+    def keptFraction(predicate_pair):
+        col, predicate = predicate_pair
+        return predicate(df[col].values[::step]).mean()
+
+    return sorted(predicates, key=keptFraction)
+
+
+class DateIndex:
+    """Sort permutation of one date column, for answering time periods with binary search
+
+    param values -- datetime64 values of the date column (NaT sorts to the end)
+    """
+
+    def __init__(self, values):
+        self.order = np.argsort(values, kind='stable')
+        self.sorted_values = values[self.order]
+        self.size = len(values)
+
+    def extend(self, new_values):
+        """Returns a DateIndex covering this index's rows plus new_values appended after them
+        Only the new values are sorted; they're merged into the existing order by binary search"""
+
+        new_index = DateIndex(new_values)
+        insert_at = np.searchsorted(self.sorted_values, new_index.sorted_values, side='right')
+        new_index.order = np.insert(self.order, insert_at, new_index.order + self.size)
+        new_index.sorted_values = np.insert(self.sorted_values, insert_at, new_index.sorted_values)
+        new_index.size = self.size + len(new_values)
+        return new_index
+
+    def positions(self, start, end):
+        """Returns the sorted row positions with start <= date <= end"""
+
+        lo = np.searchsorted(self.sorted_values, start, side='left')
+        hi = np.searchsorted(self.sorted_values, end, side='right')
+        return np.sort(self.order[lo:hi])
+
+
+def buildDateIndexes(df):
+    """Builds a DateIndex for each datetime query column in df
+
+    :param df: commissions dataframe with normalized date columns
+    :return: dict of date column name -> DateIndex
+    """
+
+    date_indexes = {}
+    for col in date_columns.values():
+        if col in df.columns and np.issubdtype(df[col].dtype, np.datetime64):
+            date_indexes[col] = DateIndex(df[col].values)
+    return date_indexes
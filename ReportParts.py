@@ -0,0 +1,209 @@
+import collections
+import concurrent.futures
+import os
+
+import numpy as np
+import pandas as pd
+
+import ExcelUtilities
+import Instrumentation
+
+
+# Reports with more rows than this are split into part workbooks (a sheet holds 1,048,576 rows, header included)
+split_rows = 1048575
+
+# Most rows written to one part workbook; smaller parts save faster and in parallel
+part_rows = 500000
+
+# Sheet of the index workbook listing the parts
+index_sheet_name = "Parts"
+index_col_widths = [6, 50, 20, 12, 14]
+
+# One part of a split report
+#   rows -- indices into the report's row positions, in report order
+#   principals -- principal abbreviations in the part, in name order
+#   revenue -- total revenue of the part's rows
+Part = collections.namedtuple("Part", ["rows", "principals", "revenue"])
+
+
+def partitionRows(principals, revenue, max_rows=None):
+    """Splits a report's rows into parts of at most max_rows rows, keeping each principal's rows together
+
+    Principals are packed into parts in name order. A principal with more than
+    max_rows rows gets parts of its own, cut into row blocks.
+
+    :param principals: principal of each report row
+    :param revenue: revenue of each report row (NaN where invalid)
+    :param max_rows: most rows per part (default part_rows)
+    :return: list of Part
+    """
+
+    max_rows = max_rows or part_rows
+
+    # Blank principals sort last, as their own group
+    codes, names = pd.factorize(principals, sort=True)
+    names = [str(name) for name in names] + ["(blank)"]
+    codes = np.where(codes < 0, len(names) - 1, codes)
+
+    # One stable sort groups rows by principal, keeping report order within each principal
+    order = np.argsort(codes, kind='stable')
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(names)))])
+
+    parts = []
+    pending = []
+
+    def flush():
+        if pending:
+            rows = np.sort(np.concatenate([group for _, group in pending]))
+            parts.append(Part(rows, [names[code] for code, _ in pending], float(np.nansum(revenue[rows]))))
+            pending.clear()
+
+    for code in range(len(names)):
+        group = order[bounds[code]:bounds[code + 1]]
+        if group.size == 0:
+            continue
+        if group.size > max_rows:
+            flush()
+            for block_start in range(0, group.size, max_rows):
+                rows = group[block_start:block_start + max_rows]
+                parts.append(Part(rows, [names[code]], float(np.nansum(revenue[rows]))))
+            continue
+        if sum(pending_group.size for _, pending_group in pending) + group.size > max_rows:
+            flush()
+        pending.append((code, group))
+    flush()
+
+    return parts
+
+
+def exportParts(output_path, parts, part_frame, sorted_df, col_widths, cust_rank_col_widths, summary_sheets=(),
+                max_workers=None):
+    """Writes a split report: part workbooks in parallel, then an index workbook at output_path
+
+    Part workbooks are named after the report, e.g. "report (part 2 of 3).xlsx", and each
+    holds one "Data" sheet. The index workbook lists the parts and their totals, followed
+    by the customer ranking and any summary sheets.
+
+    :param output_path: filepath for the index workbook
+    :param parts: list of Part from partitionRows
+    :param part_frame: function turning a Part's rows into its "Data" sheet dataframe
+    :param sorted_df: ranked customers ("Customers Ranked" sheet)
+    :param col_widths: widths of the report columns
+    :param cust_rank_col_widths: widths of the ranked customer columns
+    :param summary_sheets: optional Summaries.SummarySheet list
+    :param max_workers: number of writer processes (default: one per part, up to one per CPU)
+    :return: whether the index and every part were saved
+    """
+
+    base_path, extension = os.path.splitext(output_path)
+    part_paths = [base_path + " (part {} of {})".format(number, len(parts)) + extension
+                  for number in range(1, len(parts) + 1)]
+
+    print("..Splitting {:,} rows into {} part files..".format(sum(part.rows.size for part in parts), len(parts)))
+
+    # Check every file up front, so no part is written if one of them is open
+    if ExcelUtilities.saveError(output_path, *part_paths):
+        print("..One or more files are currently open in Excel!\n"
+              "..Please close the files and try again.\n"
+              "*Program Terminated*")
+        print("> File NOT successfully saved.\n"
+              "> Make sure to close all files with matching names in the Output directory.")
+        return False
+
+    # -------------------------------
+    #  Write Parts in Worker Processes
+    # -------------------------------
+
+    saved = {}
+    with Instrumentation.measure("write parts", rows_in=sum(part.rows.size for part in parts)):
+        n_workers = min(len(parts), max_workers or os.cpu_count() or 1)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as pool:
+            # A part's rows are copied out just before it's handed to a worker, with at most n_workers
+            # parts in flight, so the parent never holds more than that many part copies at once
+            queued = iter(zip(parts, part_paths))
+            running = {}
+
+            def submitNext():
+                next_part = next(queued, None)
+                if next_part is not None:
+                    part, part_path = next_part
+                    running[pool.submit(exportPart, part_path, part_frame(part.rows), col_widths)] = part_path
+
+            for _ in range(n_workers):
+                submitNext()
+
+            while running:
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    part_path = running.pop(future)
+                    try:
+                        saved[part_path] = future.result()
+                    except Exception as error:
+                        print("..Unexpected Python error writing " + os.path.basename(part_path) + ":\n" +
+                              "?" + str(error))
+                        saved[part_path] = False
+                    if saved[part_path]:
+                        print("> Part saved at: " + part_path)
+                    submitNext()
+
+    # ----------------------
+    #  Write Index Workbook
+    # ----------------------
+
+    index_df = indexFrame(parts, part_paths)
+
+    writer = ExcelUtilities.createExcelFile(output_path)
+    if not writer:
+        print("> File NOT successfully saved.\n"
+              "> Make sure to close all files with matching names in the Output directory.")
+        return False
+
+    ExcelUtilities.writeSheet(writer, index_df, index_sheet_name, index_col_widths)
+    ExcelUtilities.writeSheet(writer, sorted_df, ExcelUtilities.default_more_sheet_name, cust_rank_col_widths)
+    for summary in summary_sheets:
+        ExcelUtilities.writeSheet(writer, summary.sheet_data, summary.name, summary.col_widths,
+                                  summary.accounting_cols)
+    with Instrumentation.measure("save file"):
+        writer.close()
+
+    if not all(saved.values()):
+        print("> Index saved, but " + str(list(saved.values()).count(False)) + " part file(s) NOT saved.")
+        return False
+
+    print("> File successfully saved!")
+    return True
+
+
+def exportPart(part_path, part_df, col_widths):
+    """Worker process entry: writes one part workbook
+
+    :return: whether the file was saved
+    """
+
+    writer = ExcelUtilities.createExcelFile(part_path)
+    if not writer:
+        return False
+
+    ExcelUtilities.writeSheet(writer, part_df, ExcelUtilities.default_sheet_name, col_widths)
+    writer.close()
+    return True
+
+
+def indexFrame(parts, part_paths):
+    """Lists the parts of a split report, with a total row
+
+    :return: dataframe of Part, File, Principals, Rows and Revenue
+    """
+
+    def principalRange(principals):
+        return principals[0] if len(principals) == 1 else principals[0] + " to " + principals[-1]
+
+    index_df = pd.DataFrame({'Part': [str(number) for number in range(1, len(parts) + 1)],
+                             'File': [os.path.basename(part_path) for part_path in part_paths],
+                             'Principals': [principalRange(part.principals) for part in parts],
+                             'Rows': [part.rows.size for part in parts],
+                             'Revenue': [part.revenue for part in parts]})
+    total_df = pd.DataFrame({'Part': [""], 'File': ["Total"], 'Principals': [""],
+                             'Rows': [index_df['Rows'].sum()], 'Revenue': [index_df['Revenue'].sum()]})
+
+    return pd.concat([index_df, total_df], ignore_index=True)
@@ -0,0 +1,209 @@
+import collections
+import datetime
+import enum
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import ExcelUtilities
+import Instrumentation
+import MasterCache
+import QueryEngine
+
+
+# Where cached report results are stored; None keeps them in a folder next to the output report
+cache_dir = None
+default_cache_subdir = ".crg_results"
+
+# Evict least recently used results once the cache directory grows past this size
+max_cache_bytes = 512 * 1024 ** 2
+
+# Finished reports larger than this (and split reports) keep only their rows and ranking (re-exported on a hit)
+max_report_bytes = 64 * 1024 ** 2
+
+# Turn the result cache off (e.g. when comparing fresh runs)
+enabled = True
+
+# Bump whenever the query, ranking or export steps change, so results made by older code are recomputed
+result_version = 1
+
+# Lookup files whose changes invalidate cached results
+lookup_files = ["ReportColumns.xlsx", "principalList.xlsx", ExcelUtilities.groups_filename]
+
+# A cached result
+#   positions -- row positions of the report rows in the loaded master
+#   sorted_df -- ranked customers ("Customers Ranked" sheet)
+#   report_path -- cached finished report, or None if only the rows and ranking were kept
+CachedResult = collections.namedtuple("CachedResult", ["positions", "sorted_df", "report_path"])
+
+
+def cacheDirFor(output_path):
+    """Resolves the result cache directory for an output report"""
+
+    if cache_dir:
+        return cache_dir
+    return os.path.join(os.path.dirname(os.path.abspath(output_path)), default_cache_subdir)
+
+
+def resultKey(master_fingerprint, customer, principal, date_column, start_date, end_date, summaries=False):
+    """Builds a cache key from the loaded masters, the lookup files and the normalized query options
+
+    :param master_fingerprint: MasterIndexes.fingerprint of the loaded master(s)
+    :param customer: customer query (enum type, customer name or QueryEngine.Selection)
+    :param principal: principal query (enum type, full name or QueryEngine.Selection)
+    :param date_column: EnumTypes.DateColumn of the time period query
+    :param start_date: first date of time interval
+    :param end_date: last date of time interval
+    :param summaries: whether the report carries the summary sheets
+    :return: hex digest identifying this exact report
+    """
+
+    lookups = {}
+    for filename in lookup_files:
+        path = os.path.join(ExcelUtilities.look_dir, filename)
+        lookups[filename] = MasterCache.fileFingerprint(path) if os.path.exists(path) else None
+
+    spec = {"version": result_version,
+            "master": master_fingerprint,
+            "lookups": lookups,
+            "customer": optionKey(customer),
+            "principal": optionKey(principal),
+            "date_column": optionKey(date_column),
+            "start_date": optionKey(start_date),
+            "end_date": optionKey(end_date),
+            "summaries": bool(summaries)}
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def optionKey(option):
+    """Normalizes one query option for the cache key (groups by their members, in any order)"""
+
+    if isinstance(option, QueryEngine.Selection):
+        return sorted(str(member) for member in option.members)
+    if isinstance(option, enum.Enum):
+        return type(option).__name__ + "." + option.name
+    if isinstance(option, datetime.date):
+        return pd.Timestamp(option).date().isoformat()
+    return str(option)
+
+
+def lookup(key, output_path):
+    """Finds the cached result of an identical earlier report
+
+    :param key: resultKey of the report
+    :param output_path: filepath for the output report (locates the cache)
+    :return: CachedResult, or None on a cache miss
+    """
+
+    if not enabled:
+        return
+
+    base_path = os.path.join(cacheDirFor(output_path), key)
+    try:
+        with open(base_path + ".json", "r") as meta_file:
+            meta = json.load(meta_file)
+        positions = np.load(base_path + ".npy", allow_pickle=False)
+    except (OSError, ValueError):
+        return
+
+    sorted_df = pd.DataFrame(meta["ranking"], columns=meta["ranking_columns"])
+    report_path = base_path + ".xlsx" if os.path.exists(base_path + ".xlsx") else None
+
+    # Touch the entry so eviction treats it as recently used
+    os.utime(base_path + ".json")
+    return CachedResult(positions, sorted_df, report_path)
+
+
+def store(key, output_path, positions, sorted_df, keep_report=True):
+    """Caches a finished report's rows and ranking, plus a copy of the report if it's small enough
+
+    :param key: resultKey of the report
+    :param output_path: the saved output report
+    :param positions: row positions of the report rows
+    :param sorted_df: ranked customers
+    :param keep_report: keep a copy of the report (off for split reports, whose parts are separate files)
+    :return: void; failures only skip caching
+    """
+
+    if not enabled:
+        return
+
+    directory = cacheDirFor(output_path)
+    base_path = os.path.join(directory, key)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        np.save(base_path + ".npy", np.asarray(positions, dtype=np.int64))
+        if keep_report and os.path.getsize(output_path) <= max_report_bytes:
+            shutil.copyfile(output_path, base_path + ".xlsx")
+
+        meta = {"report": os.path.basename(output_path),
+                "rows": int(len(positions)),
+                "ranking_columns": [str(col) for col in sorted_df.columns],
+                "ranking": sorted_df.values.tolist()}
+
+        # Written last: an entry only counts once its sidecar exists
+        with open(base_path + ".json", "w") as meta_file:
+            json.dump(meta, meta_file, default=str)
+    except (OSError, ValueError, TypeError) as error:
+        print("..Result not cached!\n"
+              "?" + str(error))
+        removeEntry(base_path)
+        return
+
+    evictResults(directory)
+
+
+def copyReport(cached_path, output_path):
+    """Copies a cached finished report to the output path
+
+    :return: whether the file was saved
+    """
+
+    if ExcelUtilities.saveError(output_path):
+        print("..One or more files are currently open in Excel!\n"
+              "..Please close the files and try again.\n"
+              "*Program Terminated*")
+        print("> File NOT successfully saved.\n"
+              "> Make sure to close all files with matching names in the Output directory.")
+        return False
+
+    with Instrumentation.measure("copy file"):
+        shutil.copyfile(cached_path, output_path)
+
+    print("> Cache hit: copied the identical earlier report to " + output_path)
+    return True
+
+
+def removeEntry(base_path):
+    """Deletes a cached result's files"""
+
+    for suffix in [".json", ".npy", ".xlsx"]:
+        if os.path.exists(base_path + suffix):
+            os.remove(base_path + suffix)
+
+
+def evictResults(directory):
+    """Deletes least recently used results until the cache fits in max_cache_bytes"""
+
+    if not os.path.isdir(directory):
+        return
+
+    entries = []
+    total = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        total += os.path.getsize(path)
+        if name.endswith(".json"):
+            entries.append((os.path.getmtime(path), path[:-len(".json")]))
+
+    for _, base_path in sorted(entries):
+        if total <= max_cache_bytes:
+            break
+        total -= sum(os.path.getsize(base_path + suffix) for suffix in [".json", ".npy", ".xlsx"]
+                     if os.path.exists(base_path + suffix))
+        removeEntry(base_path)
+        print("..Evicted cached result: " + os.path.basename(base_path) + "..")
@@ -0,0 +1,222 @@
+import numpy as np
+import pandas as pd
+
+import QueryEngine
+
+
+# Smallest step between datetime64[ns] values, for inclusive bounds just before a month starts
+one_ns = np.timedelta64(1, 'ns')
+
+
+class RevenueCube:
+    """Summed Revenue and line item counts by customer x principal x month for each date column, built once at load
+
+    Top-N rankings (and report previews) for any principal/customer set and time period come
+    from the cube. Only partial months at the edges of the time period are summed from the line items.
+
+    param cms_df -- loaded Commissions Master with normalized date columns
+    param revenue_column -- actual name of the revenue column (e.g. Paid-On Revenue)
+    param date_indexes -- DateIndex per date column (see QueryEngine.buildDateIndexes)
+    param base -- optional cube over the leading rows of cms_df; only the rows after them are aggregated
+    """
+
+    def __init__(self, cms_df, revenue_column, date_indexes, base=None):
+        start = base.revenue.size if base is not None else 0
+
+        # Revenue is typed numeric at load (Schema.applySchema); line items without one never count toward a ranking
+        new_revenue = cms_df[revenue_column].values[start:].astype(np.float64)
+        self.revenue = np.concatenate([base.revenue, new_revenue]) if base is not None else new_revenue
+        self.valid = ~np.isnan(self.revenue)
+        # Customers as dictionary codes (already so when typed as category), so rollups can count with np.bincount
+        self.customers = pd.Categorical(cms_df[QueryEngine.customer_column].values)
+        self.principals = cms_df[QueryEngine.principal_column].values
+        self.date_indexes = date_indexes
+
+        # Date columns without a time of day let a time period round out to whole days (see periodParts)
+        self.whole_days = {col: wholeDays(cms_df[col].values[start:]) and
+                                (base is None or base.whole_days.get(col, False))
+                           for col in date_indexes}
+
+        # Every line item counts toward rows; only valid revenue counts toward sums and rankings
+        items_df = lineItemFrame(self.customers[start:], self.principals[start:], self.revenue[start:],
+                                 self.valid[start:])
+
+        # No time period: customer x principal totals
+        self.totals = aggregate(items_df, ['customer', 'principal'])
+        if base is not None:
+            self.totals = mergeAggregates(base.totals, self.totals, ['customer', 'principal'])
+        self.totals = self.alignCustomers(self.totals)
+
+        # Time periods: customer x principal x month per date column (NaT months kept, last)
+        # Sorted by month, so the whole months of a time period are one slice
+        self.cubes = {}
+        for col in date_indexes:
+            items_df['month'] = cms_df[col].values[start:].astype('datetime64[M]')
+            cube = aggregate(items_df, ['customer', 'principal', 'month'])
+            if base is not None and col in base.cubes:
+                cube = mergeAggregates(base.cubes[col], cube, ['customer', 'principal', 'month'])
+            self.cubes[col] = self.alignCustomers(cube.sort_values('month', kind='stable', ignore_index=True))
+
+    def alignCustomers(self, aggregate_df):
+        """Recodes an aggregate's customers to self.customers' codes (unsorted grouping reorders categories)"""
+
+        return aggregate_df.assign(customer=aggregate_df['customer'].cat.set_categories(self.customers.categories))
+
+    def rankCustomers(self, query, n=None):
+        """Ranks customers by total revenue for a query
+
+        :param query: QueryEngine.QuerySpec with the time period, principals and customers
+        :param n: number of top customers to keep (None keeps all)
+        :return: dataframe of T-End Cust and Revenue, most to least revenue, or None if
+                 the query's date column isn't in the cube
+        """
+
+        by_customer = self.customerTotals(query)
+        if by_customer is None:
+            return None
+        by_customer = by_customer['revenue']
+
+        # Partial selection for Top N
+        if n is not None:
+            by_customer = by_customer.nlargest(n)
+        else:
+            by_customer = by_customer.sort_values(ascending=False)
+
+        return pd.DataFrame({'T-End Cust': by_customer.index.values, 'Revenue': by_customer.values})
+
+    def preview(self, query, n=None):
+        """Sizes up a report from the cube alone, without touching the line items of whole months
+
+        :param query: QueryEngine.QuerySpec with the time period, principals and customers
+        :param n: number of top customers the report keeps (None keeps all)
+        :return: (report rows, total revenue, customers), or None if the query's date column isn't in the cube
+        """
+
+        by_customer = self.customerTotals(query)
+        if by_customer is None:
+            return None
+        if n is not None:
+            by_customer = by_customer.nlargest(n, 'revenue')
+
+        return int(by_customer['rows'].sum()), float(by_customer['revenue'].sum()), by_customer.shape[0]
+
+    def customerTotals(self, query):
+        """Rolls the cube up to customers for a query
+
+        Customers without any valid revenue are left out, as in the report's ranking
+        (their line items don't make it into the report either).
+
+        :param query: QueryEngine.QuerySpec with the time period, principals and customers
+        :return: dataframe of revenue and rows by customer, or None if the query's date column isn't in the cube
+        """
+
+        if query.date_column:
+            if query.date_column not in self.cubes:
+                return None
+            parts = self.periodParts(query)
+        else:
+            parts = [self.totals]
+
+        is_principal = QueryEngine.memberMask(query.principals) if query.principals is not None else None
+        is_customer = QueryEngine.memberMask(query.customers) if query.customers is not None else None
+
+        # Sum each part straight into per-customer totals, indexed by customer code
+        n_customers = len(self.customers.categories)
+        totals = np.zeros((3, n_customers))
+        for part in parts:
+            keep = part['customer'].values.codes >= 0
+            if is_principal is not None:
+                keep &= is_principal(part['principal'].values)
+            if is_customer is not None:
+                keep &= is_customer(part['customer'].values)
+            codes = part['customer'].values.codes[keep]
+            for row, col in enumerate(['revenue', 'rows', 'valid_rows']):
+                totals[row] += np.bincount(codes, weights=part[col].values[keep], minlength=n_customers)
+
+        kept = np.flatnonzero(totals[2] > 0)
+        return pd.DataFrame({'revenue': totals[0][kept], 'rows': totals[1][kept].astype(np.int64)},
+                            index=self.customers.categories[kept])
+
+    def periodParts(self, query):
+        """Splits a time period into whole months (from the cube) and partial months (from line items)
+
+        A month comes from the cube only if every moment of it lies inside the period, and the
+        partial months are cut at the period's exact bounds, so the parts cover exactly the rows
+        the time period filter matches (times of day included).
+
+        :param query: QueryEngine.QuerySpec with a date column
+        :return: list of customer/principal/revenue/rows dataframes covering the period
+        """
+
+        start, end = (bound.astype('datetime64[ns]') for bound in query.dateBounds())
+        if self.whole_days[query.date_column]:
+            # Only midnights to match: rounding the bounds out to whole days matches the same rows
+            start_day = start.astype('datetime64[D]')
+            start = (start_day if start_day == start else start_day + 1).astype('datetime64[ns]')
+            end = (end.astype('datetime64[D]') + 1).astype('datetime64[ns]') - one_ns
+        start_month, end_month = start.astype('datetime64[M]'), end.astype('datetime64[M]')
+
+        # Whole months lying inside the time period
+        first_full = start_month if start_month.astype('datetime64[ns]') == start else start_month + 1
+        last_full = end_month if (end_month + 1).astype('datetime64[ns]') - one_ns == end else end_month - 1
+
+        if first_full > last_full:
+            return [self.lineItems(query.date_column, start, end)]
+
+        cube = self.cubes[query.date_column]
+        months = cube['month'].values
+        first_row = np.searchsorted(months, first_full.astype(months.dtype), side='left')
+        last_row = np.searchsorted(months, last_full.astype(months.dtype), side='right')
+        parts = [cube.iloc[first_row:last_row]]
+
+        # Partial months at either edge
+        full_start = first_full.astype('datetime64[ns]')
+        full_end = (last_full + 1).astype('datetime64[ns]')
+        if start < full_start:
+            parts.append(self.lineItems(query.date_column, start, full_start - one_ns))
+        if end >= full_end:
+            parts.append(self.lineItems(query.date_column, full_end, end))
+
+        return parts
+
+    def lineItems(self, date_column, start, end):
+        """Pulls the customer/principal/revenue/rows of line items dated start..end (inclusive, exact times)"""
+
+        positions = self.date_indexes[date_column].positions(start, end)
+        return lineItemFrame(self.customers[positions], self.principals[positions], self.revenue[positions],
+                             self.valid[positions])
+
+
+def wholeDays(values):
+    """Checks whether datetime64 values are all dates without a time of day (NaT ignored)"""
+
+    dated = values[~np.isnat(values)]
+    return bool((dated == dated.astype('datetime64[D]')).all())
+
+
+def lineItemFrame(customers, principals, revenue, valid):
+    """Lays out line items for aggregating: invalid revenue sums as zero but still counts as a row"""
+
+    return pd.DataFrame({'customer': customers,
+                         'principal': principals,
+                         'revenue': np.where(valid, revenue, 0.0),
+                         'rows': np.ones(len(valid), dtype=np.int64),
+                         'valid_rows': valid.astype(np.int64)})
+
+
+def aggregate(items_df, keys):
+    """Sums revenue and counts rows over the given keys, keeping only key combinations that occur"""
+
+    grouped = items_df.groupby(keys, observed=True, dropna=False, sort=False)
+    return grouped[['revenue', 'rows', 'valid_rows']].sum().reset_index()
+
+
+def mergeAggregates(old_df, new_df, keys):
+    """Folds freshly aggregated rows into an existing aggregate (e.g. after rows were appended)"""
+
+    # Old keys may use fewer categories than the grown master; align them first
+    for key in ['customer', 'principal']:
+        if isinstance(new_df[key].dtype, pd.CategoricalDtype):
+            old_df = old_df.assign(**{key: old_df[key].astype(new_df[key].dtype)})
+
+    return aggregate(pd.concat([old_df, new_df], ignore_index=True), keys)
@@ -1,154 +1,428 @@
-
-import os
-import pandas as pd
-import time
-import subprocess
-
-import EnumTypes
-import ExcelUtilities
-
-
-def main(cms_df, output_path, customer, principal, date_column, start_date, end_date):
-    """
-    Run.main executes "running a report" over TAARCOM's Commissions
-    Master file based on several query options
-
-    :param cms_df: loaded DataFrame of selected Commissions file
-    :param output_path: filepath for the output report
-    :param customer: drop-down selection for customer query
-    :param principal: drop-down selection for principal query
-    :param date_column: selected date column to use for time period query (invoice date, paid date, or n/a)
-    :param start_date: first date of time interval for query
-    :param end_date: last date of time interval for query
-    :return: void; export, format, and open generated report
-    """
-
-    print("..Running report..")
-
-    # -----------------------------
-    #  Create Report (Output) File
-    # -----------------------------
-
-    # Load ReportColumns.xlsx
-    rcl_df = ExcelUtilities.loadLookupFile("ReportColumns.xlsx", "Columns")
-
-    # Pull desired commissions columns and their preferred names from Root Column Library
-    actual_cols = list(rcl_df.columns)
-    preferred_cols = list(rcl_df.iloc[0])
-
-    # Pull desired column widths, including those for the "Customers Ranked" sheet
-    col_widths = list(rcl_df.iloc[1])
-    cust_rank_col_widths = list(rcl_df[['T-End Cust', 'Paid-On Revenue']].iloc[1])
-
-    # Populate report dataframe with values from all desired columns from commissions dataframe
-    rpt_df = cms_df[actual_cols]
-    rpt_df.columns = preferred_cols
-
-    # Create query text
-    main_query = ''
-
-    # --------------------
-    #  Time Period Query       // Filter by time period first, as this should reduce the dataset most
-    # --------------------
-
-    if date_column == EnumTypes.DateColumn.PAID:
-        main_query += '`Comm Month` >= "' + str(start_date) + '" and `Comm Month` <= "' + str(end_date) + '"'
-    elif date_column == EnumTypes.DateColumn.INVOICE:
-        main_query += '`Invoice Date` >= "' + str(start_date) + '" and `Invoice Date` <= "' + str(end_date) + '"'
-    elif date_column == EnumTypes.DateColumn.NA:
-        pass
-
-    # -----------------
-    #  Principal Query
-    # -----------------
-
-    # Convert full name to abbreviation to add to the query
-    pcp_active = ExcelUtilities.loadLookupFile(filename="principalList.xlsx", sheet_name="Principals")
-    pcp_inactive = ExcelUtilities.loadLookupFile(filename="principalList.xlsx", sheet_name="Inactive")
-    pcp_lookup = pd.concat([pcp_active, pcp_inactive])
-    dict_principal_to_abbrev = dict(zip(pcp_lookup['Principal'], pcp_lookup['Abbreviation']))
-    abbreviation = dict_principal_to_abbrev.get(principal)
-
-    if principal == EnumTypes.Principal.ALL:
-        pass
-    else:
-        main_query += (' & ' if main_query else '') + 'Principal == "' + abbreviation + '"'
-
-    # -----------------------
-    #  Manual Customer Query
-    # -----------------------
-
-    if customer == EnumTypes.Customer.ALL:
-        pass
-    elif not isinstance(customer, EnumTypes.Customer):
-        main_query += (' & ' if main_query else '') + '`T-End Cust` == "' + customer + '"'
-
-    # --------------------
-    #  Execute Main Query
-    # --------------------
-
-    # Use the df.query function
-    if main_query:
-        rpt_df = rpt_df.query(main_query, engine='python')
-
-    # -----------------------
-    #  Ranked Customer Query
-    # -----------------------
-
-    # Create sorted list of customers by their total paid-on revenue
-    grouped_df = rpt_df[['T-End Cust', 'Revenue']]
-
-    # Remove all strings from the Paid-On Revenue column
-    grouped_df['Revenue'] = pd.to_numeric(grouped_df['Revenue'], errors='coerce')
-    grouped_df = grouped_df.dropna(subset=['Revenue'])
-
-    # Roll-up data based on paid-on revenue
-    grouped_df = grouped_df.groupby('T-End Cust')['Revenue'].sum().reset_index()
-
-    # Sort customers from most to least total paid-on revenue
-    sorted_df = grouped_df.sort_values(by='Revenue', ascending=False)
-
-    # Define which customers we keep (assume it is all customers, then work down from there)
-    num_cust = sorted_df.shape[0]
-    if num_cust > 10 and customer == EnumTypes.Customer.T10:
-        num_cust = 10
-    elif num_cust > 25 and customer == EnumTypes.Customer.T25:
-        num_cust = 25
-    elif num_cust > 50 and customer == EnumTypes.Customer.T50:
-        num_cust = 50
-
-    # Filter customers to top-n
-    sorted_df = sorted_df.iloc[:num_cust]
-    keep_cust = sorted_df['T-End Cust'].values.tolist()
-
-    # Reduce file
-    rpt_df = rpt_df[rpt_df['T-End Cust'].isin(keep_cust)]
-
-    # ---------------------
-    #  Export Final Report
-    # ---------------------
-
-    # Change date columns to string because xlsx writer can't format them... for some weird reason I can't find
-    rpt_df['Invoice Date'] = rpt_df['Invoice Date'].astype(str).replace("NaT", "")
-    rpt_df['Comm Month'] = rpt_df['Comm Month'].astype(str).replace("NaT", "")
-
-    # Create file
-    writer = ExcelUtilities.createExcelFile(output_path, rpt_df, sorted_df)
-
-    if writer:
-        # Format columns in Excel
-        ExcelUtilities.formatSheet(rpt_df, "Data", writer, col_widths)
-        ExcelUtilities.formatSheet(sorted_df, "Customers Ranked", writer, cust_rank_col_widths)
-
-        # Save the file
-        writer.save()
-
-        # Success message
-        print("> File successfully saved!")
-
-        # Open the Excel file
-        excel_app_path = 'C:/Program Files (x86)/Microsoft Office/Office14/EXCEL.EXE'
-        subprocess.Popen([excel_app_path, output_path])
-    else:
-        print("> File NOT successfully saved.\n"
-              "> Make sure to close all files with matching names in the Output directory.")
+
+import os
+import pandas as pd
+import re
+import time
+import subprocess
+
+import EnumTypes
+import ExcelUtilities
+import Instrumentation
+import QueryEngine
+import ReportParts
+import ResultCache
+import Schema
+import Summaries
+
+
+def main(cms_df, output_path, customer, principal, date_column, start_date, end_date, indexes=None,
+         open_report=True, summaries=False):
+    """
+    Run.main executes "running a report" over TAARCOM's Commissions
+    Master file based on several query options
+
+    :param cms_df: loaded DataFrame of selected Commissions file
+    :param output_path: filepath for the output report
+    :param customer: drop-down selection for customer query (enum type, customer name or QueryEngine.Selection)
+    :param principal: drop-down selection for principal query (enum type, full name or QueryEngine.Selection)
+    :param date_column: selected date column to use for time period query (invoice date, paid date, or n/a)
+    :param start_date: first date of time interval for query
+    :param end_date: last date of time interval for query
+    :param indexes: optional MasterFile.MasterIndexes built over cms_df (date indexes and revenue cube)
+    :param open_report: open the finished report in Excel (off for command line runs)
+    :param summaries: add the customer x month, principal x quarter and run rate sheets
+    :return: whether the report was saved (export, format, and open generated report)
+    """
+
+    print("..Running report..")
+
+    details = {"output": os.path.basename(output_path),
+               "customer": optionText(customer),
+               "principal": optionText(principal),
+               "date_column": date_column.value,
+               "start_date": str(start_date),
+               "end_date": str(end_date),
+               "summaries": summaries}
+
+    # Time each stage (shown in the console and appended to the run log)
+    with Instrumentation.measureRun("report", details):
+
+        # -----------------------------
+        #  Create Report (Output) File
+        # -----------------------------
+
+        # Pull desired columns, their preferred names and widths from the Root Column Library
+        actual_cols, preferred_cols, col_widths, cust_rank_col_widths = reportColumns()
+
+        # -----------------
+        #  Principal Query
+        # -----------------
+
+        # Convert full name(s) to abbreviation(s) to add to the query
+        dict_abbrev_to_pcp, dict_principal_to_abbrev = ExcelUtilities.loadPrincipalMaps()
+        if not principalFound(principal, dict_principal_to_abbrev):
+            print("..Please check the principal and try again.\n"
+                  "*Program Terminated*")
+            return False
+        abbreviation = principalAbbreviations(principal, dict_principal_to_abbrev)
+
+        # ---------------------
+        #  Cached Result Check
+        # ---------------------
+
+        # An identical earlier report (same master files, lookup files and query) is reused
+        result_key = None
+        if indexes is not None and indexes.fingerprint:
+            result_key = ResultCache.resultKey(indexes.fingerprint, customer, principal, date_column,
+                                               start_date, end_date, summaries)
+        cached = ResultCache.lookup(result_key, output_path) if result_key else None
+        details["result_cache"] = "miss" if cached is None else "report" if cached.report_path else "rows"
+
+        if cached is not None and cached.report_path:
+            with Instrumentation.measure("copy cached report"):
+                saved = ResultCache.copyReport(cached.report_path, output_path)
+        else:
+            if cached is not None:
+                # Too large (or split) to keep a copy of: skip the query and ranking, export again
+                print("> Cache hit: reusing the rows and ranking of an identical earlier report")
+                positions, sorted_df = cached.positions, cached.sorted_df
+            else:
+                positions, sorted_df = queryResult(cms_df, customer, abbreviation, date_column, start_date, end_date,
+                                                   indexes)
+
+            # Pivots and run rate come from one grouped pass over the same rows
+            summary_sheets = []
+            if summaries:
+                with Instrumentation.measure("build summaries", rows_in=positions.size):
+                    summary_sheets = Summaries.buildSummaries(cms_df, positions, sorted_df, date_column,
+                                                              dict_abbrev_to_pcp, cust_rank_col_widths[0])
+
+            # ---------------------
+            #  Export Final Report
+            # ---------------------
+
+            # Past one sheet's worth of rows, principals go to part workbooks written in parallel
+            parts = None
+            if positions.size > ReportParts.split_rows:
+                parts = ReportParts.partitionRows(cms_df[QueryEngine.principal_column].values[positions],
+                                                  cms_df[Schema.actualColumnName('Revenue')].values[positions])
+
+            if parts:
+                with Instrumentation.measure("export parts", rows_in=positions.size):
+                    saved = ReportParts.exportParts(output_path, parts,
+                                                    lambda rows: reportFrame(cms_df, positions[rows], actual_cols,
+                                                                             preferred_cols),
+                                                    sorted_df, col_widths, cust_rank_col_widths, summary_sheets)
+            else:
+                with Instrumentation.measure("build report rows", rows_in=positions.size):
+                    rpt_df = reportFrame(cms_df, positions, actual_cols, preferred_cols)
+
+                with Instrumentation.measure("export", rows_in=rpt_df.shape[0]):
+                    saved = exportReport(output_path, rpt_df, sorted_df, col_widths, cust_rank_col_widths,
+                                         summary_sheets)
+
+            if saved and result_key and cached is None:
+                with Instrumentation.measure("cache result"):
+                    ResultCache.store(result_key, output_path, positions, sorted_df, keep_report=not parts)
+
+    if saved and open_report:
+        # Open the Excel file
+        excel_app_path = 'C:/Program Files (x86)/Microsoft Office/Office14/EXCEL.EXE'
+        subprocess.Popen([excel_app_path, output_path])
+
+    return saved
+
+
+def queryResult(cms_df, customer, abbreviation, date_column, start_date, end_date, indexes=None):
+    """Filters and ranks the master for one report
+
+    :param cms_df: loaded DataFrame of selected Commissions file
+    :param customer: customer query (enum type, customer name or QueryEngine.Selection)
+    :param abbreviation: principal abbreviation(s) from principalAbbreviations (None for all)
+    :param date_column: selected date column to use for time period query
+    :param start_date: first date of time interval for query
+    :param end_date: last date of time interval for query
+    :param indexes: optional MasterFile.MasterIndexes built over cms_df
+    :return: (row positions of the report rows, ranked customers)
+    """
+
+    # --------------------
+    #  Execute Main Query
+    # --------------------
+
+    # Filters only narrow down row positions; the report rows are copied once, at the end
+    with Instrumentation.measure("query", rows_in=cms_df.shape[0]) as stage:
+        # Time period, principal and customer filters compile to vectorized masks, run most selective first
+        query = QueryEngine.QuerySpec.fromOptions(customer, abbreviation, date_column, start_date, end_date)
+        positions = query.evaluate(cms_df, indexes.date_indexes if indexes else None)
+        stage["rows_out"] = positions.size
+
+    # -----------------------
+    #  Ranked Customer Query
+    # -----------------------
+
+    with Instrumentation.measure("rank customers", rows_in=positions.size) as stage:
+        # Rank from the pre-aggregated revenue cube when we have one, otherwise from the matched rows
+        sorted_df = indexes.revenue_cube.rankCustomers(query, tierSize(customer)) if indexes else None
+        if sorted_df is None:
+            sorted_df = rankCustomers(cms_df, positions)
+        stage["rows_out"] = sorted_df.shape[0]
+
+    with Instrumentation.measure("keep top customers", rows_in=positions.size) as stage:
+        positions, sorted_df = keepTopCustomers(cms_df, positions, sorted_df, customer)
+        stage["rows_out"] = positions.size
+
+    return positions, sorted_df
+
+
+def previewReport(indexes, customer, principal, date_column, start_date, end_date):
+    """Sizes up a report from the revenue cube, for the GUI's preview while query options change
+
+    :param indexes: MasterFile.MasterIndexes of the loaded master, or None
+    :param customer: customer query (enum type, customer name or QueryEngine.Selection)
+    :param principal: principal query (enum type, full name or QueryEngine.Selection)
+    :param date_column: selected date column to use for time period query
+    :param start_date: first date of time interval for query
+    :param end_date: last date of time interval for query
+    :return: (report rows, total revenue, customers), or None if there's nothing to preview from
+    """
+
+    principal_maps = ExcelUtilities.loadPrincipalMaps()
+    if indexes is None or principal_maps is None:
+        return None
+
+    abbreviation = principalAbbreviations(principal, principal_maps[1], report_missing=False)
+    query = QueryEngine.QuerySpec.fromOptions(customer, abbreviation, date_column, start_date, end_date)
+    return indexes.revenue_cube.preview(query, tierSize(customer))
+
+
+def reportColumns():
+    """Reads the report layout from ReportColumns.xlsx
+
+    :return: (actual column names, preferred column names, column widths, "Customers Ranked" column widths)
+    """
+
+    # Load ReportColumns.xlsx
+    rcl_df = ExcelUtilities.loadLookupFile("ReportColumns.xlsx", "Columns")
+
+    # Pull desired commissions columns and their preferred names from Root Column Library
+    actual_cols = list(rcl_df.columns)
+    preferred_cols = list(rcl_df.iloc[0])
+
+    # Pull desired column widths, including those for the "Customers Ranked" sheet
+    col_widths = list(rcl_df.iloc[1])
+    cust_rank_col_widths = list(rcl_df[['T-End Cust', 'Paid-On Revenue']].iloc[1])
+
+    return actual_cols, preferred_cols, col_widths, cust_rank_col_widths
+
+
+def optionText(option):
+    """Shows a query option as text (for the run log): enum value, Selection name or the name itself"""
+
+    if isinstance(option, QueryEngine.Selection):
+        return option.name + " (" + "; ".join(str(member) for member in option.members) + ")"
+    return getattr(option, "value", option)
+
+
+def principalAbbreviations(principal, dict_principal_to_abbrev, report_missing=True):
+    """Converts a principal query to what the Principal column holds
+
+    :param principal: EnumTypes.Principal.ALL, a full name or a QueryEngine.Selection of full names
+    :param dict_principal_to_abbrev: principal full name to abbreviation map
+    :param report_missing: print group members missing from principalList.xlsx (off for previews)
+    :return: None for all principals, an abbreviation, or a list of abbreviations (empty, matching no rows,
+             if none of the names are in principalList.xlsx; check with principalFound first)
+    """
+
+    if principal == EnumTypes.Principal.ALL:
+        return None
+    if isinstance(principal, QueryEngine.Selection):
+        for name in principal.members:
+            if report_missing and name not in dict_principal_to_abbrev:
+                print("..Principal " + str(name) + " not found in principalList.xlsx, skipped..")
+        return [dict_principal_to_abbrev[name] for name in principal.members if name in dict_principal_to_abbrev]
+    return dict_principal_to_abbrev.get(principal, [])
+
+
+def principalFound(principal, dict_principal_to_abbrev):
+    """Checks a principal query against principalList.xlsx before running it
+    Typed names (and groups) that don't resolve would otherwise run as no principal filter at all
+
+    :param principal: EnumTypes.Principal.ALL, a full name or a QueryEngine.Selection of full names
+    :param dict_principal_to_abbrev: principal full name to abbreviation map
+    :return: whether the query names at least one known principal (always true for ALL)
+    """
+
+    if principal == EnumTypes.Principal.ALL:
+        return True
+
+    names = principal.members if isinstance(principal, QueryEngine.Selection) else [principal]
+    if any(name in dict_principal_to_abbrev for name in names):
+        return True
+
+    for name in names:
+        print("..Principal " + str(name) + " not found in principalList.xlsx!")
+    return False
+
+
+def customerFound(cms_df, customer):
+    """Checks a customer query against the loaded master before running it
+
+    :param cms_df: loaded DataFrame of selected Commissions file
+    :param customer: customer query (enum type, customer name or QueryEngine.Selection)
+    :return: whether the query names at least one customer in the master (always true for the tiers)
+    """
+
+    if isinstance(customer, EnumTypes.Customer):
+        return True
+
+    names = customer.members if isinstance(customer, QueryEngine.Selection) else [customer]
+    if QueryEngine.memberMask(names)(cms_df[QueryEngine.customer_column].values).any():
+        return True
+
+    for name in names:
+        print("..Customer " + str(name) + " not found in the Commissions file!")
+    return False
+
+
+def selectionTag(selection):
+    """Shortens a Selection's name to a file-name-safe tag"""
+
+    return re.sub(r"[^\w+-]", "", selection.name)
+
+
+def reportName(master_filename, customer, principal, abbreviation, date_column, start_date, end_date):
+    """Builds the default output file name, tagged with the query options
+
+    :param master_filename: Commissions Master file name without extension
+    :param customer: customer query (enum type, customer name or QueryEngine.Selection)
+    :param principal: principal query (enum type, full name or QueryEngine.Selection)
+    :param abbreviation: principal abbreviation for a named principal (None tags it with the name's first letters)
+    :param date_column: EnumTypes.DateColumn selection
+    :param start_date: first date of time interval for query
+    :param end_date: last date of time interval for query
+    :return: file name, e.g. Master_{T10-ABC-PAID-01.01.23-07.06.23}.xlsx
+    """
+
+    # Create default unique name for file
+    uq_tag = "{"
+    if isinstance(customer, EnumTypes.Customer):
+        uq_tag += customer.name + "-"
+    else:
+        uq_tag += (selectionTag(customer) if isinstance(customer, QueryEngine.Selection) else customer[0:3]) + "-"
+    if isinstance(principal, EnumTypes.Principal):
+        uq_tag += principal.name + "-"
+    else:
+        uq_tag += (selectionTag(principal) if isinstance(principal, QueryEngine.Selection)
+                   else abbreviation or principal[0:3]) + "-"
+    uq_tag += date_column.name + ("-" if date_column != EnumTypes.DateColumn.NA else "")
+    uq_tag += (start_date.strftime("%m.%d.%y") + "-") if date_column != EnumTypes.DateColumn.NA else ""
+    uq_tag += end_date.strftime("%m.%d.%y") if date_column != EnumTypes.DateColumn.NA else ""
+    uq_tag += "}"
+
+    return master_filename + "_" + uq_tag + ".xlsx"
+
+
+def rankCustomers(cms_df, positions):
+    """Rolls up the matched rows into customers sorted by total paid-on revenue (when there's no revenue cube)
+
+    :param cms_df: loaded DataFrame of selected Commissions file
+    :param positions: row positions matched by the query
+    :return: dataframe of T-End Cust and Revenue, most to least revenue
+    """
+
+    # Only the two columns we need, for the matched rows; invalid (NaN) revenue doesn't count
+    grouped_df = pd.DataFrame({'T-End Cust': cms_df['T-End Cust'].values[positions],
+                               'Revenue': cms_df[Schema.actualColumnName('Revenue')].values[positions]})
+    grouped_df = grouped_df.dropna(subset=['Revenue'])
+
+    # Roll-up data based on paid-on revenue
+    grouped_df = grouped_df.groupby('T-End Cust', observed=True)['Revenue'].sum().reset_index()
+
+    # Sort customers from most to least total paid-on revenue
+    return grouped_df.sort_values(by='Revenue', ascending=False)
+
+
+def tierSize(customer):
+    """Returns how many customers a Top N customer query keeps (None for all)"""
+
+    return {EnumTypes.Customer.T10: 10,
+            EnumTypes.Customer.T25: 25,
+            EnumTypes.Customer.T50: 50}.get(customer)
+
+
+def keepTopCustomers(cms_df, positions, sorted_df, customer):
+    """Cuts the matched rows down to the customers selected by the customer query
+
+    :param cms_df: loaded DataFrame of selected Commissions file
+    :param positions: row positions matched by the query
+    :param sorted_df: ranked customers from rankCustomers
+    :param customer: customer query (Top 10/25/50 keep that many customers)
+    :return: (row positions of the kept customers, ranked customers kept)
+    """
+
+    # Define which customers we keep (assume it is all customers, then work down from there)
+    num_cust = sorted_df.shape[0]
+    if tierSize(customer) is not None and num_cust > tierSize(customer):
+        num_cust = tierSize(customer)
+
+    # Filter customers to top-n
+    sorted_df = sorted_df.iloc[:num_cust]
+    is_kept = QueryEngine.memberMask(sorted_df['T-End Cust'].values)
+
+    # Reduce file
+    return positions[is_kept(cms_df['T-End Cust'].values[positions])], sorted_df
+
+
+def reportFrame(cms_df, positions, actual_cols, preferred_cols):
+    """Copies the report rows out of the master: one copy of the selected rows and report columns
+
+    :param cms_df: loaded DataFrame of selected Commissions file
+    :param positions: row positions kept for the report
+    :param actual_cols: report columns, as named in the master
+    :param preferred_cols: names the report shows them under
+    :return: report dataframe
+    """
+
+    rpt_df = cms_df.iloc[positions, cms_df.columns.get_indexer(actual_cols)]
+    rpt_df.columns = preferred_cols
+    return rpt_df
+
+
+def exportReport(output_path, rpt_df, sorted_df, col_widths, cust_rank_col_widths, summary_sheets=()):
+    """Writes the report and customer ranking to a formatted Excel file
+    Top-level function so batch runs can hand it to worker processes
+
+    :param output_path: filepath for the output report
+    :param rpt_df: final report dataframe ("Data" sheet)
+    :param sorted_df: ranked customers ("Customers Ranked" sheet)
+    :param col_widths: widths of the report columns
+    :param cust_rank_col_widths: widths of the ranked customer columns
+    :param summary_sheets: optional Summaries.SummarySheet list, written after the ranking
+    :return: whether the file was saved
+    """
+
+    # Date columns stay datetime: they're written as Excel dates with the sheet's date format (NaT left blank)
+
+    # Create file
+    writer = ExcelUtilities.createExcelFile(output_path)
+
+    if writer:
+        # Stream each sheet into the file, formatted by column
+        ExcelUtilities.writeSheet(writer, rpt_df, ExcelUtilities.default_sheet_name, col_widths)
+        ExcelUtilities.writeSheet(writer, sorted_df, ExcelUtilities.default_more_sheet_name, cust_rank_col_widths)
+        for summary in summary_sheets:
+            ExcelUtilities.writeSheet(writer, summary.sheet_data, summary.name, summary.col_widths,
+                                      summary.accounting_cols)
+
+        # Save the file
+        with Instrumentation.measure("save file"):
+            writer.close()
+
+        # Success message
+        print("> File successfully saved!")
+        return True
+    else:
+        print("> File NOT successfully saved.\n"
+              "> Make sure to close all files with matching names in the Output directory.")
+        return False
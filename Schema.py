@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+
+import ExcelUtilities
+
+
+# Column types by preferred column name, used when ReportColumns.xlsx doesn't declare a type row
+#   category -- repeated text, stored dictionary-encoded
+#   numeric  -- converted to numbers; values that aren't become NaN and are flagged invalid
+#   date     -- left for the date normalization in MasterFile.prepareFrame (flagged invalid the same way)
+#   text     -- plain text
+default_column_types = {'T-End Cust': 'category',
+                        'Reported Customer': 'category',
+                        'Principal': 'category',
+                        'P/N': 'category',
+                        'FSR': 'category',
+                        'Channel': 'category',
+                        'EM/CM': 'category',
+                        'Revenue': 'numeric',
+                        'Qty': 'numeric',
+                        'Comm Month': 'date',
+                        'Invoice Date': 'date'}
+
+# Row of ReportColumns.xlsx (after preferred names and widths) that may hold column types
+type_row = 2
+
+# Column holding each row's validity bitmap: bit n is set when the n-th checked (numeric or date)
+# column, in ReportColumns.xlsx order, held a value that couldn't be converted
+validity_column = "Invalid Values"
+max_checked_columns = 64
+
+
+def columnTypes(rcl_df):
+    """Resolves the type of each report column from the Root Column Library
+
+    :param rcl_df: ReportColumns.xlsx "Columns" sheet
+    :return: dict of actual column name -> type
+    """
+
+    column_types = {}
+    for col in rcl_df.columns:
+        declared = str(rcl_df[col].iloc[type_row]).strip().lower() if rcl_df.shape[0] > type_row else ""
+        preferred = rcl_df[col].iloc[0]
+        column_types[col] = declared if declared else default_column_types.get(preferred, 'text')
+    return column_types
+
+
+def actualColumnName(preferred_name):
+    """Looks up the Commissions Master column that ReportColumns.xlsx renames to preferred_name"""
+
+    rcl_df = ExcelUtilities.loadLookupFile("ReportColumns.xlsx", "Columns")
+    for col in rcl_df.columns:
+        if rcl_df[col].iloc[0] == preferred_name:
+            return col
+    return preferred_name
+
+
+def memoryMB(df):
+    """Returns the dataframe's in-memory size in MB, including string contents"""
+
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def parseTypes(names):
+    """Dtypes to parse the master's columns with, so they're typed as the cells are read
+
+    Text, category and date columns are read as object: numeric-looking text (e.g. P/Ns
+    with leading zeros) stays text and no time goes into number inference. Numeric and
+    unlisted columns are inferred like before.
+
+    :param names: column names being read
+    :return: dict of column name -> dtype for TextParser/pd.read_excel
+    """
+
+    rcl_df = ExcelUtilities.loadLookupFile("ReportColumns.xlsx", "Columns")
+    column_types = columnTypes(rcl_df) if rcl_df is not None else {}
+
+    return {col: object for col in names if column_types.get(col, 'numeric') != 'numeric'}
+
+
+def checkedColumns():
+    """Lists the columns the validity bitmap covers (numeric and date columns), in bit order"""
+
+    rcl_df = ExcelUtilities.loadLookupFile("ReportColumns.xlsx", "Columns")
+    column_types = columnTypes(rcl_df) if rcl_df is not None else {}
+
+    return [col for col, col_type in column_types.items() if col_type in ('numeric', 'date')][:max_checked_columns]
+
+
+def isBlank(values):
+    """Marks missing cells and whitespace-only text, which are empty rather than invalid"""
+
+    blank = values.isna().values
+    if values.dtype == object:
+        is_text = values.map(type).values == str
+        blank[is_text] = values[is_text].str.strip().values == ""
+    return blank
+
+
+def textValues(values):
+    """Fills missing cells with "" and turns numbers in a text column into their text"""
+
+    return values.fillna("").astype(str)
+
+
+def applySchema(cms_df, verbose=True):
+    """Converts a freshly read Commissions Master to the column types declared in ReportColumns.xlsx
+    Numeric columns are converted once here (unconvertible values become NaN, see validityBitmap);
+    text and category columns hold only strings, missing cells filled with ""
+
+    :param cms_df: raw dataframe read from the Commissions Master
+    :param verbose: print the memory saved (off when typing a file chunk by chunk; readWorkbook adds up the chunks)
+    :return: typed dataframe
+    """
+
+    before_mb = memoryMB(cms_df) if verbose else 0.0
+
+    # Load ReportColumns.xlsx for the declared column types (memoized lookup)
+    rcl_df = ExcelUtilities.loadLookupFile("ReportColumns.xlsx", "Columns")
+    column_types = columnTypes(rcl_df) if rcl_df is not None else {}
+
+    typed = {}
+    for col in cms_df.columns:
+        values = cms_df[col]
+        col_type = column_types.get(col)
+        is_number = pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+
+        if col_type == 'numeric':
+            typed[col] = values if is_number else pd.to_numeric(values, errors='coerce')
+        elif col_type == 'date':
+            typed[col] = values
+        elif col_type == 'category':
+            typed[col] = textValues(values).astype('category')
+        elif col_type == 'text':
+            typed[col] = textValues(values)
+        else:
+            # Columns ReportColumns.xlsx doesn't list keep their numbers like before
+            typed[col] = values if is_number else values.fillna("")
+
+    cms_df = pd.DataFrame(typed, index=cms_df.index)
+
+    if verbose:
+        printMemoryChange(before_mb, memoryMB(cms_df))
+
+    return cms_df
+
+
+def printMemoryChange(raw_mb, typed_mb):
+    """Prints the memory of the master as read against its typed form"""
+
+    print("..Memory: {:,.1f} MB raw -> {:,.1f} MB typed..".format(raw_mb, typed_mb))
+
+
+def validityBitmap(raw_df, cms_df):
+    """Flags the values that couldn't be converted to their column's type, one bitmap per row
+
+    A checked column's value is invalid when the raw cell held something (not blank)
+    but the typed column is NaN/NaT, e.g. "TBD" in a revenue column.
+
+    :param raw_df: dataframe as read from the workbook
+    :param cms_df: typed (and date normalized) dataframe of the same rows
+    :return: uint64 array; bit n set = the n-th column of checkedColumns() was invalid
+    """
+
+    bitmap = np.zeros(cms_df.shape[0], dtype=np.uint64)
+    for bit, col in enumerate(checkedColumns()):
+        if col in cms_df.columns and col in raw_df.columns:
+            invalid = cms_df[col].isna().values & ~isBlank(raw_df[col])
+            bitmap |= invalid.astype(np.uint64) << np.uint64(bit)
+    return bitmap
+
+
+def qualitySummary(cms_df):
+    """Counts the rows holding an invalid value, per checked column, from the validity bitmap
+
+    :param cms_df: prepared dataframe with the validity column
+    :return: (rows with any invalid value, dict of column -> rows with an invalid value)
+    """
+
+    bitmap = cms_df[validity_column].values
+    counts = {col: int(((bitmap >> np.uint64(bit)) & np.uint64(1)).sum())
+              for bit, col in enumerate(checkedColumns())}
+    return int(np.count_nonzero(bitmap)), counts
+
+
+def printQualityReport(cms_df):
+    """Prints the data-quality summary of a loaded master"""
+
+    if validity_column not in cms_df.columns:
+        return
+
+    n_invalid_rows, counts = qualitySummary(cms_df)
+    if not n_invalid_rows:
+        print("..Data quality: every numeric and date value readable..")
+        return
+
+    counts_text = ", ".join("{}: {:,}".format(col, count) for col, count in counts.items() if count)
+    print("..Data quality: {:,} rows with unreadable values ({}), left blank in reports..".format(
+        n_invalid_rows, counts_text))
+
+
+def concatFrames(frames):
+    """Stacks typed frames (e.g. cached rows + appended rows) without losing categoricals
+
+    Categorical columns get the union of every frame's categories; a categorical column
+    meeting a plain one (e.g. all-numeric P/Ns in the new rows) stays categorical. A plain
+    column that's numeric in some frames and text in others becomes text, filled with "".
+
+    :param frames: list of dataframes with the same columns
+    :return: one dataframe with a fresh RangeIndex
+    """
+
+    frames = [frame.reset_index(drop=True) for frame in frames]
+
+    for col in frames[0].columns:
+        columns = [frame[col] for frame in frames]
+        if any(isinstance(values.dtype, pd.CategoricalDtype) for values in columns):
+            # Existing categories keep their order (and codes); new values go on the end
+            pieces = [values.cat.categories if isinstance(values.dtype, pd.CategoricalDtype)
+                      else pd.Index(values.dropna().unique()) for values in columns]
+            categories = pieces[0].astype(object).append([piece.astype(object) for piece in pieces[1:]]).unique()
+            for frame in frames:
+                frame[col] = frame[col].astype(pd.CategoricalDtype(categories))
+        elif any(values.dtype == object for values in columns):
+            for frame in frames:
+                if frame[col].dtype != object:
+                    frame[col] = frame[col].astype(object).fillna("")
+
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import time
+
+import openpyxl
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+import Schema
+
+
+# Workbook types openpyxl can stream (older .xls files go through pd.read_excel)
+streamable_extensions = (".xlsx", ".xlsm")
+
+# Data rows parsed and typed at a time; peak memory while reading is about one chunk
+# of raw cells plus the compact typed chunks read so far
+chunk_rows = 50000
+
+# How often (in rows) a streamed read checks whether it was cancelled
+cancel_check_rows = 1000
+
+
+class LoadCancelled(Exception):
+    """Raised when a streamed read is cancelled (e.g. the GUI's Cancel button)"""
+
+
+class MissingColumns(Exception):
+    """Raised from the header row when the workbook lacks columns the caller asked for
+
+    param missing -- names of the missing columns
+    """
+
+    def __init__(self, missing):
+        super(MissingColumns, self).__init__(missing)
+        self.missing = missing
+
+
+def isStreamable(filepath):
+    """Checks whether the workbook can be read row by row"""
+
+    return os.path.splitext(filepath)[1].lower() in streamable_extensions
+
+
+def headerNames(header):
+    """Cleans up header cells the same way pd.read_excel does (blank -> Unnamed, duplicates -> .1, .2)"""
+
+    names = []
+    seen = {}
+    for col_num, value in enumerate(header):
+        name = "Unnamed: " + str(col_num) if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = str(name) + "." + str(seen[name])
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def readWorkbook(filepath, known_hashes=None, columns=None, prepare=None, progress=None, cancel=None,
+                 discard=None):
+    """Streams the first sheet of an .xlsx/.xlsm workbook in chunks of chunk_rows rows
+
+    The header is checked for the requested columns before any data row is read.
+    The header and every data row (all columns) are fed into a running hash, checkpointed
+    every chunk_rows rows. Each chunk is parsed with the column dtypes from Schema.parseTypes
+    and prepared (e.g. typed) before the next chunk is read.
+
+    Given the checkpoints of an earlier read, leading rows whose running hash still matches
+    are dropped as soon as a checkpoint confirms them (the caller already has them). From the
+    first checkpoint that doesn't match, every row is kept, so a changed file needs no second read.
+
+    :param filepath: path to the workbook
+    :param known_hashes: optional dict of row count -> running hash from an earlier read of the file
+    :param columns: column names to keep (None keeps all); a missing one stops the read with MissingColumns
+    :param prepare: function applied to each chunk's dataframe (None keeps the raw values)
+    :param progress: function called with (rows read, total rows or None, rows per second) after each chunk
+    :param cancel: threading.Event; once set, the read stops with LoadCancelled
+    :param discard: function called with each prepared chunk dropped once a later checkpoint confirms its rows
+    :return: (dataframe of rows after the verified rows, total data rows, leading rows verified against
+              known_hashes, hash of header + all rows, dict of row count -> running hash checkpoints)
+    """
+
+    read_start = time.perf_counter()
+
+    workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        total_rows = sheet.max_row - 1 if sheet.max_row else None
+        rows = sheet.iter_rows(values_only=True)
+
+        header = next(rows, ())
+        n_cols = len(header)
+        row_hash = hashlib.sha1(repr(header).encode("utf-8"))
+
+        # Fail from the header row rather than after parsing the whole sheet
+        names = headerNames(header)
+        missing = [col for col in columns if col not in names] if columns is not None else []
+        if missing:
+            raise MissingColumns(missing)
+
+        # Positions, names and parse dtypes of the columns we keep
+        keep = [col_num for col_num, name in enumerate(names) if columns is None or name in columns]
+        kept_names = [names[col_num] for col_num in keep]
+        dtypes = Schema.parseTypes(kept_names)
+
+        frames = []
+        chunk = []
+        blank_rows = []
+        n_rows = 0
+
+        # Leading rows confirmed unchanged since the earlier read; a running hash that
+        # stops matching never matches again, so checking ends at the first mismatch
+        verified_rows = 0
+        checking = bool(known_hashes)
+        checkpoints = {}
+
+        # Raw and prepared sizes (MB) added up over the chunks, for one memory report per read
+        chunk_mb = [0.0, 0.0]
+        for row in rows:
+            row = tuple(row[:n_cols]) + (None,) * (n_cols - len(row))
+
+            # Hold blank rows back until a filled row follows, so trailing blanks are dropped
+            if all(value is None for value in row):
+                blank_rows.append(row)
+                continue
+
+            for pending in blank_rows + [row]:
+                row_hash.update(repr(pending).encode("utf-8"))
+                chunk.append([pending[col_num] for col_num in keep])
+                n_rows += 1
+
+                if n_rows % chunk_rows == 0:
+                    checkpoints[n_rows] = row_hash.hexdigest()
+                if checking and n_rows in known_hashes:
+                    if row_hash.hexdigest() == known_hashes[n_rows]:
+                        # Everything kept so far is unchanged: drop it before it's typed (or once more)
+                        verified_rows = n_rows
+                        if discard:
+                            for frame in frames:
+                                discard(frame)
+                        frames = []
+                        chunk = []
+                        chunk_mb = [0.0, 0.0]
+                        checking = n_rows < max(known_hashes)
+                    else:
+                        checking = False
+
+                if cancel is not None and n_rows % cancel_check_rows == 0 and cancel.is_set():
+                    raise LoadCancelled()
+
+                if n_rows % chunk_rows == 0:
+                    if chunk:
+                        frames.append(chunkFrame(kept_names, chunk, dtypes, prepare, chunk_mb))
+                        chunk = []
+                    if progress:
+                        progress(n_rows, total_rows, n_rows / (time.perf_counter() - read_start))
+            blank_rows = []
+    finally:
+        workbook.close()
+
+    if chunk or not frames:
+        frames.append(chunkFrame(kept_names, chunk, dtypes, prepare, chunk_mb))
+    if prepare and n_rows > verified_rows:
+        Schema.printMemoryChange(*chunk_mb)
+    if progress and n_rows % chunk_rows:
+        progress(n_rows, n_rows, n_rows / (time.perf_counter() - read_start))
+
+    if len(frames) == 1:
+        sheet_data = frames[0]
+    elif prepare:
+        sheet_data = Schema.concatFrames(frames)
+    else:
+        sheet_data = pd.concat(frames, ignore_index=True)
+
+    return sheet_data, n_rows, verified_rows, row_hash.hexdigest(), checkpoints
+
+
+def chunkFrame(names, rows, dtypes, prepare, chunk_mb=None):
+    """Builds (and prepares, if given a prepare function) one chunk's dataframe
+
+    :param chunk_mb: optional [raw MB, prepared MB] running totals to add the chunk's sizes to
+    """
+
+    chunk_data = rowsToFrame(names, rows, dtypes)
+    if not prepare:
+        return chunk_data
+
+    prepared_data = prepare(chunk_data)
+    if chunk_mb is not None:
+        chunk_mb[0] += Schema.memoryMB(chunk_data)
+        chunk_mb[1] += Schema.memoryMB(prepared_data)
+    return prepared_data
+
+
+def printProgress(rows_read, total_rows, rows_per_second):
+    """Default progress report for readWorkbook"""
+
+    if total_rows:
+        print("..Read {:,} of {:,} rows ({:.0%}, {:,.0f} rows/s)..".format(
+            rows_read, max(total_rows, rows_read), min(rows_read / total_rows, 1.0), rows_per_second))
+    else:
+        print("..Read {:,} rows ({:,.0f} rows/s)..".format(rows_read, rows_per_second))
+
+
+def rowsToFrame(header, rows, dtypes=None):
+    """Turns raw cell rows into a dataframe with the same type conversions as pd.read_excel
+
+    :param header: header row cell values
+    :param rows: list of data row tuples
+    :param dtypes: dict of column name -> dtype (others are inferred)
+    :return: dataframe
+    """
+
+    if not rows:
+        return pd.DataFrame(columns=headerNames(header))
+
+    # pd.read_excel hands its cell rows to the same parser, so numbers stored as text,
+    # "n/a" style blanks, etc. come out identical
+    return TextParser([list(header)] + rows, header=0, dtype=dtypes).read()
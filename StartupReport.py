@@ -0,0 +1,89 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+
+# The window should appear within this many seconds of launch
+target_seconds = 1.0
+
+# Modules that shouldn't load before the window shows (main.py imports them later, in the background)
+heavy_modules = ["pandas", "numpy", "pyarrow", "openpyxl", "xlsxwriter", "xlrd", "PyQt5.uic"]
+
+# One line of python -X importtime output: "import time: self [us] | cumulative | module"
+importtime_pattern = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measureStartup(repeat=3):
+    """Launches the GUI in fresh interpreters and times how long its window takes to show
+
+    Each launch runs main.py --startup-check under python -X importtime, which shows
+    the window, prints the time since launch and quits.
+
+    :param repeat: number of launches (the fastest one is reported)
+    :return: (fastest window seconds, import times of that launch as {module: (self s, cumulative s, depth)})
+    """
+
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, "-X", "importtime", os.path.join(package_dir, "main.py"), "--startup-check"]
+
+    best = None
+    for _ in range(repeat):
+        completed = subprocess.run(command, cwd=package_dir, capture_output=True, text=True)
+        found = re.search(r"window_seconds=([\d.]+)", completed.stdout)
+        if found is None:
+            error_lines = completed.stderr.strip().splitlines()
+            print("..GUI didn't start!\n"
+                  "?" + (error_lines[-1] if error_lines else "no output"))
+            return None, {}
+
+        window_seconds = float(found.group(1))
+        if best is None or window_seconds < best[0]:
+            best = (window_seconds, parseImportTimes(completed.stderr))
+
+    return best
+
+
+def parseImportTimes(stderr_text):
+    """Reads python -X importtime output
+
+    :return: dict of module -> (self seconds, cumulative seconds, nesting depth)
+    """
+
+    import_times = {}
+    for line in stderr_text.splitlines():
+        found = importtime_pattern.match(line)
+        if found:
+            self_us, cumulative_us, indent, module = found.groups()
+            import_times[module] = (int(self_us) / 1e6, int(cumulative_us) / 1e6, (len(indent) - 1) // 2)
+    return import_times
+
+
+def printReport(window_seconds, import_times, top=15):
+    """Prints the window time against the target, the slowest top-level imports and any heavy modules loaded"""
+
+    status = "OK" if window_seconds <= target_seconds else "SLOW"
+    print("> Window shown {:.2f}s after launch (target {:.1f}s): {}".format(window_seconds, target_seconds, status))
+
+    top_level = sorted(((cumulative, module) for module, (_, cumulative, depth) in import_times.items() if depth == 0),
+                       reverse=True)
+    print("  {:>9}  {}".format("seconds", "import (with everything it imports)"))
+    for cumulative, module in top_level[:top]:
+        print("  {:>9.3f}  {}".format(cumulative, module))
+    print("  {:>9.3f}  total".format(sum(cumulative for cumulative, _ in top_level)))
+
+    early = [module for module in heavy_modules if module in import_times]
+    if early:
+        print("..Loaded before the window: " + ", ".join(early) + "..")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Times GUI startup and lists the slowest imports before the window")
+    parser.add_argument("--repeat", type=int, default=3, help="launches to time, keeping the fastest")
+    parser.add_argument("--top", type=int, default=15, help="number of imports to list")
+    args = parser.parse_args(sys.argv[1:])
+
+    window_seconds, import_times = measureStartup(args.repeat)
+    if window_seconds is not None:
+        printReport(window_seconds, import_times, args.top)
@@ -0,0 +1,161 @@
+import collections
+
+import numpy as np
+import pandas as pd
+
+import EnumTypes
+import QueryEngine
+import Schema
+
+
+# Sheet names of the optional summary sheets
+customer_month_sheet_name = "Customer x Month"
+principal_quarter_sheet_name = "Principal x Quarter"
+run_rate_sheet_name = "Run Rate"
+
+# Months the run rate trails over, and months the trend is projected ahead
+trailing_months = 12
+projection_months = 6
+
+# Width of the month, quarter and revenue columns
+summary_col_width = 11
+
+# One summary sheet ready for ExcelUtilities.writeSheet
+#   name -- sheet name
+#   sheet_data -- compact summary table
+#   col_widths -- width of each column
+#   accounting_cols -- columns formatted as dollars
+SummarySheet = collections.namedtuple("SummarySheet", ["name", "sheet_data", "col_widths", "accounting_cols"])
+
+
+def buildSummaries(cms_df, positions, sorted_df, date_column, dict_abbrev_to_pcp, name_col_width=30):
+    """Builds the revenue pivot and run rate sheets for a report's rows
+
+    Every sheet is cut from one customer x principal x month aggregate, made with one
+    sort and one groupby over the report rows, so no sheet touches the line items again.
+
+    :param cms_df: loaded DataFrame of selected Commissions file
+    :param positions: row positions of the report ("Data" sheet) rows
+    :param sorted_df: ranked customers of the report (sets the customer order)
+    :param date_column: EnumTypes.DateColumn of the query (N/A months by paid date)
+    :param dict_abbrev_to_pcp: principal abbreviation to full name map
+    :param name_col_width: width of the customer and principal name columns
+    :return: list of SummarySheet (empty if no report row has a date)
+    """
+
+    month_column = QueryEngine.date_columns.get(date_column, QueryEngine.date_columns[EnumTypes.DateColumn.PAID])
+    monthly_df = monthlyRevenue(cms_df, positions, month_column)
+    if monthly_df.empty:
+        print("..No dated rows for the summary sheets, skipped..")
+        return []
+
+    # Every month of the report, including months without revenue
+    months = pd.period_range(monthly_df['month'].iloc[0], monthly_df['month'].iloc[-1], freq='M')
+
+    customer_df = customerByMonth(monthly_df, months, sorted_df['T-End Cust'].values)
+    principal_df = principalByQuarter(monthly_df, months, dict_abbrev_to_pcp)
+    run_rate_df = runRate(monthly_df, months)
+
+    def widths(sheet_data):
+        return [name_col_width] + [summary_col_width] * (sheet_data.shape[1] - 1)
+
+    return [SummarySheet(customer_month_sheet_name, customer_df, widths(customer_df), list(customer_df.columns[1:])),
+            SummarySheet(principal_quarter_sheet_name, principal_df, widths(principal_df),
+                         list(principal_df.columns[1:])),
+            SummarySheet(run_rate_sheet_name, run_rate_df, [10] + [summary_col_width] * (run_rate_df.shape[1] - 1),
+                         ['Revenue', 'Trailing 12M', 'Trend'])]
+
+
+def monthlyRevenue(cms_df, positions, month_column):
+    """Sums the report rows' revenue by customer x principal x month: the single grouped pass
+
+    :param cms_df: loaded DataFrame of selected Commissions file
+    :param positions: row positions of the report rows
+    :param month_column: date column that places each row in a month
+    :return: dataframe of customer, principal, month (Period) and revenue, in month order
+    """
+
+    revenue_col = Schema.actualColumnName('Revenue')
+    months = cms_df[month_column].values[positions].astype('datetime64[M]')
+    dated = ~np.isnat(months)
+
+    rows_df = pd.DataFrame({'customer': cms_df[QueryEngine.customer_column].values[positions][dated],
+                            'principal': cms_df[QueryEngine.principal_column].values[positions][dated],
+                            'month': months[dated],
+                            'revenue': cms_df[revenue_col].values[positions][dated]})
+
+    # Sorted once by month; groupby keeps that order (sort=False), so every sheet comes out in month order
+    rows_df = rows_df.sort_values('month', kind='stable')
+    monthly_df = rows_df.groupby(['customer', 'principal', 'month'], observed=True, sort=False)['revenue'].sum()
+    monthly_df = monthly_df.reset_index()
+    monthly_df['month'] = monthly_df['month'].dt.to_period('M')
+
+    return monthly_df
+
+
+def customerByMonth(monthly_df, months, customer_order):
+    """Pivots revenue to customers (rows, in ranking order) x months (columns), with a total
+
+    :return: dataframe with T-End Cust, one column per month (YYYY-MM) and Total
+    """
+
+    table = monthly_df.groupby(['customer', 'month'], observed=True)['revenue'].sum().unstack(fill_value=0.0)
+    table = table.reindex(index=[cust for cust in customer_order if cust in table.index],
+                          columns=months, fill_value=0.0)
+    table.columns = months.strftime('%Y-%m')
+    table['Total'] = table.sum(axis=1)
+
+    return table.rename_axis('T-End Cust').reset_index()
+
+
+def principalByQuarter(monthly_df, months, dict_abbrev_to_pcp):
+    """Pivots revenue to principals (rows, most revenue first) x quarters (columns), with a total
+
+    :return: dataframe with Principal (full name), one column per quarter (YYYY Q#) and Total
+    """
+
+    quarters = monthly_df['month'].dt.asfreq('Q')
+    table = monthly_df.groupby([monthly_df['principal'], quarters], observed=True)['revenue'].sum()
+    table = table.unstack(fill_value=0.0)
+
+    all_quarters = pd.period_range(months[0].asfreq('Q'), months[-1].asfreq('Q'), freq='Q')
+    table = table.reindex(columns=all_quarters, fill_value=0.0)
+    table.columns = all_quarters.strftime('%Y Q%q')
+    table['Total'] = table.sum(axis=1)
+    table = table.sort_values('Total', ascending=False)
+
+    table.index = [dict_abbrev_to_pcp.get(abbrev, abbrev) for abbrev in table.index]
+    return table.rename_axis('Principal').reset_index()
+
+
+def runRate(monthly_df, months):
+    """Trailing 12-month revenue by month, with a straight-line trend projected projection_months ahead
+
+    The trend is a least-squares line through the last trailing_months monthly totals.
+
+    :return: dataframe with Month, Type (Actual/Projected), Revenue, Trailing 12M and Trend
+    """
+
+    totals = monthly_df.groupby('month')['revenue'].sum().reindex(months, fill_value=0.0)
+    trailing = totals.rolling(trailing_months, min_periods=1).sum()
+
+    # Fit the trend on the last trailing_months months (a single month has no slope)
+    recent = totals.iloc[-trailing_months:]
+    steps = np.arange(len(recent), dtype=np.float64)
+    slope, intercept = np.polyfit(steps, recent.values, 1) if len(recent) > 1 else (0.0, recent.values[-1])
+
+    actual_df = pd.DataFrame({'Month': recent.index.strftime('%Y-%m'),
+                              'Type': "Actual",
+                              'Revenue': recent.values,
+                              'Trailing 12M': trailing.iloc[-trailing_months:].values,
+                              'Trend': intercept + slope * steps})
+
+    future_steps = np.arange(len(recent), len(recent) + projection_months, dtype=np.float64)
+    projected_df = pd.DataFrame({'Month': pd.period_range(months[-1] + 1, periods=projection_months,
+                                                          freq='M').strftime('%Y-%m'),
+                                 'Type': "Projected",
+                                 'Revenue': np.nan,
+                                 'Trailing 12M': np.nan,
+                                 'Trend': np.maximum(intercept + slope * future_steps, 0.0)})
+
+    return pd.concat([actual_df, projected_df], ignore_index=True)
@@ -0,0 +1,178 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+import ExcelUtilities
+import Schema
+
+
+# Report columns for a fresh ReportColumns.xlsx: (actual column name, preferred name, width)
+default_report_columns = [('T-End Cust', 'T-End Cust', 30),
+                          ('Reported Customer', 'Reported Customer', 30),
+                          ('Principal', 'Principal', 8),
+                          ('P/N', 'P/N', 20),
+                          ('Qty', 'Qty', 8),
+                          ('Paid-On Revenue', 'Revenue', 12),
+                          ('Comm Month', 'Comm Month', 10),
+                          ('Invoice Date', 'Invoice Date', 10),
+                          ('FSR', 'FSR', 6),
+                          ('Channel', 'Channel', 8),
+                          ('EM/CM', 'EM/CM', 6)]
+
+# Columns a real master carries that reports don't use (dropped on load)
+extra_columns = ['Unit Price', 'Distributor', 'Comments']
+
+# Share of inactive principals (listed on the "Inactive" sheet of principalList.xlsx)
+inactive_share = 0.2
+
+
+def principalNames(n_principals):
+    """Builds the synthetic principals
+
+    :param n_principals: number of principals
+    :return: (list of abbreviations, list of full names)
+    """
+
+    abbreviations = ["P" + str(num).zfill(2) for num in range(n_principals)]
+    names = ["Principal " + str(num).zfill(2) + " Inc." for num in range(n_principals)]
+    return abbreviations, names
+
+
+def generateLookups(lookup_dir, n_principals=20, overwrite=False):
+    """Writes a principalList.xlsx (and a ReportColumns.xlsx, if there isn't one) for synthetic masters
+
+    :param lookup_dir: directory for the lookup files
+    :param n_principals: number of principals
+    :param overwrite: replace an existing ReportColumns.xlsx with the default layout
+    :return: void; lookup files written
+    """
+
+    os.makedirs(lookup_dir, exist_ok=True)
+
+    # Principals: the first ones active, the rest inactive
+    abbreviations, names = principalNames(n_principals)
+    n_active = n_principals - int(n_principals * inactive_share)
+    pcp_df = pd.DataFrame({'Principal': names, 'Abbreviation': abbreviations})
+    with pd.ExcelWriter(os.path.join(lookup_dir, "principalList.xlsx")) as writer:
+        pcp_df.iloc[:n_active].to_excel(writer, sheet_name="Principals", index=False)
+        pcp_df.iloc[n_active:].to_excel(writer, sheet_name="Inactive", index=False)
+
+    # Root Column Library: header = actual names, then preferred names and widths
+    rcl_path = os.path.join(lookup_dir, "ReportColumns.xlsx")
+    if overwrite or not os.path.exists(rcl_path):
+        rcl_df = pd.DataFrame([[preferred for _, preferred, _ in default_report_columns],
+                               [width for _, _, width in default_report_columns]],
+                              columns=[actual for actual, _, _ in default_report_columns])
+        with pd.ExcelWriter(rcl_path) as writer:
+            rcl_df.to_excel(writer, sheet_name="Columns", index=False)
+
+
+def generateMaster(filepath, n_rows, n_principals=20, seed=0, start_date="2019-01-01", end_date="2023-12-31",
+                   quarter_share=0.1):
+    """Writes a synthetic Commissions Master with the ReportColumns.xlsx columns
+
+    Customers follow a skewed (Zipf-like) distribution, so a few customers carry most
+    of the revenue like in the real master. Comm Month mixes real dates with Q#YYYY text,
+    P/Ns keep leading zeros and a few revenue cells hold text.
+
+    :param filepath: output .xlsx path
+    :param n_rows: number of line items
+    :param n_principals: number of principals (matches generateLookups)
+    :param seed: random seed, so the same arguments always write the same file
+    :param start_date: first invoice date
+    :param end_date: last invoice date
+    :param quarter_share: share of Comm Month cells written as Q#YYYY text
+    :return: void; master written
+    """
+
+    print("..Generating synthetic master: {:,} rows..".format(n_rows))
+
+    rng = np.random.default_rng(seed)
+    abbreviations, _ = principalNames(n_principals)
+
+    # Skewed customers: the k-th largest customer has about 1/k of the top customer's line items
+    n_customers = max(50, n_rows // 200)
+    customer_names = np.array(["Customer " + str(num).zfill(5) for num in range(n_customers)], dtype=object)
+    weights = 1.0 / np.arange(1, n_customers + 1) ** 1.1
+    customer_ids = rng.choice(n_customers, n_rows, p=weights / weights.sum())
+
+    # Invoice dates, and commissions paid one to three months later
+    first_day = np.datetime64(start_date, 'D')
+    n_days = int((np.datetime64(end_date, 'D') - first_day).astype(int)) + 1
+    invoice_dates = first_day + rng.integers(0, n_days, n_rows).astype('timedelta64[D]')
+    comm_months = (invoice_dates.astype('datetime64[M]') + rng.integers(1, 4, n_rows)).astype('datetime64[D]')
+
+    comm_cells = comm_months.astype(object)
+    is_quarter = rng.random(n_rows) < quarter_share
+    quarter_months = comm_months[is_quarter].astype('datetime64[M]').astype(int)
+    comm_cells[is_quarter] = ["Q" + str(month % 12 // 3 + 1) + str(1970 + month // 12) for month in quarter_months]
+
+    # Revenue scales with the customer's size; ~0.5% of cells hold text like a real export
+    revenue = (rng.gamma(1.2, 400.0, n_rows) * (1 + 20 * weights[customer_ids] / weights[0])).round(2)
+    revenue_cells = revenue.astype(object)
+    revenue_cells[rng.random(n_rows) < 0.005] = "TBD"
+
+    qty = rng.integers(1, 5000, n_rows)
+    generated = {'T-End Cust': customer_names[customer_ids],
+                 'Reported Customer': np.where(rng.random(n_rows) < 0.8, customer_names[customer_ids],
+                                               customer_names[rng.integers(0, n_customers, n_rows)]),
+                 'Principal': np.array(abbreviations, dtype=object)[rng.integers(0, n_principals, n_rows)],
+                 'P/N': np.char.zfill(rng.integers(0, 10 ** 7, n_rows).astype(str), 8).astype(object),
+                 'Qty': qty,
+                 'Paid-On Revenue': revenue_cells,
+                 'Comm Month': comm_cells,
+                 'Invoice Date': invoice_dates.astype(object),
+                 'FSR': rng.choice(np.array(['AB', 'CD', 'EF', 'GH', 'JK'], dtype=object), n_rows),
+                 'Channel': rng.choice(np.array(['Disti', 'Direct'], dtype=object), n_rows),
+                 'EM/CM': rng.choice(np.array(['EM', 'CM', ''], dtype=object), n_rows),
+                 'Unit Price': (revenue / qty).round(4),
+                 'Distributor': rng.choice(np.array(['Arrow', 'Avnet', 'Digi-Key', 'Mouser'], dtype=object), n_rows),
+                 'Comments': np.full(n_rows, '', dtype=object)}
+
+    # Lay out the ReportColumns.xlsx columns (plus a few unused ones) in the master
+    rcl_df = ExcelUtilities.loadLookupFile("ReportColumns.xlsx", "Columns")
+    column_types = Schema.columnTypes(rcl_df) if rcl_df is not None else {}
+    header = list(column_types) or [actual for actual, _, _ in default_report_columns]
+    header += [col for col in extra_columns if col not in header]
+    columns = [generated[col] if col in generated else fillerColumn(column_types.get(col), n_rows, rng)
+               for col in header]
+
+    # Stream rows straight to disk; dates are written as real date cells
+    workbook = xlsxwriter.Workbook(filepath, {'constant_memory': True, 'default_date_format': 'mm/dd/yyyy'})
+    sheet = workbook.add_worksheet("Master")
+    sheet.write_row(0, 0, header)
+    for row_num, row in enumerate(zip(*columns), start=1):
+        sheet.write_row(row_num, 0, row)
+    workbook.close()
+
+    print("> Synthetic master saved at: " + filepath)
+
+
+def fillerColumn(col_type, n_rows, rng):
+    """Makes plausible values for a report column the generator doesn't know by name"""
+
+    if col_type == 'numeric':
+        return rng.gamma(1.0, 100.0, n_rows).round(2)
+    if col_type == 'date':
+        return (np.datetime64("2019-01-01") + rng.integers(0, 1826, n_rows).astype('timedelta64[D]')).astype(object)
+    if col_type == 'category':
+        return np.array(["Value " + str(num) for num in range(40)], dtype=object)[rng.integers(0, 40, n_rows)]
+    return np.array(["Text " + str(num) for num in rng.integers(0, n_rows, n_rows)], dtype=object)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Writes a synthetic Commissions Master and its lookup files")
+    parser.add_argument("output_dir", help="directory for the master; lookup files go in its Lookup folder")
+    parser.add_argument("--rows", type=int, default=100000, help="number of line items")
+    parser.add_argument("--principals", type=int, default=20, help="number of principals")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args(sys.argv[1:])
+
+    ExcelUtilities.look_dir = os.path.join(args.output_dir, "Lookup") + "/"
+    generateLookups(ExcelUtilities.look_dir, args.principals)
+    generateMaster(os.path.join(args.output_dir, "Synthetic Master {:,} rows.xlsx".format(args.rows)),
+                   args.rows, args.principals, args.seed)
@@ -1,7 +1,9 @@
-pip install pyqt5==5.15.7
-pip install pandas==1.4.3
-pip install numpy==1.23.0
-pip install xlrd==2.0.1
-pip install openpyxl==3.0.10
-pip install xlsxwriter==3.0.3
+pip install pyqt5==5.15.7
+pip install pandas==1.4.3
+pip install numpy==1.23.0
+pip install xlrd==2.0.1
+pip install openpyxl==3.0.10
+pip install xlsxwriter==3.0.3
+pip install pyarrow==8.0.0
+pip install psutil==5.9.1
 @pause
\ No newline at end of file
@@ -1,392 +1,649 @@
-import os
-import sys
-
-import numpy as np
-import pandas as pd
-
-from PyQt5 import QtWidgets, QtCore, QtGui
-from PyQt5.QtCore import pyqtSlot, QDate
-from PyQt5.QtWidgets import QDialog, QApplication, QFileDialog
-from PyQt5.uic import loadUi
-
-import EnumTypes
-import ExcelUtilities
-import Run
-
-VERSION = "Beta v1.0"
-
-
-class Stream(QtCore.QObject):
-    """Redirects console output to text widget"""
-    newText = QtCore.pyqtSignal(str)
-
-    def write(self, text):
-        self.newText.emit(str(text))
-
-    # Pass the flush so we don't get an attribute error.
-    def flush(self):
-        pass
-
-
-class MainWindow(QDialog):
-    """Generates the main window for our program"""
-
-    def __init__(self):
-        super(MainWindow, self).__init__()
-
-        # External UI design w/ QTDesigner ;)
-        loadUi("CRG.ui", self)
-
-        # Initialize the threadpool for handling worker jobs
-        self.threadpool = QtCore.QThreadPool()
-
-        # State variables
-        self.filepath = ""
-        self.cms_df = pd.DataFrame()
-
-        # Connect GUI buttons to methods
-        self.btnSelectFile.clicked.connect(self.selectFile)
-        self.btnDeselectFile.clicked.connect(self.deselectFile)
-        self.btnClearConsole.clicked.connect(self.clearConsole)
-        self.btnRun.clicked.connect(self.runClicked)
-
-        # Initialize query option date edits and drop-downs
-        self.initializeQueryOptions()
-
-        # Disable Run button and drop-downs until file selected
-        self.lockButtons()
-        self.btnClearConsole.setEnabled(True)
-        self.btnSelectFile.setEnabled(True)
-
-        # Custom output stream
-        sys.stdout = Stream(newText=self.writeToConsole)
-
-        # Show welcome message
-        self.clearConsole()
-
-    # ------------------------
-    #  One Excel Op at a Time
-    # ------------------------
-
-    def runClicked(self):
-        """Send the run execution to a worker thread."""
-        self.lockButtons()
-        worker = Worker(self.run)
-        if self.threadpool.activeThreadCount() == 0:
-            self.threadpool.start(worker)
-
-    # -------------------------
-    #  Execute Operation Files
-    # -------------------------
-
-    def run(self):
-        """Runs function for run (report)"""
-
-        # Check if we have the necessary lookup files
-        look_dir = "I:/Lookup/"
-        rcl_exists = os.path.exists(look_dir + "ReportColumns.xlsx")  # Root Column Library for CRG
-
-        # Only run if all lookup files can be found
-        if self.filepath and rcl_exists:
-            # Run the Run.py file.
-            try:
-                # Store values for drop-down options into variables
-                customer = self.getEnumType(self.drpdwnCustomer)
-                principal = self.getEnumType(self.drpdwnPrincipal)
-                date_column = self.getEnumType(self.drpdwnDateColumn)
-
-                # Store start and end dates as Python datetime objects
-                start_date = self.dateStartDate.date().toPyDate()
-                end_date = self.dateEndDate.date().toPyDate()
-
-                # Isolate the input file's name
-                filename = os.path.basename(self.filepath).split(".xls")[0]
-
-                # Convert full name to abbreviation for the file's unique principal tag
-                pcp_active = ExcelUtilities.loadLookupFile(filename="principalList.xlsx", sheet_name="Principals")
-                pcp_inactive = ExcelUtilities.loadLookupFile(filename="principalList.xlsx", sheet_name="Inactive")
-                pcp_lookup = pd.concat([pcp_active, pcp_inactive])
-                dict_principal_to_abbrev = dict(zip(pcp_lookup['Principal'], pcp_lookup['Abbreviation']))
-                abbreviation = dict_principal_to_abbrev.get(principal)
-
-                # Create default unique name for file
-                uq_tag = "{"
-                uq_tag += (customer.name if isinstance(customer, EnumTypes.Customer) else customer[0:3]) + "-"
-                uq_tag += (principal.name if isinstance(principal, EnumTypes.Principal) else abbreviation) + "-"
-                uq_tag += date_column.name + ("-" if date_column != EnumTypes.DateColumn.NA else "")
-                uq_tag += (start_date.strftime("%m.%d.%y") + "-") if date_column != EnumTypes.DateColumn.NA else ""
-                uq_tag += end_date.strftime("%m.%d.%y") if date_column != EnumTypes.DateColumn.NA else ""
-                uq_tag += "}"
-
-                # Automatically output to Output directory
-                output_path = "I:/Output/" + filename + "_" + uq_tag + ".xlsx"
-
-                Run.main(self.cms_df, output_path, customer, principal, date_column, start_date, end_date)
-
-            except Exception as error:
-                print("..Unexpected Python error:\n" +
-                      "?" + str(error) + "\n" +
-                      "..Please contact your local coder.")
-            # Clear file.
-            self.unlockButtons()
-        elif not self.filepath:
-            print("..No Commissions file selected!\n"
-                  "..Use the Select File button to select files.")
-        elif not rcl_exists:
-            print("..File ReportColumns.xlsx not found!\n"
-                  "..Please check file location and try again.")
-
-    # -----------------------
-    #  GUI Utility Functions
-    # -----------------------
-
-    def getEnumType(self, drpdwn):
-        """Converts drop-down option text to an enum type
-           If not enum type, then returns the actual text"""
-
-        drpdwn_txt = drpdwn.currentText()
-
-        # Check values under each unique enum type SO you don't check same value across different enum types
-        if drpdwn == self.drpdwnCustomer:
-            for x in EnumTypes.Customer:
-                if drpdwn_txt == x.value:
-                    return x
-        elif drpdwn == self.drpdwnPrincipal:
-            for x in EnumTypes.Principal:
-                if drpdwn_txt == x.value:
-                    return x
-        elif drpdwn == self.drpdwnDateColumn:
-            for x in EnumTypes.DateColumn:
-                if drpdwn_txt == x.value:
-                    return x
-
-        # If we can't find it, return the original text
-        return drpdwn_txt
-
-    def lockButtons(self):
-        """Disable user interaction"""
-
-        self.btnSelectFile.setEnabled(False)
-        self.btnDeselectFile.setEnabled(False)
-        self.btnClearConsole.setEnabled(False)
-        self.btnRun.setEnabled(False)
-        self.drpdwnCustomer.setEnabled(False)
-        self.drpdwnPrincipal.setEnabled(False)
-        self.drpdwnDateColumn.setEnabled(False)
-        self.dateStartDate.setEnabled(False)
-        self.dateEndDate.setEnabled(False)
-
-    def unlockButtons(self):
-        """Enable user interaction"""
-
-        self.btnSelectFile.setEnabled(True)
-        self.btnDeselectFile.setEnabled(True)
-        self.btnClearConsole.setEnabled(True)
-        self.btnRun.setEnabled(True)
-        self.drpdwnCustomer.setEnabled(True)
-        self.drpdwnPrincipal.setEnabled(True)
-        self.drpdwnDateColumn.setEnabled(True)
-        self.dateStartDate.setEnabled(True)
-        self.dateEndDate.setEnabled(True)
-
-    def writeToConsole(self, text):
-        """Write console output to text widget."""
-
-        cursor = self.txtConsole.textCursor()
-        cursor.movePosition(QtGui.QTextCursor.End)
-        cursor.insertText(text)
-        self.txtConsole.setTextCursor(cursor)
-        self.txtConsole.ensureCursorVisible()
-
-    def clearConsole(self):
-        """Clear console print statements"""
-
-        self.txtConsole.clear()
-        print("> Welcome to the TAARCOM, Inc. Commissions Report Generator Program!")
-        print("> Make sure to pull the latest version from GitHub!")
-
-    def selectFile(self):
-        """Select file for Excel operations"""
-
-        # Lock buttons until process concludes
-        self.lockButtons()
-
-        # Let user know the old selection is cleared
-        if self.filepath:
-            self.filepath = ""
-            self.cms_df = pd.DataFrame()
-            print("..Selecting new file, old selection cleared..")
-
-        # Print before the open file dialog takes over runtime
-        print("..Loading file..")
-
-        # Grab Excel file for operations
-        self.filepath, _ = QFileDialog.getOpenFileName(self, directory="I:/",
-                                                       filter="Excel files (*.xls *.xlsx *.xlsm)")
-
-        # Make sure user doesn't cancel
-        if self.filepath:
-            # Store selected file into a dataframe
-            self.cms_df = pd.read_excel(self.filepath, sheet_name=0).fillna("")
-
-            # Populate drop-down options
-            self.populateQueryOptions()
-
-            # Print out the selected filename
-            filename = os.path.basename(self.filepath)
-            print("> File load complete: " + filename)
-
-            # Shorten filename if too long for selected files label
-            if len(filename) > 43:
-                filename = filename[:43] + "..."
-
-            # Update current file label
-            self.lblSelectedFile.setText("> " + filename)
-
-            # Enable buttons and drop-downs now that file is selected (or even if not selected)
-            self.unlockButtons()
-        elif not self.filepath:
-            self.deselectFile()
-            print("..Select file operation cancelled..")
-
-    def deselectFile(self):
-        """Deselect file and adjust GUI accordingly"""
-
-        if self.filepath:
-            self.filepath = ""
-            self.cms_df = pd.DataFrame()
-            self.lblSelectedFile.setText("<No File Selected>")
-            print("> File selection cleared.")
-
-        # Reset drop down and date options to their defaults
-        self.initializeQueryOptions()
-
-        # Disable buttons (except for clear console) and drop-downs now that file is deselected
-        self.lockButtons()
-        self.btnClearConsole.setEnabled(True)
-        self.btnSelectFile.setEnabled(True)
-
-    def initializeQueryOptions(self):
-        """Initializes all drop-down options with their default values and enum types"""
-
-        # Clear drop-down options
-        self.drpdwnCustomer.clear()
-        self.drpdwnPrincipal.clear()
-        self.drpdwnDateColumn.clear()
-
-        # Add enum type options... super keys (that's a cool name for 'em!)
-        for x in EnumTypes.Customer: self.drpdwnCustomer.addItem(x.value)
-        for x in EnumTypes.Principal: self.drpdwnPrincipal.addItem(x.value)
-        for x in EnumTypes.DateColumn: self.drpdwnDateColumn.addItem(x.value)
-
-        # Set start date as Jan 1st of current year, end date as current date
-        current_date = QDate.currentDate()
-        current_year = current_date.year()
-        first_day_of_year = QDate(current_year, 1, 1)
-        self.dateStartDate.setDate(first_day_of_year)
-        self.dateEndDate.setDate(current_date)
-
-    def populateQueryOptions(self):
-        """Use selected commissions file program to populate drop-down options
-           Occurs immediately after file selection
-           We can assume that only one file has been selected"""
-
-        # Check if we have the necessary lookup files
-        look_dir = "I:/Lookup/"
-        pcp_exists = os.path.exists(look_dir + "principalList.xlsx")  # Map principal abbrev to full name
-
-        # Make sure we have a selected file
-        if self.filepath and pcp_exists:
-            # Initialize all inputs with default values and enum types
-            self.initializeQueryOptions()
-
-            # Read in Root Column Library (ReportColumns.xlsx)
-            rcl_df = ExcelUtilities.loadLookupFile("ReportColumns.xlsx", "Columns")
-            required_columns = rcl_df.columns
-
-            # Make sure our commissions file contains all columns required for the report (i.e., the rcl_df cols)
-            all_req_cols = True
-            for col in required_columns:
-                if col not in self.cms_df.columns:
-                    all_req_cols = False
-
-            if all_req_cols:
-                # Convert all Q#YYYY date data to YYYY-mm
-                def convert_quarter(date_str):
-                    return date_str.str.replace(r'Q(\d)(\d{4})',
-                                                lambda x: f'{int(x.group(2))}-{3 * int(x.group(1)) - 2:02d}-01')
-
-                # Define date columns
-                date_cols = ['Invoice Date', 'Comm Month']
-
-                # Convert cols to string and apply convert quarter function
-                self.cms_df[date_cols] = self.cms_df[date_cols].astype(str)
-                self.cms_df[date_cols].apply(convert_quarter)
-
-                # Convert date cols back to datetime
-                self.cms_df[date_cols] = self.cms_df[date_cols].apply(pd.to_datetime, errors='coerce')
-
-                # Reduce data to only required columns
-                rpt_df = self.cms_df[required_columns]
-
-                # Populate principal column
-                # 1. get all unique 3-letter abbreviations from principal cols
-                principal_options = rpt_df['Principal'].unique()
-                # 2. convert abbreviations to full company names for drop-down options
-                pcp_active = ExcelUtilities.loadLookupFile(filename="principalList.xlsx", sheet_name="Principals")
-                pcp_inactive = ExcelUtilities.loadLookupFile(filename="principalList.xlsx", sheet_name="Inactive")
-                pcp_lookup = pd.concat([pcp_active, pcp_inactive])
-                dict_abbrev_to_pcp = dict(zip(pcp_lookup['Abbreviation'], pcp_lookup['Principal']))
-                principal_options = [dict_abbrev_to_pcp.get(abbrev) for abbrev in principal_options]
-                self.drpdwnPrincipal.addItems(sorted(principal_options))
-
-                # Populate customer column
-                customer_options = sorted(rpt_df['T-End Cust'].unique())
-                self.drpdwnCustomer.addItems(customer_options)
-            else:
-                print("..Required columns not found.\n"
-                      "..Make sure to select a commissions file with all the required columns for the report.")
-                self.cms_df = pd.DataFrame()
-                print("> File selection cleared.")
-        elif not self.filepath:
-            print("..Cannot populate drop-down options, no file is selected..")
-        elif not pcp_exists:
-            print("..File principalList.xlsx not found!\n"
-                  "..Please check file location and try again.")
-
-
-class Worker(QtCore.QRunnable):
-    """Inherits from QRunnable to handle worker thread.
-
-    param args -- Arguments to pass to the callback function.
-    param kwargs -- Keywords to pass to the callback function.
-    """
-
-    def __init__(self, fn, *args, **kwargs):
-        super(Worker, self).__init__()
-        # Store constructor arguments (re-used for processing)
-        self.fn = fn
-        self.args = args
-        self.kwargs = kwargs
-
-    @pyqtSlot()
-    def run(self):
-        """Initialize the runner function with passed args, kwargs."""
-        self.fn(*self.args, **self.kwargs)
-
-
-if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    # widget container for QT Designer UI
-    widget = QtWidgets.QStackedWidget()
-    widget.setWindowTitle("Commissions Report Generator (" + VERSION + ")")
-    main_window = MainWindow()
-    widget.addWidget(main_window)
-    widget.setFixedWidth(900)
-    widget.setFixedHeight(600)
-    widget.show()
-
-try:
-    sys.exit(app.exec_())
-except:
-    print("..Exiting")
+import time
+
+# Measure startup from the moment this module starts loading
+startup = time.perf_counter()
+
+import os
+import sys
+import threading
+
+from PyQt5 import QtWidgets, QtCore, QtGui
+from PyQt5.QtCore import pyqtSlot, QDate
+from PyQt5.QtWidgets import QDialog, QApplication, QFileDialog
+
+import CompileUi
+import EnumTypes
+
+# pandas, numpy and the report modules are imported inside the methods below, so the window
+# shows before they load; preloadModules warms them up in the background once it's up
+
+# Layout compiled ahead of time by CompileUi.py (parsing CRG.ui at startup is slower)
+try:
+    import CRG_ui
+except ImportError:
+    CRG_ui = None
+
+VERSION = "Beta v1.0"
+
+# Wait this long after the last query option edit before refreshing the preview (milliseconds)
+preview_delay_ms = 300
+
+
+class Stream(QtCore.QObject):
+    """Redirects console output to text widget"""
+    newText = QtCore.pyqtSignal(str)
+
+    def write(self, text):
+        self.newText.emit(str(text))
+
+    # Pass the flush so we don't get an attribute error.
+    def flush(self):
+        pass
+
+
+class MainWindow(QDialog):
+    """Generates the main window for our program"""
+
+    def __init__(self):
+        super(MainWindow, self).__init__()
+
+        # External UI design w/ QTDesigner ;)
+        ui_compiled = CompileUi.isCurrent(CRG_ui)
+        if ui_compiled:
+            # The compiled form keeps its widgets on the form object; hand them to the window like loadUi does
+            form = CRG_ui.Ui_AutomateExcel()
+            form.setupUi(self)
+            vars(self).update(vars(form))
+        else:
+            from PyQt5.uic import loadUi
+            loadUi(CompileUi.ui_path, self)
+
+        # Initialize the threadpool for handling worker jobs
+        self.threadpool = QtCore.QThreadPool()
+
+        # Previews get their own single thread, so they never hold up a run (or each other)
+        self.preview_pool = QtCore.QThreadPool()
+        self.preview_pool.setMaxThreadCount(1)
+        self.preview_generation = 0
+        self.preview_timer = QtCore.QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(preview_delay_ms)
+        self.preview_timer.timeout.connect(self.startPreview)
+
+        # State variables
+        self.filepaths = []
+        self.cms_df = None
+        self.indexes = None
+        self.load_cancel = None
+
+        # Connect GUI buttons to methods
+        self.btnSelectFile.clicked.connect(self.selectFile)
+        self.btnCancel.clicked.connect(self.cancelLoad)
+        self.btnDeselectFile.clicked.connect(self.deselectFile)
+        self.btnClearConsole.clicked.connect(self.clearConsole)
+        self.btnRun.clicked.connect(self.runClicked)
+
+        # Customer and principal drop-downs also take typed text: several values separated by ";"
+        for drpdwn in (self.drpdwnCustomer, self.drpdwnPrincipal):
+            drpdwn.setEditable(True)
+            drpdwn.setInsertPolicy(QtWidgets.QComboBox.NoInsert)
+
+        # Refresh the report preview shortly after any query option changes
+        self.drpdwnCustomer.currentTextChanged.connect(self.schedulePreview)
+        self.drpdwnPrincipal.currentTextChanged.connect(self.schedulePreview)
+        self.drpdwnDateColumn.currentIndexChanged.connect(self.schedulePreview)
+        self.dateStartDate.dateChanged.connect(self.schedulePreview)
+        self.dateEndDate.dateChanged.connect(self.schedulePreview)
+
+        # Initialize query option date edits and drop-downs
+        self.initializeQueryOptions()
+
+        # Disable Run button and drop-downs until file selected
+        self.lockButtons()
+        self.btnClearConsole.setEnabled(True)
+        self.btnSelectFile.setEnabled(True)
+
+        # Custom output stream
+        sys.stdout = Stream(newText=self.writeToConsole)
+
+        # Show welcome message
+        self.clearConsole()
+        if not ui_compiled:
+            print("..CRG_ui.py is missing or older than CRG.ui, run CompileUi.py for a faster start..")
+
+    # ------------------------
+    #  One Excel Op at a Time
+    # ------------------------
+
+    def runClicked(self):
+        """Send the run execution to a worker thread."""
+        self.lockButtons()
+        worker = Worker(self.run)
+        if self.threadpool.activeThreadCount() == 0:
+            self.threadpool.start(worker)
+
+    # -------------------------
+    #  Execute Operation Files
+    # -------------------------
+
+    def run(self):
+        """Runs function for run (report)"""
+
+        import ExcelUtilities
+        import MasterFile
+        import Run
+
+        # Check if we have the necessary lookup files
+        rcl_exists = os.path.exists(ExcelUtilities.look_dir + "ReportColumns.xlsx")  # Root Column Library for CRG
+
+        # Only run if all lookup files can be found
+        if self.filepaths and rcl_exists:
+            # Run the Run.py file.
+            try:
+                # Store values for drop-down options into variables
+                customer = self.getEnumType(self.drpdwnCustomer)
+                principal = self.getEnumType(self.drpdwnPrincipal)
+                date_column = self.getEnumType(self.drpdwnDateColumn)
+
+                # Store start and end dates as Python datetime objects
+                start_date = self.dateStartDate.date().toPyDate()
+                end_date = self.dateEndDate.date().toPyDate()
+
+                # Isolate the input file's name (the first one, when several were loaded)
+                filename = MasterFile.masterName(self.filepaths)
+
+                # Convert full name to abbreviation for the file's unique principal tag
+                _, dict_principal_to_abbrev = ExcelUtilities.loadPrincipalMaps()
+                abbreviation = dict_principal_to_abbrev.get(principal)
+
+                # Automatically output to Output directory, named with a unique tag for the query options
+                output_path = "I:/Output/" + Run.reportName(filename, customer, principal, abbreviation,
+                                                            date_column, start_date, end_date)
+
+                # Run.main stops on a principal that isn't in principalList.xlsx
+                Run.main(self.cms_df, output_path, customer, principal, date_column, start_date, end_date,
+                         indexes=self.indexes, summaries=self.chkSummaries.isChecked())
+
+            except Exception as error:
+                print("..Unexpected Python error:\n" +
+                      "?" + str(error) + "\n" +
+                      "..Please contact your local coder.")
+            # Clear file.
+            self.unlockButtons()
+        elif not self.filepaths:
+            print("..No Commissions file selected!\n"
+                  "..Use the Select File button to select files.")
+        elif not rcl_exists:
+            print("..File ReportColumns.xlsx not found!\n"
+                  "..Please check file location and try again.")
+
+    # ----------------
+    #  Report Preview
+    # ----------------
+
+    def schedulePreview(self, *_):
+        """Restarts the preview countdown, so a burst of edits refreshes the preview once"""
+
+        self.preview_timer.start()
+
+    def startPreview(self):
+        """Reads the query options and sizes up the report on the preview thread"""
+
+        # Newer previews make any still running one stale
+        self.preview_generation += 1
+
+        if self.indexes is None:
+            self.lblPreview.setText("Preview: select a file")
+            return
+
+        # Widgets are only read here, on the GUI thread; unknown groups are reported when the report runs
+        customer = self.getEnumType(self.drpdwnCustomer, report_unknown=False)
+        principal = self.getEnumType(self.drpdwnPrincipal, report_unknown=False)
+        date_column = self.getEnumType(self.drpdwnDateColumn)
+        start_date = self.dateStartDate.date().toPyDate()
+        end_date = self.dateEndDate.date().toPyDate()
+
+        worker = PreviewWorker(self.preview_generation, self.indexes, customer, principal, date_column,
+                               start_date, end_date)
+        worker.signals.finished.connect(self.showPreview)
+        self.preview_pool.start(worker)
+
+    def showPreview(self, generation, preview):
+        """Shows a finished preview, unless the options changed since it started
+
+        :param generation: preview_generation when the preview started
+        :param preview: (report rows, total revenue, customers) from Run.previewReport, or None
+        """
+
+        import ReportParts
+
+        if generation != self.preview_generation:
+            return
+
+        if preview is None:
+            self.lblPreview.setText("Preview: not available")
+            return
+
+        rows, revenue, customers = preview
+        if rows == 0:
+            self.lblPreview.setText("Preview: no matching rows")
+            return
+
+        text = "Preview: {:,} rows, ${:,.0f} revenue, {:,} customers".format(rows, revenue, customers)
+        if rows > ReportParts.split_rows:
+            text += " (split into parts)"
+        self.lblPreview.setText(text)
+
+    # -----------------------
+    #  GUI Utility Functions
+    # -----------------------
+
+    def getEnumType(self, drpdwn, report_unknown=True):
+        """Converts drop-down option text to an enum type
+           Customer and principal groups, or several values separated by ";", become a QueryEngine.Selection
+           Otherwise, returns the actual text (report_unknown prints a group missing from queryGroups.xlsx)"""
+
+        import MasterFile
+
+        drpdwn_txt = drpdwn.currentText()
+
+        # A name picked from the list is taken whole, even with ";" in it
+        known_names = {drpdwn.itemText(index) for index in range(drpdwn.count())}
+
+        # Check values under each unique enum type SO you don't check same value across different enum types
+        if drpdwn == self.drpdwnCustomer:
+            for x in EnumTypes.Customer:
+                if drpdwn_txt == x.value:
+                    return x
+            return MasterFile.selectionFromText(drpdwn_txt, "Customers", known_names, report_unknown)
+        elif drpdwn == self.drpdwnPrincipal:
+            for x in EnumTypes.Principal:
+                if drpdwn_txt == x.value:
+                    return x
+            return MasterFile.selectionFromText(drpdwn_txt, "Principals", known_names, report_unknown)
+        elif drpdwn == self.drpdwnDateColumn:
+            for x in EnumTypes.DateColumn:
+                if drpdwn_txt == x.value:
+                    return x
+
+        # If we can't find it, return the original text
+        return drpdwn_txt
+
+    def lockButtons(self):
+        """Disable user interaction"""
+
+        self.btnSelectFile.setEnabled(False)
+        self.btnDeselectFile.setEnabled(False)
+        self.btnClearConsole.setEnabled(False)
+        self.btnRun.setEnabled(False)
+        self.drpdwnCustomer.setEnabled(False)
+        self.drpdwnPrincipal.setEnabled(False)
+        self.drpdwnDateColumn.setEnabled(False)
+        self.dateStartDate.setEnabled(False)
+        self.dateEndDate.setEnabled(False)
+        self.chkSummaries.setEnabled(False)
+
+    def unlockButtons(self):
+        """Enable user interaction"""
+
+        self.btnSelectFile.setEnabled(True)
+        self.btnDeselectFile.setEnabled(True)
+        self.btnClearConsole.setEnabled(True)
+        self.btnRun.setEnabled(True)
+        self.drpdwnCustomer.setEnabled(True)
+        self.drpdwnPrincipal.setEnabled(True)
+        self.drpdwnDateColumn.setEnabled(True)
+        self.dateStartDate.setEnabled(True)
+        self.dateEndDate.setEnabled(True)
+        self.chkSummaries.setEnabled(True)
+
+    def writeToConsole(self, text):
+        """Write console output to text widget."""
+
+        cursor = self.txtConsole.textCursor()
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.insertText(text)
+        self.txtConsole.setTextCursor(cursor)
+        self.txtConsole.ensureCursorVisible()
+
+    def clearConsole(self):
+        """Clear console print statements"""
+
+        self.txtConsole.clear()
+        print("> Welcome to the TAARCOM, Inc. Commissions Report Generator Program!")
+        print("> Make sure to pull the latest version from GitHub!")
+
+    def selectFile(self):
+        """Select file for Excel operations"""
+
+        # Lock buttons until process concludes
+        self.lockButtons()
+
+        # Let user know the old selection is cleared
+        if self.filepaths:
+            self.filepaths = []
+            self.cms_df = None
+            self.indexes = None
+            self.lblPreview.setText("Preview: select a file")
+            print("..Selecting new file, old selection cleared..")
+
+        # Print before the open file dialog takes over runtime
+        print("..Loading file..")
+
+        # Grab Excel files for operations (e.g. one master per fiscal year; they're queried as one)
+        self.filepaths, _ = QFileDialog.getOpenFileNames(self, directory="I:/",
+                                                         filter="Excel files (*.xls *.xlsx *.xlsm)")
+
+        # Make sure user doesn't cancel
+        if self.filepaths:
+            # Load on a worker thread so the window keeps repainting; Cancel stops the read
+            self.load_cancel = threading.Event()
+            worker = LoadWorker(self.filepaths, self.load_cancel)
+            worker.signals.progress.connect(self.loadProgress)
+            worker.signals.finished.connect(self.loadFinished)
+            worker.signals.cancelled.connect(self.loadCancelled)
+            worker.signals.failed.connect(self.loadFailed)
+            self.barLoadProgress.setValue(0)
+            self.btnCancel.setEnabled(True)
+            self.threadpool.start(worker)
+        elif not self.filepaths:
+            self.deselectFile()
+            print("..Select file operation cancelled..")
+
+    def cancelLoad(self):
+        """Asks the file load running in the background to stop"""
+
+        if self.load_cancel is not None:
+            self.load_cancel.set()
+            self.btnCancel.setEnabled(False)
+            print("..Cancelling file load..")
+
+    def loadProgress(self, rows_read, total_rows, rows_per_second):
+        """Shows file load progress on the progress bar (the worker prints it to the console)"""
+
+        if total_rows:
+            self.barLoadProgress.setRange(0, 100)
+            self.barLoadProgress.setValue(min(int(100 * rows_read / total_rows), 100))
+        else:
+            # Several files load in worker processes without a row total; show a busy bar
+            self.barLoadProgress.setRange(0, 0)
+
+    def loadFinished(self, cms_df, indexes, options):
+        """Takes over the loaded file from the load worker and fills the drop-downs"""
+
+        self.load_cancel = None
+        self.btnCancel.setEnabled(False)
+        self.barLoadProgress.setRange(0, 100)
+        self.barLoadProgress.setValue(100)
+
+        # Store the typed, normalized dataframe and its indexes
+        self.cms_df = cms_df
+        self.indexes = indexes
+
+        # Populate drop-down options
+        self.populateQueryOptions(options)
+        self.schedulePreview()
+
+        # Print out the selected filenames
+        filename = ", ".join(os.path.basename(filepath) for filepath in self.filepaths)
+        print("> File load complete: " + filename)
+
+        # Shorten filename if too long for selected files label
+        if len(filename) > 43:
+            filename = filename[:43] + "..."
+
+        # Update current file label
+        self.lblSelectedFile.setText("> " + filename)
+
+        # Enable buttons and drop-downs now that file is selected (or even if not selected)
+        self.unlockButtons()
+
+    def loadCancelled(self):
+        """Clears the selection after the user cancelled the file load"""
+
+        self.load_cancel = None
+        self.btnCancel.setEnabled(False)
+        self.barLoadProgress.setRange(0, 100)
+        self.barLoadProgress.setValue(0)
+        self.deselectFile()
+        print("> File load cancelled.")
+
+    def loadFailed(self, message):
+        """Clears the selection after the file load raised an error"""
+
+        self.load_cancel = None
+        self.btnCancel.setEnabled(False)
+        self.barLoadProgress.setRange(0, 100)
+        self.barLoadProgress.setValue(0)
+        print("..Unexpected Python error loading file:\n" +
+              "?" + message + "\n" +
+              "..Please contact your local coder.")
+        self.deselectFile()
+
+    def deselectFile(self):
+        """Deselect file and adjust GUI accordingly"""
+
+        if self.filepaths:
+            self.filepaths = []
+            self.cms_df = None
+            self.indexes = None
+            self.lblSelectedFile.setText("<No File Selected>")
+            print("> File selection cleared.")
+
+        # Reset drop down and date options to their defaults
+        self.initializeQueryOptions()
+        self.schedulePreview()
+
+        # Disable buttons (except for clear console) and drop-downs now that file is deselected
+        self.lockButtons()
+        self.btnClearConsole.setEnabled(True)
+        self.btnSelectFile.setEnabled(True)
+
+    def initializeQueryOptions(self):
+        """Initializes all drop-down options with their default values and enum types"""
+
+        # Clear drop-down options
+        self.drpdwnCustomer.clear()
+        self.drpdwnPrincipal.clear()
+        self.drpdwnDateColumn.clear()
+
+        # Add enum type options... super keys (that's a cool name for 'em!)
+        for x in EnumTypes.Customer: self.drpdwnCustomer.addItem(x.value)
+        for x in EnumTypes.Principal: self.drpdwnPrincipal.addItem(x.value)
+        for x in EnumTypes.DateColumn: self.drpdwnDateColumn.addItem(x.value)
+
+        # Set start date as Jan 1st of current year, end date as current date
+        current_date = QDate.currentDate()
+        current_year = current_date.year()
+        first_day_of_year = QDate(current_year, 1, 1)
+        self.dateStartDate.setDate(first_day_of_year)
+        self.dateEndDate.setDate(current_date)
+
+    def populateQueryOptions(self, options):
+        """Fills the drop-down options with the selected commissions file's principals and customers
+           Occurs immediately after file selection; the options are built on the load thread
+           Several selected files were loaded as one dataframe, so their options are combined
+
+        :param options: (principal options, customer options) from MasterFile.queryOptions, or None
+        """
+
+        import ExcelUtilities
+
+        # Check if we have the necessary lookup files
+        pcp_exists = os.path.exists(ExcelUtilities.look_dir + "principalList.xlsx")  # Map principal abbrev to full name
+
+        # Make sure we have a selected file
+        if self.filepaths and pcp_exists:
+            # Initialize all inputs with default values and enum types
+            self.initializeQueryOptions()
+
+            # loadMasters only builds indexes once every file has all columns required for the report
+            if self.indexes is not None and options is not None:
+                principal_options, customer_options = options
+                self.drpdwnPrincipal.addItems(principal_options)
+                self.drpdwnCustomer.addItems(customer_options)
+            else:
+                self.cms_df = None
+                self.indexes = None
+                print("> File selection cleared.")
+        elif not self.filepaths:
+            print("..Cannot populate drop-down options, no file is selected..")
+        elif not pcp_exists:
+            print("..File principalList.xlsx not found!\n"
+                  "..Please check file location and try again.")
+
+
+def preloadModules():
+    """Imports pandas and the report modules and parses the lookup files, ahead of the first file selection
+    Runs on a background thread once the window shows; anything missing here is reported when it's needed"""
+
+    try:
+        import ExcelUtilities
+        import MasterFile
+        import Run
+
+        if os.path.exists(ExcelUtilities.look_dir + "ReportColumns.xlsx"):
+            ExcelUtilities.loadLookupFile("ReportColumns.xlsx", "Columns")
+        if os.path.exists(ExcelUtilities.look_dir + "principalList.xlsx"):
+            ExcelUtilities.loadPrincipalMaps()
+        ExcelUtilities.loadQueryGroups("Customers")
+        ExcelUtilities.loadQueryGroups("Principals")
+    except Exception:
+        pass
+
+
+class Worker(QtCore.QRunnable):
+    """Inherits from QRunnable to handle worker thread.
+
+    param args -- Arguments to pass to the callback function.
+    param kwargs -- Keywords to pass to the callback function.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super(Worker, self).__init__()
+        # Store constructor arguments (re-used for processing)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    @pyqtSlot()
+    def run(self):
+        """Initialize the runner function with passed args, kwargs."""
+        self.fn(*self.args, **self.kwargs)
+
+
+class PreviewSignals(QtCore.QObject):
+    """Signals a PreviewWorker sends back to the GUI thread"""
+    finished = QtCore.pyqtSignal(int, object)
+
+
+class PreviewWorker(QtCore.QRunnable):
+    """Sizes up a report from the loaded master's revenue cube off the GUI thread
+
+    param generation -- MainWindow.preview_generation when the preview started
+    param indexes -- MasterFile.MasterIndexes of the loaded master
+    param args -- query options for Run.previewReport (customer, principal, date column, start and end dates)
+    """
+
+    def __init__(self, generation, indexes, *args):
+        super(PreviewWorker, self).__init__()
+        self.generation = generation
+        self.indexes = indexes
+        self.args = args
+        self.signals = PreviewSignals()
+
+    @pyqtSlot()
+    def run(self):
+        """Computes the preview and reports back through signals (errors just leave no preview)"""
+
+        import Run
+
+        try:
+            preview = Run.previewReport(self.indexes, *self.args)
+        except Exception:
+            preview = None
+        self.signals.finished.emit(self.generation, preview)
+
+
+class LoadSignals(QtCore.QObject):
+    """Signals a LoadWorker sends back to the GUI thread"""
+    progress = QtCore.pyqtSignal(object, object, object)
+    finished = QtCore.pyqtSignal(object, object, object)
+    cancelled = QtCore.pyqtSignal()
+    failed = QtCore.pyqtSignal(str)
+
+
+class LoadWorker(QtCore.QRunnable):
+    """Loads Commissions Masters off the GUI thread: read, normalize, index and build drop-down options
+
+    param filepaths -- Commissions Masters to load (several are read in parallel and combined)
+    param cancel -- threading.Event the GUI sets to stop the load
+    """
+
+    def __init__(self, filepaths, cancel):
+        super(LoadWorker, self).__init__()
+        self.filepaths = filepaths
+        self.cancel = cancel
+        self.signals = LoadSignals()
+
+    @pyqtSlot()
+    def run(self):
+        """Loads the file and reports back through signals"""
+
+        import Instrumentation
+        import MasterFile
+        import SheetReader
+
+        try:
+            # Time the load and drop-down options as one run (table printed when done)
+            with Instrumentation.measureRun("select file",
+                                            {"files": [os.path.basename(path) for path in self.filepaths]}):
+                cms_df, indexes = MasterFile.loadMasters(self.filepaths, progress=self.reportProgress,
+                                                         cancel=self.cancel)
+                options = None
+                if indexes is not None:
+                    with Instrumentation.measure("query options", rows_in=cms_df.shape[0]):
+                        options = MasterFile.queryOptions(cms_df)
+        except SheetReader.LoadCancelled:
+            self.signals.cancelled.emit()
+            return
+        except Exception as error:
+            self.signals.failed.emit(str(error))
+            return
+
+        self.signals.finished.emit(cms_df, indexes, options)
+
+    def reportProgress(self, rows_read, total_rows, rows_per_second):
+        """Prints progress to the console and forwards it to the GUI thread"""
+
+        import SheetReader
+
+        SheetReader.printProgress(rows_read, total_rows, rows_per_second)
+        self.signals.progress.emit(rows_read, total_rows, rows_per_second)
+
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    # widget container for QT Designer UI
+    widget = QtWidgets.QStackedWidget()
+    widget.setWindowTitle("Commissions Report Generator (" + VERSION + ")")
+    main_window = MainWindow()
+    widget.addWidget(main_window)
+    widget.setFixedWidth(900)
+    widget.setFixedHeight(600)
+    widget.show()
+    app.processEvents()
+    window_seconds = time.perf_counter() - startup
+
+    if "--startup-check" in sys.argv:
+        # StartupReport.py: report how long the window took, then quit before anything loads in the background
+        sys.__stdout__.write("window_seconds={:.4f}\n".format(window_seconds))
+        sys.exit(0)
+
+    print("..Window ready in {:.2f}s, loading report modules in the background..".format(window_seconds))
+    threading.Thread(target=preloadModules, daemon=True).start()
+
+    try:
+        sys.exit(app.exec_())
+    except:
+        print("..Exiting")
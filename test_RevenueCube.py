@@ -0,0 +1,61 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import EnumTypes
+import QueryEngine
+import RevenueCube
+
+
+def masterFrame(dates):
+    """Small master: customers A, B, C, with every row dated the same in both date columns"""
+
+    dates = pd.to_datetime(dates).values
+    return pd.DataFrame({QueryEngine.customer_column: pd.Categorical(["A", "B", "C", "B"][:len(dates)]),
+                         QueryEngine.principal_column: pd.Categorical(["ABC"] * len(dates)),
+                         'Revenue': np.array([100.0, 50.0, 100.0, 25.0][:len(dates)]),
+                         'Comm Month': dates,
+                         'Invoice Date': dates})
+
+
+def rowTotals(cms_df, query):
+    """Per-customer revenue and rows from the row filter, the way reports find their rows"""
+
+    positions = query.evaluate(cms_df)
+    rows_df = cms_df.iloc[positions]
+    return rows_df.groupby(QueryEngine.customer_column, observed=True)['Revenue'].agg(['sum', 'size'])
+
+
+def assertCubeMatchesRows(cms_df, start_date, end_date):
+    date_indexes = QueryEngine.buildDateIndexes(cms_df)
+    cube = RevenueCube.RevenueCube(cms_df, 'Revenue', date_indexes)
+    query = QueryEngine.QuerySpec.fromOptions(EnumTypes.Customer.ALL, None, EnumTypes.DateColumn.PAID,
+                                              start_date, end_date)
+
+    expected = rowTotals(cms_df, query)
+    actual = cube.customerTotals(query)
+    assert sorted(actual.index) == sorted(expected.index)
+    for customer in expected.index:
+        assert actual.loc[customer, 'revenue'] == expected.loc[customer, 'sum']
+        assert actual.loc[customer, 'rows'] == expected.loc[customer, 'size']
+    assert cube.preview(query) == (int(expected['size'].sum()), float(expected['sum'].sum()), expected.shape[0])
+
+
+def test_timestamped_dates_match_row_filter():
+    # 6/30 12:00 falls after the period's end (6/30 midnight); 3/31 12:00 falls inside it
+    cms_df = masterFrame(["2023-06-30 12:00", "2023-04-10", "2023-03-31 12:00", "2023-05-15 08:30"])
+    assertCubeMatchesRows(cms_df, datetime.date(2023, 3, 15), datetime.date(2023, 6, 30))
+    assertCubeMatchesRows(cms_df, datetime.date(2023, 4, 1), datetime.date(2023, 5, 31))
+    assertCubeMatchesRows(cms_df, datetime.date(2023, 3, 31), datetime.date(2023, 7, 1))
+
+
+def test_whole_day_dates_use_whole_months():
+    cms_df = masterFrame(["2023-06-30", "2023-04-10", "2023-03-31", "2023-05-15"])
+    assertCubeMatchesRows(cms_df, datetime.date(2023, 3, 15), datetime.date(2023, 6, 30))
+
+    # Dates without times round the period out to whole days, so April to June come from the cube
+    cube = RevenueCube.RevenueCube(cms_df, 'Revenue', QueryEngine.buildDateIndexes(cms_df))
+    query = QueryEngine.QuerySpec.fromOptions(EnumTypes.Customer.ALL, None, EnumTypes.DateColumn.PAID,
+                                              datetime.date(2023, 4, 1), datetime.date(2023, 6, 30))
+    assert len(cube.periodParts(query)) == 1
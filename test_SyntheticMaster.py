@@ -0,0 +1,22 @@
+import os
+
+import ExcelUtilities
+import MasterCache
+import MasterFile
+import Schema
+import SyntheticMaster
+
+
+def test_text_revenue_loads_as_invalid(tmp_path, monkeypatch):
+    # The text revenue cells must survive the read as text, not as missing values
+    look_dir = os.path.join(str(tmp_path), "Lookup") + "/"
+    monkeypatch.setattr(ExcelUtilities, "look_dir", look_dir)
+    monkeypatch.setattr(MasterCache, "cache_dir", str(tmp_path / "cache"))
+    SyntheticMaster.generateLookups(look_dir, 5)
+    filepath = str(tmp_path / "master.xlsx")
+    SyntheticMaster.generateMaster(filepath, 3000, 5)
+
+    cms_df, _ = MasterFile.loadMaster(filepath)
+    n_invalid_rows, counts = Schema.qualitySummary(cms_df)
+    assert n_invalid_rows > 0
+    assert counts['Paid-On Revenue'] > 0